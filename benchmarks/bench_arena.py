@@ -0,0 +1,87 @@
+"""
+Benchmark de la verificación de recorridos en la arena
+Compara Arena.first_collision (cuadrícula uniforme) con comparar cada tramo
+con todos los lados, sobre recorridos aleatorios de 100000 tramos entre
+cientos de obstáculos. Los obstáculos que toca el recorrido se quitan antes de
+medir, así que la verificación recorre el camino completo. La comparación
+exhaustiva se mide sobre BRUTE_SEGMENTS tramos como máximo y se extrapola. También mide
+el recorrido de un programa en rover_control.Rover (rover_path).
+Ejecutar con: python -m benchmarks.bench_arena [tramos]
+"""
+import logging
+import math
+import random
+import sys
+import time
+
+from roverapp.arena import Arena, rover_path, _intersection
+from roverapp.transpiler import UMGPPTranspiler
+
+SIZE = 3000
+BRUTE_SEGMENTS = 1000
+
+
+def random_obstacles(rng, count):
+    """Hexágonos irregulares repartidos por la arena"""
+    obstacles = []
+    for _ in range(count):
+        cx, cy = rng.uniform(0, SIZE), rng.uniform(0, SIZE)
+        radius = rng.uniform(10, 40)
+        angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(6))
+        obstacles.append([(cx + radius * math.cos(a), cy + radius * math.sin(a)) for a in angles])
+    return obstacles
+
+
+def random_path(rng, segments):
+    """Caminata aleatoria dentro de la arena"""
+    xs, ys = [SIZE / 2], [SIZE / 2]
+    for _ in range(segments):
+        xs.append(min(SIZE - 10, max(10, xs[-1] + rng.uniform(-15, 15))))
+        ys.append(min(SIZE - 10, max(10, ys[-1] + rng.uniform(-15, 15))))
+    return xs, ys
+
+
+def clear_path(obstacles, xs, ys):
+    """Quita los obstáculos que toca el recorrido"""
+    while True:
+        collision = Arena((0, 0, SIZE, SIZE), obstacles).first_collision(xs, ys)
+        if collision is None:
+            return obstacles
+        del obstacles[collision['obstacle']]
+
+
+def brute_force(arena, xs, ys, segments):
+    for index in range(1, segments + 1):
+        for ax, ay, bx, by, _ in arena._edges:
+            _intersection(xs[index - 1], ys[index - 1], xs[index], ys[index], ax, ay, bx, by)
+
+
+def main(segments=100000):
+    rng = random.Random(1)
+    xs, ys = random_path(rng, segments)
+    print(f"{'obstáculos':>10} {'lados':>6} {'celdas':>7} {'índice ms':>10} {'verificar ms':>13} {'exhaustivo s':>13}")
+    for count in (200, 600, 2000):
+        obstacles = clear_path(random_obstacles(rng, count), xs, ys)
+        start = time.perf_counter()
+        arena = Arena((0, 0, SIZE, SIZE), obstacles)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        assert arena.first_collision(xs, ys) is None
+        check_ms = (time.perf_counter() - start) * 1000
+        measured = min(segments, BRUTE_SEGMENTS)
+        start = time.perf_counter()
+        brute_force(arena, xs, ys, measured)
+        brute_s = (time.perf_counter() - start) * segments / measured
+        print(f"{len(obstacles):>10} {len(arena._edges):>6} {len(arena._grid):>7} {build_ms:>10.2f} "
+              f"{check_ms:>13.2f} {brute_s:>13.1f}")
+
+    logging.disable(logging.INFO)
+    code = "PROGRAM p BEGIN REPEAT 25000 BEGIN girar(1); avanzar_ctms(10); girar(-1); avanzar_ctms(10); END; END."
+    ir = UMGPPTranspiler().compile(code)['ir']
+    start = time.perf_counter()
+    path_xs, _, _ = rover_path(ir)
+    print(f"rover_path: {len(path_xs) - 1} tramos en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,48 @@
+"""
+Benchmark de la compilación por lotes de UMG++
+Compara programas por segundo compilando uno tras otro (como cientos de
+llamadas a /api/compile/) frente al grupo de procesos de BatchCompiler.
+Ejecutar con: python -m benchmarks.bench_batch [programas] [instrucciones]
+"""
+import json
+import os
+import sys
+import time
+
+from roverapp.batch import BatchCompiler
+from roverapp.transpiler import transpile_to_python
+from benchmarks.bench_lexer import build_program
+
+
+def main(programs=200, instructions=2000):
+    # Programas distintos para que el lote no se beneficie de códigos repetidos
+    base = build_program(instructions)
+    codes = [base.replace('PROGRAM bench', f'PROGRAM entrega{index}') for index in range(programs)]
+    
+    start = time.perf_counter()
+    for code in codes:
+        # Lo mismo que hace /api/compile/: compilar y serializar la respuesta
+        result = transpile_to_python(code)
+        result.pop('ir')
+        json.dumps(result)
+    sequential = time.perf_counter() - start
+    
+    print(f"{programs} programas de {instructions} instrucciones, {os.cpu_count()} núcleos")
+    print(f"{'modo':>20} {'s':>8} {'prog/s':>9} {'aceleración':>11}")
+    print(f"{'secuencial':>20} {sequential:>8.2f} {programs / sequential:>9.1f} {1:>10.1f}x")
+    
+    for workers in sorted({2, 4, os.cpu_count() or 1}):
+        compiler = BatchCompiler(workers=workers, chunk_size=4)
+        compiler.compile_all(codes[:workers])  # Arrancar los procesos
+        start = time.perf_counter()
+        results = compiler.compile_all(codes, as_json=True)
+        elapsed = time.perf_counter() - start
+        compiler.shutdown()
+        assert all(json.loads(result)['success'] for result in results)
+        print(f"{f'lote ({workers} procesos)':>20} {elapsed:>8.2f} {programs / elapsed:>9.1f} "
+              f"{sequential / elapsed:>10.1f}x")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
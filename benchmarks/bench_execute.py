@@ -0,0 +1,77 @@
+"""
+Benchmark de /api/execute/ de punta a punta contra el ESP8266 simulado
+Cada solicitud compila el programa (con la caché del proceso), lo envía por
+HTTP a roverapp.simulated_rover y espera a que el rover simulado lo ejecute.
+Compara los formatos de envío y el efecto de la latencia de la red.
+La vista se llama con RequestFactory, con una configuración mínima de Django
+y sin base de datos.
+Ejecutar con: python -m benchmarks.bench_execute [solicitudes] [instrucciones]
+"""
+import json
+import statistics
+import sys
+import time
+import types
+from unittest import mock
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'roverapp'],
+        AUTH_USER_MODEL='roverapp.Usuario',
+        DATABASES={},
+    )
+django.setup()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from roverapp import views_api, views_rover  # noqa: E402
+from roverapp.simulated_rover import SimulatedRover  # noqa: E402
+from benchmarks.generator import generate_program  # noqa: E402
+
+CONFIGURATIONS = [
+    ('texto', {'binary': False, 'chunk_bytes': 0}),
+    ('binario', {'binary': True, 'chunk_bytes': 0}),
+    ('fragmentos', {'binary': True, 'chunk_bytes': 256}),
+    ('binario 5 ms', {'binary': True, 'chunk_bytes': 0, 'latency': 0.005}),
+    ('fragmentos 5 ms', {'binary': True, 'chunk_bytes': 256, 'latency': 0.005}),
+]
+
+
+def execute(factory, rover, code):
+    """Una solicitud a /api/execute/ y la ejecución completa en el rover simulado"""
+    request = factory.post('/api/execute/', json.dumps({'code': code}), content_type='application/json')
+    request.user = types.SimpleNamespace(is_authenticated=True)
+    response = views_api.execute_code(request)
+    rover.wait()
+    return json.loads(response.content)['success']
+
+
+def main(requests=50, instructions=200):
+    factory = RequestFactory()
+    codes = [generate_program(instructions, seed=seed) for seed in range(requests)]
+    print(f"{requests} solicitudes, programas de {instructions} instrucciones")
+    print(f"{'configuración':>16} {'media ms':>9} {'p95 ms':>8} {'solicitudes/s':>14} {'fallidas':>9}")
+    with mock.patch.object(views_rover, 'logger'), override_settings(ROVER_WIRE_FORMAT='auto'):
+        for name, options in CONFIGURATIONS:
+            rover = SimulatedRover(**options).start()
+            try:
+                with mock.patch.object(views_rover, 'ROVER_URL', rover.url), \
+                        mock.patch.object(views_rover, '_formatos_rover', {}):
+                    times = []
+                    failed = 0
+                    for code in codes:
+                        start = time.perf_counter()
+                        failed += not execute(factory, rover, code)
+                        times.append(time.perf_counter() - start)
+            finally:
+                rover.stop()
+            p95 = sorted(times)[int(len(times) * 0.95) - 1] * 1000
+            print(f"{name:>16} {statistics.mean(times) * 1000:>9.2f} {p95:>8.2f} "
+                  f"{len(times) / sum(times):>14.1f} {failed:>9}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,37 @@
+"""
+Benchmark de la simulación de flotas
+Simula flotas de 10, 100 y 1000 rovers, cada uno con su propio programa
+sintético, en el proceso actual y en un grupo de procesos, y muestra el
+rendimiento agregado (comandos y rovers por segundo de tiempo real).
+Ejecutar con: python -m benchmarks.bench_fleet [rovers ...]
+"""
+import sys
+
+from roverapp.fleet import FleetSimulator
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.generator import generate_program
+
+# Instrucciones del programa de cada rover y programas distintos de la flota
+INSTRUCTIONS = 50
+PROGRAMS = 50
+
+
+def main(sizes=(10, 100, 1000)):
+    transpiler = UMGPPTranspiler()
+    # Programas sin bloques REPEAT enormes: cada rover ejecuta un número acotado de comandos
+    programs = [transpiler.compile(generate_program(INSTRUCTIONS, seed=seed))['ir'] for seed in range(PROGRAMS)]
+    simulators = [('proceso', FleetSimulator(workers=0)), ('grupo', FleetSimulator())]
+
+    print(f"{'rovers':>7} {'modo':>8} {'procesos':>9} {'comandos':>9} {'real s':>8} "
+          f"{'comandos/s':>11} {'rovers/s':>9} {'simulado s':>11}")
+    for size in sizes:
+        streams = {f'rover-{index}': programs[index % PROGRAMS] for index in range(size)}
+        for mode, simulator in simulators:
+            stats = simulator.run(streams)['stats']
+            print(f"{size:>7} {mode:>8} {stats['workers']:>9} {stats['commands']:>9} {stats['wall_seconds']:>8.2f} "
+                  f"{stats['commands_per_second']:>11.0f} {stats['rovers_per_second']:>9.1f} "
+                  f"{stats['simulated_seconds']:>11.0f}")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (10, 100, 1000))
@@ -0,0 +1,44 @@
+"""
+Benchmark de la compilación incremental de UMG++
+Compara el tiempo de una edición de un carácter en medio del programa con
+el de recompilar el programa completo.
+Ejecutar con: python -m benchmarks.bench_incremental [instrucciones ...]
+"""
+import sys
+import time
+
+from roverapp.incremental import IncrementalDocument
+from roverapp.transpiler import transpile_to_python
+from benchmarks.bench_lexer import build_program
+
+
+def main(sizes=(1000, 10000, 100000), edits=50):
+    print(f"{'instr':>8} {'completa ms':>12} {'edición ms':>11} {'aceleración':>11}")
+    for size in sizes:
+        code = build_program(size)
+        
+        start = time.perf_counter()
+        transpile_to_python(code)
+        full_time = time.perf_counter() - start
+        
+        # Editar el parámetro de una instrucción en medio del programa
+        document = IncrementalDocument(code)
+        line = len(document.lines) // 2
+        while 'avanzar_ctms' not in document.lines[line - 1]:
+            line += 1
+        column = document.lines[line - 1].index('(') + 2
+        start = time.perf_counter()
+        for version in range(1, edits + 1):
+            document.update([{
+                'start_line': line, 'start_column': column,
+                'end_line': line, 'end_column': column + 1,
+                'text': str(version % 9 + 1)
+            }], version)
+        edit_time = (time.perf_counter() - start) / edits
+        assert document.success
+        
+        print(f"{size:>8} {full_time * 1000:>12.1f} {edit_time * 1000:>11.2f} {full_time / edit_time:>10.0f}x")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 10000, 100000))
@@ -0,0 +1,109 @@
+"""
+Benchmark del analizador léxico de UMG++
+Compara tokens por segundo entre el escáner maestro actual y la
+implementación anterior (un re.compile por patrón en cada posición).
+Ejecutar con: python -m benchmarks.bench_lexer
+"""
+import re
+import sys
+import time
+
+from roverapp.transpiler import UMGPPTranspiler
+
+
+def legacy_tokenize(token_patterns, code):
+    """Implementación original de UMGPPTranspiler.tokenize, como referencia"""
+    tokens = []
+    errors = []
+    
+    lines = code.split('\n')
+    for line_number, line in enumerate(lines, 1):
+        position = 0
+        
+        while position < len(line):
+            match = None
+            
+            for token_type, pattern in token_patterns:
+                regex = re.compile(pattern)
+                result = regex.match(line[position:])
+                
+                if result:
+                    value = result.group(0)
+                    
+                    if token_type != 'WHITESPACE':
+                        tokens.append({
+                            'type': token_type,
+                            'value': value,
+                            'line': line_number,
+                            'column': position + 1
+                        })
+                    
+                    position += len(value)
+                    match = True
+                    break
+            
+            if not match:
+                errors.append({
+                    'message': f"Carácter no reconocido: '{line[position]}'",
+                    'line': line_number,
+                    'column': position + 1
+                })
+                position += 1
+    
+    return tokens, errors
+
+
+def build_program(instructions, per_line=1):
+    """Genera un programa UMG++ válido con el número de instrucciones indicado"""
+    body = [
+        'avanzar_ctms(120);',
+        'girar(1)+girar(-1)+avanzar_mts(2);',
+        'cuadrado(50);',
+        'girar(0);',
+        'caminar(3);',
+    ]
+    lines = []
+    current = []
+    for i in range(instructions):
+        current.append(body[i % len(body)])
+        if len(current) == per_line:
+            lines.append('    ' + ' '.join(current))
+            current = []
+    if current:
+        lines.append('    ' + ' '.join(current))
+    return 'PROGRAM bench\nBEGIN\n' + '\n'.join(lines) + '\nEND.'
+
+
+def measure(function, code, repeat):
+    """Devuelve el mejor tiempo de varias ejecuciones y el número de tokens"""
+    best = float('inf')
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens, _ = function(code)
+        best = min(best, time.perf_counter() - start)
+        count = len(tokens)
+    return best, count
+
+
+def main(sizes=(100, 1000, 10000), repeat=3):
+    transpiler = UMGPPTranspiler()
+    patterns = transpiler.token_patterns
+    
+    print(f"{'instr':>8} {'por_línea':>9} {'tokens':>9} {'anterior tok/s':>15} {'actual tok/s':>14} {'aceleración':>11}")
+    for size in sizes:
+        # Una instrucción por línea y todo el programa en pocas líneas largas
+        for per_line in (1, size):
+            code = build_program(size, per_line)
+            
+            # Ambas implementaciones deben producir exactamente la misma salida
+            assert legacy_tokenize(patterns, code) == transpiler.tokenize(code)
+            
+            old_time, count = measure(lambda c: legacy_tokenize(patterns, c), code, repeat)
+            new_time, _ = measure(transpiler.tokenize, code, repeat)
+            print(f"{size:>8} {per_line:>9} {count:>9} {count / old_time:>15,.0f} "
+                  f"{count / new_time:>14,.0f} {old_time / new_time:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (100, 1000, 10000))
@@ -0,0 +1,71 @@
+"""
+Benchmark del registro de rover_control
+Mide el costo por comando de ejecutar un plan en Rover con reloj virtual sin
+registro configurado, con un FileHandler síncrono en el logger (como hacía
+el módulo al importarse), con configure_logging (manejadores en un hilo de
+fondo) y con configure_logging más el registro de eventos. El tiempo de las
+configuraciones con cola no incluye la escritura, que hace el hilo de fondo.
+Ejecutar con: python -m benchmarks.bench_logging [instrucciones ...]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from roverapp import rover_control
+from roverapp.plan import compile_plan
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.generator import generate_program
+
+
+def timed_run(plan):
+    """Segundos que tarda el plan en un Rover con reloj virtual"""
+    rover = rover_control.Rover(clock=rover_control.VirtualClock())
+    start = time.perf_counter()
+    plan.run(rover)
+    return time.perf_counter() - start
+
+
+def synchronous(directory):
+    """Configuración anterior: FileHandler en el hilo que ejecuta el rover"""
+    handler = logging.FileHandler(os.path.join(directory, 'sync.log'))
+    handler.setFormatter(logging.Formatter(rover_control.LOG_FORMAT))
+    rover_control.logger.addHandler(handler)
+    rover_control.logger.setLevel(logging.INFO)
+
+    def undo():
+        rover_control.logger.removeHandler(handler)
+        rover_control.logger.setLevel(logging.NOTSET)
+        handler.close()
+    return undo
+
+
+def main(sizes=(1000, 10000)):
+    transpiler = UMGPPTranspiler()
+    with tempfile.TemporaryDirectory() as directory:
+        setups = [
+            ('sin registro', lambda: (lambda: None)),
+            ('síncrono', lambda: synchronous(directory)),
+            ('cola', lambda: (rover_control.configure_logging(
+                os.path.join(directory, 'rover.log'), console=False), rover_control.shutdown_logging)[1]),
+            ('cola+eventos', lambda: (rover_control.configure_logging(
+                os.path.join(directory, 'rover.log'), console=False,
+                events_path=os.path.join(directory, 'events.jsonl')), rover_control.shutdown_logging)[1]),
+        ]
+        print(f"{'instr':>7} {'llamadas':>9} " + " ".join(f"{name + ' us':>16}" for name, _ in setups))
+        for size in sizes:
+            plan = compile_plan(transpiler.compile(generate_program(size, seed=size))['ir'])
+            costs = []
+            for _, setup in setups:
+                undo = setup()
+                try:
+                    seconds = min(timed_run(plan) for _ in range(3))
+                finally:
+                    undo()
+                costs.append(seconds / plan.calls * 1e6)
+            print(f"{size:>7} {plan.calls:>9} " + " ".join(f"{cost:>16.2f}" for cost in costs))
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 10000))
@@ -0,0 +1,47 @@
+"""
+Benchmark de memoria del transpilador UMG++
+Mide el pico de memoria (tracemalloc) al analizar programas grandes con la
+lista completa de tokens en diccionarios frente al modo en flujo, donde el
+parser consume los tokens a medida que el lexer los produce.
+Ejecutar con: python -m benchmarks.bench_memory [instrucciones ...]
+"""
+import sys
+import time
+import tracemalloc
+
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.bench_lexer import build_program
+
+
+def peak_memory(function):
+    """Ejecuta la función y devuelve (segundos, pico de memoria en bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(sizes=(1000, 100000, 1000000)):
+    transpiler = UMGPPTranspiler()
+    
+    def materialized(code):
+        tokens, _ = transpiler.tokenize(code)
+        return transpiler.parse(tokens)
+    
+    def streaming(code):
+        return transpiler.parse(transpiler.iter_tokens(code, []))
+    
+    print(f"{'instr':>9} {'fuente MB':>10} {'lista MB':>9} {'lista s':>8} {'flujo MB':>9} {'flujo s':>8} {'B/instr':>8}")
+    for size in sizes:
+        code = build_program(size)
+        list_time, list_peak = peak_memory(lambda: materialized(code))
+        stream_time, stream_peak = peak_memory(lambda: streaming(code))
+        print(f"{size:>9} {len(code) / 2**20:>10.1f} {list_peak / 2**20:>9.1f} {list_time:>8.2f} "
+              f"{stream_peak / 2**20:>9.1f} {stream_time:>8.2f} {stream_peak / size:>8.0f}")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 100000, 1000000))
@@ -0,0 +1,61 @@
+"""
+Benchmark de los planes ejecutables
+Compara ejecutar un programa con el código Python generado (exec del texto en
+cada ejecución, como haría el servidor con python_code) y con plan.run, sobre
+un rover que no hace nada para medir solo el costo de despacho.
+Ejecutar con: python -m benchmarks.bench_plan [instrucciones ...]
+"""
+import sys
+import time
+import types
+from unittest import mock
+
+from roverapp.plan import compile_plan
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.generator import generate_program
+
+
+class NullRover:
+    """Rover con la interfaz de rover_control.Rover que no hace nada"""
+
+    def __getattr__(self, method):
+        return _nothing
+
+
+def _nothing(*args):
+    pass
+
+
+def best_time(function, repeat=3):
+    """Mejor tiempo de varias ejecuciones, en segundos"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_python(python_code):
+    """Ejecuta el código Python generado con NullRover en lugar de rover_control.Rover"""
+    namespace = {'__name__': 'generado'}
+    exec(python_code, namespace)
+    namespace['main']()
+
+
+def main(sizes=(100, 10000, 100000)):
+    transpiler = UMGPPTranspiler()
+    module = types.SimpleNamespace(Rover=NullRover)
+    print(f"{'instr':>7} {'llamadas':>9} {'exec ms':>9} {'plan ms':>9} {'traducir ms':>12}")
+    with mock.patch.dict('sys.modules', rover_control=module), mock.patch('builtins.print'):
+        for size in sizes:
+            result = transpiler.compile(generate_program(size, seed=size))
+            plan = compile_plan(result['ir'])
+            exec_ms = best_time(lambda: run_python(result['python_code'])) * 1000
+            plan_ms = best_time(lambda: plan.run(NullRover())) * 1000
+            compile_ms = best_time(lambda: compile_plan(result['ir'])) * 1000
+            sys.stdout.write(f"{size:>7} {plan.calls:>9} {exec_ms:>9.2f} {plan_ms:>9.2f} {compile_ms:>12.2f}\n")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (100, 10000, 100000))
@@ -0,0 +1,67 @@
+"""
+Benchmark de solicitudes de compilación por ciclo de corrección
+Simula a un estudiante que compila un programa con errores de varias etapas,
+corrige las líneas que indica cada respuesta y vuelve a compilar hasta que
+el programa compila. Compara cuántas solicitudes hacen falta deteniéndose en
+la primera etapa con errores frente al modo all_errors.
+Ejecutar con: python -m benchmarks.bench_round_trips [programas] [instrucciones]
+"""
+import random
+import sys
+
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.generator import generate_program, valid_instruction
+
+# Líneas de la cabecera antes de la primera instrucción (PROGRAM y BEGIN)
+HEADER_LINES = 2
+MAX_ROUNDS = 100
+
+
+def lines_to_fix(transpiler, lines, result):
+    """Líneas del cuerpo (índices de lines) que corrige el estudiante según la respuesta"""
+    targets = set()
+    for error in result['errors']:
+        if 'line' in error:
+            targets.add(error['line'] - 1)
+            # El punto y coma faltante se informa en el token siguiente
+            if 'punto y coma' in error['message']:
+                targets.add(error['line'] - 2)
+        else:
+            # Sin posición el estudiante busca la instrucción indicada en el mensaje
+            for index in range(HEADER_LINES, len(lines) - 1):
+                single = f"PROGRAM p BEGIN {lines[index]} END."
+                if transpiler.compile(single).get('stage') == 'semantic':
+                    targets.add(index)
+    return {index for index in targets if HEADER_LINES <= index < len(lines) - 1}
+
+
+def round_trips(transpiler, code, all_errors, seed):
+    """Solicitudes de compilación hasta que el programa compila"""
+    rng = random.Random(seed)
+    lines = code.split('\n')
+    for requests in range(1, MAX_ROUNDS + 1):
+        result = transpiler.compile('\n'.join(lines), all_errors=all_errors)
+        if result['success']:
+            return requests
+        for index in lines_to_fix(transpiler, lines, result):
+            lines[index] = '    ' + valid_instruction(rng)
+    return MAX_ROUNDS
+
+
+def main(programs=200, instructions=40):
+    transpiler = UMGPPTranspiler()
+    totals = {False: 0, True: 0}
+    for seed in range(programs):
+        code = generate_program(instructions, seed=seed, invalid_rate=0.1)
+        for all_errors in totals:
+            totals[all_errors] += round_trips(transpiler, code, all_errors, seed)
+
+    first, complete = totals[False] / programs, totals[True] / programs
+    print(f"{programs} programas de {instructions} instrucciones con ~10% de errores")
+    print(f"solicitudes por programa, primera etapa: {first:.2f}")
+    print(f"solicitudes por programa, all_errors:    {complete:.2f}")
+    print(f"reducción: {(1 - complete / first) * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
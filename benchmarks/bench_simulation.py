@@ -0,0 +1,66 @@
+"""
+Benchmark de la simulación por lotes
+Compara simulation.simulate (NumPy) con ejecutar rover_control.Rover comando
+por comando con un reloj virtual, sobre bloques REPEAT que ejecutan el número
+de comandos indicado. Rover solo se mide hasta SCALAR_MAX comandos.
+Ejecutar con: python -m benchmarks.bench_simulation [comandos ...]
+"""
+import logging
+import sys
+import time
+
+from roverapp import ir as ir_module
+from roverapp import rover_control, simulation
+from roverapp.transpiler import UMGPPTranspiler, PYTHON_CALLS, GIRAR_CALLS
+
+# Comandos ejecutados como máximo en la simulación escalar
+SCALAR_MAX = 100000
+
+BODY = "girar(1); caminar(7); cuadrado(30); girar(-1); avanzar_ctms(12); girar(0); avanzar_mts(3); moonwalk(-2);"
+BODY_COMMANDS = 8
+
+
+def best_time(function, repeat=3):
+    """Mejor tiempo de varias ejecuciones, en segundos"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_rover(ir):
+    """Ejecuta el programa en Rover con reloj virtual"""
+    rover = rover_control.Rover(clock=rover_control.VirtualClock())
+    for opcode, operand in ir.expanded_commands():
+        if opcode == ir_module.GIRAR:
+            getattr(rover, GIRAR_CALLS[operand])()
+        else:
+            getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+    return rover
+
+
+def main(sizes=(1000, 100000, 1000000)):
+    if simulation.np is None:
+        print("NumPy no está instalado: la simulación por lotes no está disponible")
+        return
+    # El registro de cada movimiento dominaría la medición escalar
+    logging.disable(logging.INFO)
+    transpiler = UMGPPTranspiler()
+
+    print(f"{'comandos':>9} {'numpy ms':>10} {'rover ms':>10} {'x final':>12}")
+    for size in sizes:
+        code = f"PROGRAM bench BEGIN REPEAT {max(1, size // BODY_COMMANDS)} BEGIN {BODY} END; END."
+        ir = transpiler.compile(code)['ir']
+        poses = simulation.simulate(ir)
+        numpy_ms = best_time(lambda: simulation.simulate(ir)) * 1000
+        if len(poses['x']) <= SCALAR_MAX:
+            rover_ms = f"{best_time(lambda: run_rover(ir), repeat=1) * 1000:>10.2f}"
+        else:
+            rover_ms = f"{'-':>10}"
+        print(f"{len(poses['x']):>9} {numpy_ms:>10.2f} {rover_ms} {poses['x'][-1]:>12.2f}")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 100000, 1000000))
@@ -0,0 +1,230 @@
+"""
+Benchmark de escalamiento del transpilador UMG++ por etapa
+Mide el tiempo y el pico de memoria de cada etapa (tokenize, parse,
+analyze_semantics, lower, generate_python_code y compile completo) con
+programas sintéticos de 10 a 1.000.000 de instrucciones, válidos e inválidos.
+Los resultados se guardan en JSON para compararlos entre ejecuciones.
+
+Ejecutar con:
+    python -m benchmarks.bench_stages [--sizes 10 100 ...] [--output resultados.json]
+    python -m benchmarks.bench_stages --compare anterior.json [--output nuevo.json]
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from roverapp.transpiler import UMGPPTranspiler, COMPILER_VERSION
+from benchmarks.generator import generate_program
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+# Variantes de programa: (nombre, argumentos de generate_program)
+VARIANTS = (
+    ('valid', {}),
+    ('long_chains', {'max_chain': 32}),
+    ('invalid', {'invalid_rate': 0.01}),
+)
+
+# Crecimiento del tiempo por instrucción, entre un tamaño y el siguiente, a
+# partir del cual se advierte un posible comportamiento no lineal
+SUPERLINEAR_FACTOR = 2.0
+
+
+def run_stages(transpiler, code):
+    """
+    Ejecuta las etapas del transpilador en orden
+
+    Yields:
+        str: Nombre de cada etapa al terminarla; el llamador mide el intervalo
+    """
+    tokens, lex_errors = transpiler.tokenize(code)
+    yield 'tokenize'
+    ast, parse_errors = transpiler.parse(tokens)
+    del tokens
+    yield 'parse'
+    if ast is None or lex_errors or parse_errors:
+        return
+    semantic_errors = transpiler.analyze_semantics(ast)
+    yield 'analyze_semantics'
+    if semantic_errors:
+        return
+    ir = transpiler.lower(ast)
+    yield 'lower'
+    transpiler.generate_python_code(ir)
+    yield 'generate_python_code'
+
+
+def time_stages(transpiler, code):
+    """Tiempo de cada etapa y del compile() completo, en segundos"""
+    times = {}
+    start = time.perf_counter()
+    for stage in run_stages(transpiler, code):
+        now = time.perf_counter()
+        times[stage] = now - start
+        start = now
+
+    start = time.perf_counter()
+    transpiler.compile(code)
+    times['compile'] = time.perf_counter() - start
+    return times
+
+
+def peak_stages(transpiler, code):
+    """Pico de memoria de cada etapa y del compile() completo, en bytes"""
+    peaks = {}
+    tracemalloc.start()
+    for stage in run_stages(transpiler, code):
+        _, peaks[stage] = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    transpiler.compile(code)
+    _, peaks['compile'] = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peaks
+
+
+def benchmark(sizes, seed=0, repeat=3, memory_limit=100000):
+    """
+    Ejecuta el benchmark para cada variante y tamaño
+
+    Args:
+        sizes (tuple): Números de instrucciones a medir
+        seed (int): Semilla del generador de programas
+        repeat (int): Repeticiones por medición; se guarda el mejor tiempo
+        memory_limit (int): Tamaño máximo al que se mide memoria (tracemalloc
+            multiplica varias veces el tiempo de ejecución)
+
+    Returns:
+        list: Un dict por variante, tamaño y etapa
+    """
+    transpiler = UMGPPTranspiler()
+    results = []
+    for variant, options in VARIANTS:
+        for size in sizes:
+            code = generate_program(size, seed=seed, **options)
+            # Los programas grandes se miden menos veces
+            runs = repeat if size <= 100000 else 1
+            best = {}
+            for _ in range(runs):
+                gc.collect()
+                for stage, seconds in time_stages(transpiler, code).items():
+                    best[stage] = min(seconds, best.get(stage, seconds))
+
+            peaks = peak_stages(transpiler, code) if size <= memory_limit else {}
+            for stage, seconds in best.items():
+                results.append({
+                    'variant': variant,
+                    'size': size,
+                    'source_bytes': len(code),
+                    'stage': stage,
+                    'seconds': seconds,
+                    'peak_bytes': peaks.get(stage)
+                })
+            print(f"{variant:>12} {size:>9} {best['compile']:>9.4f}s", file=sys.stderr)
+    return results
+
+
+def scaling_warnings(results):
+    """
+    Detecta etapas cuyo tiempo por instrucción crece con el tamaño
+
+    Returns:
+        list: Mensajes de advertencia
+    """
+    series = {}
+    for entry in results:
+        series.setdefault((entry['variant'], entry['stage']), []).append(entry)
+
+    warnings = []
+    for (variant, stage), entries in series.items():
+        entries.sort(key=lambda entry: entry['size'])
+        for small, large in zip(entries, entries[1:]):
+            # Tamaños pequeños: el tiempo fijo domina y la medición es ruidosa
+            if small['size'] < 1000:
+                continue
+            growth = (large['seconds'] / large['size']) / (small['seconds'] / small['size'])
+            if growth > SUPERLINEAR_FACTOR:
+                warnings.append(
+                    f"{variant}/{stage}: el tiempo por instrucción crece x{growth:.1f} "
+                    f"de {small['size']} a {large['size']} instrucciones"
+                )
+    return warnings
+
+
+def compare(previous, current, threshold):
+    """
+    Compara dos ejecuciones del benchmark
+
+    Args:
+        previous (list): Resultados anteriores
+        current (list): Resultados actuales
+        threshold (float): Razón de tiempo a partir de la cual hay regresión
+
+    Returns:
+        list: Mensajes de regresión
+    """
+    before = {(entry['variant'], entry['size'], entry['stage']): entry for entry in previous}
+    regressions = []
+    print(f"{'variante':>12} {'instr':>9} {'etapa':>22} {'antes s':>9} {'ahora s':>9} {'razón':>6}", file=sys.stderr)
+    for entry in current:
+        key = (entry['variant'], entry['size'], entry['stage'])
+        old = before.get(key)
+        if old is None or not old['seconds']:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        print(f"{key[0]:>12} {key[1]:>9} {key[2]:>22} {old['seconds']:>9.4f} {entry['seconds']:>9.4f} {ratio:>6.2f}",
+              file=sys.stderr)
+        # Las mediciones de menos de un milisegundo son demasiado ruidosas
+        if ratio > threshold and entry['seconds'] > 0.001:
+            regressions.append(f"{key[0]}/{key[2]} con {key[1]} instrucciones: x{ratio:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--memory-limit', type=int, default=100000,
+                        help='tamaño máximo al que se mide memoria')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--compare', help='resultados JSON de una ejecución anterior')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='razón de tiempo que se considera regresión')
+    args = parser.parse_args(argv)
+
+    results = benchmark(tuple(args.sizes), args.seed, args.repeat, args.memory_limit)
+    report = {
+        'compiler_version': COMPILER_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    problems = scaling_warnings(results)
+    if args.compare:
+        with open(args.compare) as f:
+            problems += compare(json.load(f)['results'], results, args.threshold)
+
+    for problem in problems:
+        print(f"ADVERTENCIA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Benchmark del análisis estático de trayectorias
+Compara el tiempo de trajectory.analyze con NumPy y en Python puro sobre
+programas sintéticos, y el de un bloque REPEAT con el máximo de repeticiones.
+Ejecutar con: python -m benchmarks.bench_trajectory [instrucciones ...]
+"""
+import sys
+import time
+
+from roverapp import trajectory
+from roverapp.transpiler import UMGPPTranspiler
+from benchmarks.generator import generate_program
+
+
+def best_time(function, repeat=3):
+    """Mejor tiempo de varias ejecuciones, en segundos"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes=(1000, 100000, 1000000)):
+    transpiler = UMGPPTranspiler()
+    engines = [('python', False)]
+    if trajectory.np is not None:
+        engines.insert(0, ('numpy', True))
+    else:
+        print("NumPy no está instalado: solo se mide la versión en Python puro")
+
+    print(f"{'instr':>8} {'comandos':>9} " + " ".join(f"{name + ' ms':>10}" for name, _ in engines))
+    for size in sizes:
+        ir = transpiler.compile(generate_program(size, seed=size))['ir']
+        times = [best_time(lambda: trajectory.analyze(ir, use_numpy=use_numpy)) * 1000
+                 for _, use_numpy in engines]
+        print(f"{size:>8} {len(ir):>9} " + " ".join(f"{ms:>10.2f}" for ms in times))
+
+    # compile() limita los comandos ejecutados; un programa binario (wire) no
+    code = ("PROGRAM largo BEGIN REPEAT 1 BEGIN girar(1); caminar(7); cuadrado(30); "
+            "girar(0); avanzar_mts(3); END; END.")
+    ir = transpiler.compile(code)['ir']
+    ir.operands[0] = 2147483647
+    result = trajectory.analyze(ir)
+    ms = best_time(lambda: trajectory.analyze(ir)) * 1000
+    print(f"REPEAT 2147483647: {result['commands']} comandos ejecutados analizados en {ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 100000, 1000000))
@@ -0,0 +1,59 @@
+"""
+Benchmark del formato de envío de programas al ESP8266
+Compara el tamaño del cuerpo de la solicitud y el tiempo de codificación del
+formato de texto actual (JSON {"comando": "programa:cmd,cmd,..."}) con el
+formato binario de roverapp.wire, y el tiempo del decodificador de referencia.
+Ejecutar con: python -m benchmarks.bench_wire [instrucciones ...]
+"""
+import json
+import sys
+import time
+
+from roverapp.transpiler import UMGPPTranspiler, esp8266_binary, esp8266_commands
+from roverapp.wire import decode
+from benchmarks.generator import generate_program
+
+
+def text_payload(ir):
+    """Cuerpo de la solicitud en el formato de texto"""
+    commands = esp8266_commands(ir.opcodes, ir.operands)
+    return json.dumps({"comando": "programa:" + ",".join(commands)}).encode()
+
+
+def binary_payload(ir):
+    """Cuerpo de la solicitud en el formato binario"""
+    return esp8266_binary(ir.opcodes, ir.operands)
+
+
+def best_time(function, argument, repeat):
+    """Mejor tiempo de varias ejecuciones, en segundos"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes=(10, 1000, 100000)):
+    transpiler = UMGPPTranspiler()
+    print(f"{'instr':>7} {'cmds':>7} {'texto B':>9} {'bin B':>8} {'B/cmd':>11} {'ahorro':>7} "
+          f"{'texto ms':>9} {'bin ms':>8} {'decod ms':>9}")
+    for size in sizes:
+        ir = transpiler.compile(generate_program(size, seed=size))['ir']
+        repeat = max(3, 100000 // size)
+        text = text_payload(ir)
+        binary = binary_payload(ir)
+        assert decode(binary) == (ir.opcodes, ir.operands)
+
+        text_ms = best_time(text_payload, ir, repeat) * 1000
+        binary_ms = best_time(binary_payload, ir, repeat) * 1000
+        decode_ms = best_time(decode, binary, repeat) * 1000
+        per_command = f"{len(text) / len(ir):.1f}/{len(binary) / len(ir):.1f}"
+        print(f"{size:>7} {len(ir):>7} {len(text):>9} {len(binary):>8} {per_command:>11} "
+              f"{(1 - len(binary) / len(text)) * 100:>6.0f}% "
+              f"{text_ms:>9.3f} {binary_ms:>8.3f} {decode_ms:>9.3f}")
+
+
+if __name__ == '__main__':
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (10, 1000, 100000))
@@ -0,0 +1,101 @@
+"""
+Generador de programas UMG++ sintéticos para pruebas de rendimiento
+Con la misma semilla produce siempre el mismo programa, de modo que los
+resultados de distintas ejecuciones se pueden comparar.
+"""
+import random
+
+ADVANCES = ('avanzar_vlts', 'avanzar_ctms', 'avanzar_mts')
+SIMPLE = ('avanzar_vlts', 'avanzar_ctms', 'avanzar_mts', 'rotar', 'caminar', 'moonwalk')
+SHAPES = ('circulo', 'cuadrado')
+
+# Errores que se pueden inyectar en un programa inválido, por etapa
+ERROR_KINDS = ('lexical', 'syntax', 'semantic')
+
+
+def _nonzero(rng, limit=500):
+    value = rng.randint(1, limit)
+    return value if rng.random() < 0.8 else -value
+
+
+def valid_instruction(rng, max_chain=4):
+    """
+    Genera una instrucción UMG++ válida
+
+    Args:
+        rng (random.Random): Generador de números aleatorios
+        max_chain (int): Máximo de girar(...) encadenados con +
+
+    Returns:
+        str: Instrucción terminada en punto y coma
+    """
+    kind = rng.random()
+    if kind < 0.4:
+        giros = '+'.join(f"girar({rng.choice((-1, 0, 1))})" for _ in range(rng.randint(1, max_chain)))
+        if rng.random() < 0.8:
+            giros += f"+{rng.choice(ADVANCES)}({_nonzero(rng)})"
+        return giros + ';'
+    if kind < 0.85:
+        return f"{rng.choice(SIMPLE)}({_nonzero(rng)});"
+    return f"{rng.choice(SHAPES)}({rng.randint(10, 200)});"
+
+
+def invalid_instruction(rng, kind=None):
+    """
+    Genera una instrucción con un error de la etapa indicada
+
+    Args:
+        rng (random.Random): Generador de números aleatorios
+        kind (str): 'lexical', 'syntax' o 'semantic'; al azar si es None
+
+    Returns:
+        str: Instrucción con el error
+    """
+    kind = kind or rng.choice(ERROR_KINDS)
+    if kind == 'lexical':
+        return f"avanzar_ctms({rng.randint(1, 100)}) @;"
+    if kind == 'syntax':
+        return rng.choice((
+            f"avanzar_ctms({rng.randint(1, 100)})",
+            f"girar(1)+girar(0)+({rng.randint(1, 100)});",
+            f"rotar {rng.randint(1, 5)};",
+        ))
+    return rng.choice((
+        f"girar({rng.randint(2, 9)})+avanzar_mts(1);",
+        f"circulo({rng.randint(201, 999)});",
+        "caminar(0);",
+    ))
+
+
+def generate_program(instructions, seed=0, invalid_rate=0.0, error_kind=None,
+                     max_chain=4, per_line=1, name='sintetico'):
+    """
+    Genera un programa UMG++ completo
+
+    Args:
+        instructions (int): Número de instrucciones del cuerpo
+        seed (int): Semilla del generador
+        invalid_rate (float): Proporción de instrucciones con errores
+        error_kind (str): Etapa de los errores inyectados, o None para mezclar
+        max_chain (int): Máximo de girar(...) encadenados con +
+        per_line (int): Instrucciones por línea
+        name (str): Nombre del programa
+
+    Returns:
+        str: Código fuente en UMG++
+    """
+    rng = random.Random(seed)
+    lines = [f"PROGRAM {name}", "BEGIN"]
+    current = []
+    for _ in range(instructions):
+        if invalid_rate and rng.random() < invalid_rate:
+            current.append(invalid_instruction(rng, error_kind))
+        else:
+            current.append(valid_instruction(rng, max_chain))
+        if len(current) == per_line:
+            lines.append('    ' + ' '.join(current))
+            current = []
+    if current:
+        lines.append('    ' + ' '.join(current))
+    lines.append("END.")
+    return '\n'.join(lines)
@@ -0,0 +1,413 @@
+"""
+Arena del rover: límites, obstáculos y verificación de recorridos
+Permite rechazar o advertir, antes de enviar un programa, que el rover saldría
+de la arena o chocaría con un obstáculo. La arena es un rectángulo con
+obstáculos poligonales; los lados de los obstáculos se guardan en una
+cuadrícula uniforme (celdas de cell_size cm), así que cada tramo del recorrido
+solo se compara con los lados de las celdas que atraviesa y no con todos.
+
+El recorrido de un programa es el de rover_control.Rover con reloj virtual:
+un punto por cada pausa del rover, igual que en rover_control.TrajectoryRecorder,
+cada uno con el comando de la representación intermedia que lo produjo, para
+ubicar el primer choque en el código fuente (roverapp.source_map).
+
+Configuración (settings.py, todas opcionales):
+    UMGPP_ARENA: {'bounds': [min_x, min_y, max_x, max_y], 'obstacles':
+        [[[x, y], ...], ...], 'cell_size': cm}; sin este setting no se verifica
+    UMGPP_ARENA_ACTION: 'reject' (por defecto) para no enviar los programas que
+        chocan o 'warn' para enviarlos con una advertencia
+    UMGPP_ARENA_MAX_POINTS: Puntos del recorrido como máximo (por defecto 500000)
+    UMGPP_ARENA_MAX_COMMANDS: Comandos ejecutados como máximo (por defecto 1000000)
+"""
+import math
+import threading
+from array import array
+
+from . import rover_control
+from .ir import ProgramIR, GIRAR, REPEAT, END_REPEAT, matching_ends
+from .simulation import parse_commands
+from .source_map import command_map
+from .transpiler import PYTHON_CALLS, GIRAR_CALLS
+
+# Puntos del recorrido como máximo al verificar un programa
+MAX_POINTS = 500_000
+
+# Comandos ejecutados como máximo: girar no pausa al rover ni agrega puntos
+MAX_COMMANDS = 1_000_000
+
+
+class Arena:
+    """
+    Rectángulo con obstáculos poligonales y un índice de cuadrícula de sus lados
+
+    Attributes:
+        bounds (tuple): (min_x, min_y, max_x, max_y) en cm
+        obstacles (list): Polígonos, cada uno una lista de vértices (x, y)
+        cell_size (float): Lado de las celdas de la cuadrícula en cm
+    """
+
+    def __init__(self, bounds, obstacles=(), cell_size=None):
+        """
+        Args:
+            bounds (sequence): (min_x, min_y, max_x, max_y) en cm
+            obstacles (iterable): Polígonos como listas de vértices (x, y)
+            cell_size (float): Lado de las celdas; por defecto, el tamaño
+                medio de los obstáculos
+
+        Raises:
+            ValueError: Si los límites o algún obstáculo no son válidos
+        """
+        min_x, min_y, max_x, max_y = (float(value) for value in bounds)
+        if min_x >= max_x or min_y >= max_y:
+            raise ValueError('Los límites de la arena no forman un rectángulo')
+        self.bounds = (min_x, min_y, max_x, max_y)
+        self.obstacles = [[(float(x), float(y)) for x, y in polygon] for polygon in obstacles]
+        if any(len(polygon) < 3 for polygon in self.obstacles):
+            raise ValueError('Cada obstáculo necesita al menos 3 vértices')
+
+        # Lados de todos los obstáculos: extremos y obstáculo al que pertenecen
+        self._edges = []
+        self._boxes = []
+        for owner, polygon in enumerate(self.obstacles):
+            xs = [x for x, _ in polygon]
+            ys = [y for _, y in polygon]
+            self._boxes.append((min(xs), min(ys), max(xs), max(ys)))
+            for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1]):
+                self._edges.append((ax, ay, bx, by, owner))
+
+        if cell_size is None:
+            sizes = [max(box[2] - box[0], box[3] - box[1]) for box in self._boxes]
+            cell_size = sum(sizes) / len(sizes) if sizes else max(max_x - min_x, max_y - min_y)
+        if cell_size <= 0:
+            raise ValueError('El tamaño de celda debe ser positivo')
+        self.cell_size = float(cell_size)
+
+        # Celda -> índices de los lados cuyo rectángulo envolvente la toca
+        self._grid = {}
+        for index, (ax, ay, bx, by, _) in enumerate(self._edges):
+            for cx in range(self._cell(min(ax, bx)), self._cell(max(ax, bx)) + 1):
+                for cy in range(self._cell(min(ay, by)), self._cell(max(ay, by)) + 1):
+                    self._grid.setdefault((cx, cy), []).append(index)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Crea la arena a partir de {'bounds', 'obstacles', 'cell_size'} (UMGPP_ARENA)"""
+        return cls(data['bounds'], data.get('obstacles', ()), data.get('cell_size'))
+
+    def _cell(self, coordinate):
+        return math.floor(coordinate / self.cell_size)
+
+    def inside(self, x, y):
+        """True si el punto está dentro de los límites de la arena"""
+        min_x, min_y, max_x, max_y = self.bounds
+        return min_x <= x <= max_x and min_y <= y <= max_y
+
+    def obstacle_at(self, x, y):
+        """
+        Obstáculo que contiene un punto
+
+        Returns:
+            int: Índice del obstáculo, o None si el punto está libre
+        """
+        for owner, (min_x, min_y, max_x, max_y) in enumerate(self._boxes):
+            if min_x <= x <= max_x and min_y <= y <= max_y and _contains(self.obstacles[owner], x, y):
+                return owner
+        return None
+
+    def _cells(self, x0, y0, x1, y1):
+        # Celdas que atraviesa el tramo, en orden (Amanatides y Woo), con la
+        # fracción del tramo en que sale de cada una
+        size = self.cell_size
+        cx, cy = self._cell(x0), self._cell(y0)
+        end_x, end_y = self._cell(x1), self._cell(y1)
+        if cx == end_x and cy == end_y:
+            yield (cx, cy), 1.0
+            return
+        dx = x1 - x0
+        dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        t_max_x = ((cx + (dx > 0)) * size - x0) / dx if dx else math.inf
+        t_max_y = ((cy + (dy > 0)) * size - y0) / dy if dy else math.inf
+        t_delta_x = size / abs(dx) if dx else math.inf
+        t_delta_y = size / abs(dy) if dy else math.inf
+        for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+            yield (cx, cy), min(t_max_x, t_max_y)
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t_max_y += t_delta_y
+        yield (cx, cy), 1.0
+
+    def _segment_hit(self, x0, y0, x1, y1):
+        # Primer lado de obstáculo que toca el tramo: (t, obstáculo) o None
+        grid = self._grid
+        edges = self._edges
+        best = None
+        seen = set()
+        for cell, leave in self._cells(x0, y0, x1, y1):
+            candidates = grid.get(cell)
+            if candidates:
+                for index in candidates:
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    ax, ay, bx, by, owner = edges[index]
+                    t = _intersection(x0, y0, x1, y1, ax, ay, bx, by)
+                    if t is not None and (best is None or t < best[0]):
+                        best = (t, owner)
+            if best is not None and best[0] <= leave:
+                # Las celdas siguientes solo tienen choques más adelante
+                return best
+        return best
+
+    def first_collision(self, xs, ys):
+        """
+        Primer punto en que un recorrido sale de la arena o toca un obstáculo
+
+        Args:
+            xs (sequence): Coordenadas x de los puntos del recorrido
+            ys (sequence): Coordenadas y
+
+        Returns:
+            dict: 'index' (primer punto del recorrido que ya no es válido; el
+                choque ocurre en el tramo que llega a él), 'type' ('boundary'
+                u 'obstacle'), 'obstacle' (índice o None) y 'x', 'y' del punto
+                de choque; None si el recorrido es válido
+        """
+        if not len(xs):
+            return None
+        x0, y0 = xs[0], ys[0]
+        if not self.inside(x0, y0):
+            return _collision(0, 'boundary', None, x0, y0)
+        owner = self.obstacle_at(x0, y0)
+        if owner is not None:
+            return _collision(0, 'obstacle', owner, x0, y0)
+
+        min_x, min_y, max_x, max_y = self.bounds
+        grid = self._grid
+        cell_size = self.cell_size
+        floor = math.floor
+        previous_cell = (floor(x0 / cell_size), floor(y0 / cell_size))
+        for index in range(1, len(xs)):
+            x1, y1 = xs[index], ys[index]
+            cell = (floor(x1 / cell_size), floor(y1 / cell_size))
+            hit = None
+            # Caso común: el tramo no sale de una celda vacía
+            if cell != previous_cell or previous_cell in grid:
+                hit = self._segment_hit(x0, y0, x1, y1)
+            if not (min_x <= x1 <= max_x and min_y <= y1 <= max_y):
+                t = _exit(x0, y0, x1, y1, self.bounds)
+                if hit is None or t < hit[0]:
+                    hit = (t, None)
+            if hit is not None:
+                t, owner = hit
+                return _collision(index, 'boundary' if owner is None else 'obstacle', owner,
+                                  x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+            x0, y0 = x1, y1
+            previous_cell = cell
+        return None
+
+    def check_program(self, program, max_points=MAX_POINTS, max_commands=MAX_COMMANDS):
+        """
+        Verifica el recorrido de un programa en rover_control.Rover
+
+        Args:
+            program (ProgramIR | list): Representación intermedia o lista de
+                comandos para el ESP8266
+            max_points (int): Puntos del recorrido como máximo
+            max_commands (int): Comandos ejecutados como máximo
+
+        Returns:
+            dict: Como first_collision, con 'comando' (índice del comando en
+                la representación intermedia o en la lista de comandos) y,
+                para una representación intermedia, 'line' y 'column' en el
+                código UMG++; None si el recorrido es válido
+
+        Raises:
+            ValueError: Si los comandos no son válidos o el recorrido tiene
+                más de max_points puntos o de max_commands comandos
+        """
+        text = isinstance(program, list)
+        ir = ProgramIR('comandos', *parse_commands(program)) if text else program
+        xs, ys, commands = rover_path(ir, max_points, max_commands)
+        collision = self.first_collision(xs, ys)
+        if collision is None:
+            return None
+        command = commands[collision['index']]
+        if text:
+            # La lista de comandos no tiene los marcadores END_REPEAT
+            command -= sum(1 for opcode in ir.opcodes[:command] if opcode == END_REPEAT)
+        else:
+            position = command_map(ir).lookup(command)
+            if position is not None:
+                collision.update(position)
+        collision['comando'] = command
+        return collision
+
+
+def collision_message(collision):
+    """
+    Descripción de un choque para el estudiante
+
+    Args:
+        collision (dict): Resultado de Arena.check_program
+
+    Returns:
+        str: Mensaje con la posición en el código fuente si se conoce
+    """
+    if collision['type'] == 'boundary':
+        message = 'El rover sale de la arena'
+    else:
+        message = f"El rover choca con el obstáculo {collision['obstacle'] + 1}"
+    if 'line' in collision:
+        message += f" (línea {collision['line']}, columna {collision['column']})"
+    return message
+
+
+def _collision(index, kind, owner, x, y):
+    return {'index': index, 'type': kind, 'obstacle': owner, 'x': x, 'y': y}
+
+
+def _contains(polygon, x, y):
+    """Punto dentro de un polígono (regla par-impar)"""
+    inside = False
+    for (ax, ay), (bx, by) in zip(polygon, polygon[-1:] + polygon[:-1]):
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+def _intersection(px, py, qx, qy, ax, ay, bx, by):
+    """Fracción del tramo p-q en que toca el lado a-b, o None"""
+    rx, ry = qx - px, qy - py
+    sx, sy = bx - ax, by - ay
+    denominator = rx * sy - ry * sx
+    wx, wy = ax - px, ay - py
+    if denominator == 0:
+        # Paralelos: solo se tocan si son colineales y se superponen
+        length = rx * rx + ry * ry
+        if not length or wx * ry - wy * rx:
+            return None
+        t0 = (wx * rx + wy * ry) / length
+        t1 = t0 + (sx * rx + sy * ry) / length
+        if max(t0, t1) < 0 or min(t0, t1) > 1:
+            return None
+        return max(0.0, min(t0, t1))
+    t = (wx * sy - wy * sx) / denominator
+    u = (wx * ry - wy * rx) / denominator
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return t
+    return None
+
+
+def _exit(x0, y0, x1, y1, bounds):
+    """Fracción del tramo en que sale del rectángulo, desde un punto interior"""
+    min_x, min_y, max_x, max_y = bounds
+    t = 1.0
+    if x1 < min_x:
+        t = min(t, (min_x - x0) / (x1 - x0))
+    elif x1 > max_x:
+        t = min(t, (max_x - x0) / (x1 - x0))
+    if y1 < min_y:
+        t = min(t, (min_y - y0) / (y1 - y0))
+    elif y1 > max_y:
+        t = min(t, (max_y - y0) / (y1 - y0))
+    return t
+
+
+class _PathRecorder:
+    """Registro sin límite de capacidad del recorrido completo, con el comando de cada punto"""
+
+    def __init__(self, max_points):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.commands = array('I')
+        self.command = 0
+        self.max_points = max_points
+
+    def record(self, x, y, orientation, elapsed):
+        if len(self.xs) >= self.max_points:
+            raise ValueError(f"El recorrido tiene más de {self.max_points} puntos")
+        self.xs.append(x)
+        self.ys.append(y)
+        self.commands.append(self.command)
+
+
+def _indexed_commands(opcodes, operands, start, end, ends, counts):
+    # Como ProgramIR.expanded_commands, con el índice de cada comando; los
+    # bloques sin comandos (counts: comandos antes de cada posición) se saltan
+    index = start
+    while index < end:
+        opcode = opcodes[index]
+        if opcode == REPEAT:
+            block_end = ends[index]
+            if counts[block_end] > counts[index]:
+                for _ in range(operands[index]):
+                    yield from _indexed_commands(opcodes, operands, index + 1, block_end, ends, counts)
+            index = block_end + 1
+            continue
+        yield index, opcode, operands[index]
+        index += 1
+
+
+def rover_path(ir, max_points=MAX_POINTS, max_commands=MAX_COMMANDS):
+    """
+    Recorrido de un programa en rover_control.Rover con reloj virtual
+
+    Args:
+        ir (ProgramIR): Representación intermedia del programa
+        max_points (int): Puntos del recorrido como máximo
+        max_commands (int): Comandos ejecutados como máximo
+
+    Returns:
+        tuple: (xs, ys, commands): coordenadas de cada punto ('d') y comando
+            de la representación intermedia que lo produjo ('I'); el primer
+            punto es la posición inicial
+
+    Raises:
+        ValueError: Si el recorrido tiene más de max_points puntos o el
+            programa ejecuta más de max_commands comandos
+    """
+    recorder = _PathRecorder(max_points)
+    rover = rover_control.Rover(clock=rover_control.VirtualClock(), recorder=recorder)
+    opcodes = ir.opcodes
+    operands = ir.operands
+    counts = [0]
+    for opcode in opcodes:
+        counts.append(counts[-1] + (opcode != REPEAT and opcode != END_REPEAT))
+    commands = _indexed_commands(opcodes, operands, 0, len(opcodes), matching_ends(opcodes), counts)
+    for executed, (index, opcode, operand) in enumerate(commands):
+        if executed >= max_commands:
+            raise ValueError(f"El programa ejecuta más de {max_commands} comandos")
+        recorder.command = index
+        if opcode == GIRAR:
+            getattr(rover, GIRAR_CALLS.get(operand, 'move_straight'))()
+        else:
+            getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+    return recorder.xs, recorder.ys, recorder.commands
+
+
+_arena = None
+_arena_lock = threading.Lock()
+
+
+def get_arena():
+    """
+    Arena configurada en settings (UMGPP_ARENA)
+
+    Returns:
+        Arena: Instancia compartida por las vistas, o None si no hay arena
+    """
+    global _arena
+    from django.conf import settings
+
+    data = getattr(settings, 'UMGPP_ARENA', None)
+    if data is None:
+        return None
+    if _arena is None or _arena[0] is not data:
+        with _arena_lock:
+            _arena = (data, Arena.from_dict(data))
+    return _arena[1]
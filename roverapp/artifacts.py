@@ -0,0 +1,125 @@
+"""
+Artefactos de compilación guardados junto a los programas
+Al guardar un programa se guarda también el resultado de compilarlo (la
+representación intermedia, los comandos para el ESP8266, el código Python y
+los errores o la trayectoria) en <programa>.umgpp.json. Cargar o ejecutar el
+programa usa el artefacto mientras coincidan el hash del código fuente y la
+versión del compilador; si no coinciden se compila de nuevo y el artefacto se
+reemplaza.
+
+Para ejecutar un programa guardado no hace falta leer el código fuente: el
+artefacto registra el tamaño y la fecha de modificación del archivo .umgpp y
+basta con compararlos (os.stat) para saber que sigue vigente.
+"""
+import json
+import os
+
+from .compile_cache import compile_cached, source_hash
+from .ir import ProgramIR
+from .transpiler import COMPILER_VERSION
+
+# Versión del formato del archivo de artefacto
+ARTIFACT_FORMAT = 1
+ARTIFACT_SUFFIX = '.json'
+
+
+def artifact_path(source_path):
+    """Ruta del artefacto de un programa (programa.umgpp -> programa.umgpp.json)"""
+    return source_path + ARTIFACT_SUFFIX
+
+
+def write_artifact(source_path, code, result):
+    """
+    Guarda el resultado de compilar un programa junto a su código fuente
+
+    Args:
+        source_path (str): Ruta del archivo .umgpp ya guardado
+        code (str): Código fuente guardado en source_path
+        result (dict): Resultado de la compilación de code
+
+    Returns:
+        str: Ruta del artefacto
+    """
+    stats = os.stat(source_path)
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'compiler_version': COMPILER_VERSION,
+        'source_hash': source_hash(code),
+        'source_size': stats.st_size,
+        'source_mtime_ns': stats.st_mtime_ns,
+        # El AST no hace falta para ejecutar y es la parte más grande
+        'result': {key: value for key, value in result.items() if key not in ('ir', 'ast')},
+        'ir': result['ir'].to_dict() if 'ir' in result else None
+    }
+
+    path = artifact_path(source_path)
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+    # Quien lea el artefacto nunca ve un archivo a medio escribir
+    os.replace(temporary, path)
+    return path
+
+
+def load_artifact(source_path, code=None):
+    """
+    Resultado guardado de un programa, si sigue vigente
+
+    Args:
+        source_path (str): Ruta del archivo .umgpp
+        code (str): Código fuente ya leído; si se indica se compara su hash,
+            si no se comparan el tamaño y la fecha de modificación del archivo
+
+    Returns:
+        dict: Resultado de la compilación (con 'ir' si tuvo éxito y sin
+            'ast'), o None si no hay artefacto o no coincide
+    """
+    try:
+        with open(artifact_path(source_path), 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if artifact.get('format') != ARTIFACT_FORMAT or artifact.get('compiler_version') != COMPILER_VERSION:
+        return None
+    if code is not None:
+        if artifact.get('source_hash') != source_hash(code):
+            return None
+    else:
+        try:
+            stats = os.stat(source_path)
+        except OSError:
+            return None
+        if (stats.st_size, stats.st_mtime_ns) != (artifact.get('source_size'), artifact.get('source_mtime_ns')):
+            return None
+
+    result = artifact['result']
+    if artifact.get('ir') is not None:
+        result['ir'] = ProgramIR.from_dict(artifact['ir'])
+    return result
+
+
+def compile_program(source_path, code=None):
+    """
+    Resultado de compilar un programa guardado, desde su artefacto si está vigente
+
+    Sin artefacto vigente se compila (con la caché de compilación) y se
+    guarda el artefacto para la próxima vez.
+
+    Args:
+        source_path (str): Ruta del archivo .umgpp
+        code (str): Código fuente ya leído, o None para leerlo solo si hace falta
+
+    Returns:
+        dict: Resultado de la compilación (no debe modificarse)
+    """
+    result = load_artifact(source_path, code)
+    if result is not None:
+        return result
+
+    if code is None:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            code = f.read()
+    result = compile_cached(code)
+    write_artifact(source_path, code, result)
+    return result
@@ -0,0 +1,122 @@
+"""
+Representación compacta de tokens y nodos del AST de UMG++
+Registros con __slots__ para que los programas grandes no paguen un
+diccionario por cada token o instrucción. Cada registro puede convertirse a
+la forma de diccionario que devuelve /api/compile/.
+"""
+
+
+class Token:
+    """Token producido por el analizador léxico"""
+    __slots__ = ('type', 'value', 'line', 'column')
+
+    def __init__(self, type, value, line, column):
+        self.type = type
+        self.value = value
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return f"Token({self.type!r}, {self.value!r}, {self.line}, {self.column})"
+
+    def __eq__(self, other):
+        return (isinstance(other, Token) and self.type == other.type and self.value == other.value
+                and self.line == other.line and self.column == other.column)
+
+    @classmethod
+    def from_dict(cls, token):
+        """Crea un token a partir de su forma de diccionario"""
+        return cls(token['type'], token['value'], token['line'], token['column'])
+
+    def to_dict(self):
+        """Forma de diccionario del token"""
+        return {
+            'type': self.type,
+            'value': self.value,
+            'line': self.line,
+            'column': self.column
+        }
+
+
+class Call:
+    """Llamada simple a una función con un parámetro entero, con la posición de la función"""
+    __slots__ = ('function', 'parameter', 'line', 'column')
+
+    def __init__(self, function, parameter, line=0, column=0):
+        self.function = function
+        self.parameter = parameter
+        self.line = line
+        self.column = column
+
+    def to_dict(self):
+        return {
+            'function': self.function,
+            'parameter': self.parameter
+        }
+
+
+class Instruction(Call):
+    """Instrucción independiente, por ejemplo avanzar_ctms(10);"""
+    __slots__ = ()
+    type = 'instruction'
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'function': self.function,
+            'parameter': self.parameter
+        }
+
+
+class GiroCombination:
+    """Combinación girar(...)+girar(...)+avanzar_*(...);"""
+    __slots__ = ('giros', 'advance')
+    type = 'giro_combination'
+
+    def __init__(self, giros, advance):
+        self.giros = giros
+        self.advance = advance
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'giros': [giro.to_dict() for giro in self.giros],
+            'advance': self.advance.to_dict() if self.advance else None
+        }
+
+
+class Repeat:
+    """Bloque REPEAT n BEGIN ... END; con las instrucciones que se repiten y la posición de REPEAT"""
+    __slots__ = ('count', 'instructions', 'line', 'column')
+    type = 'repeat'
+
+    def __init__(self, count, instructions, line=0, column=0):
+        self.count = count
+        self.instructions = instructions
+        self.line = line
+        self.column = column
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'count': self.count,
+            'instructions': [instruction.to_dict() for instruction in self.instructions]
+        }
+
+
+class Program:
+    """Nodo raíz del programa"""
+    __slots__ = ('name', 'instructions')
+    type = 'program'
+
+    def __init__(self, name, instructions):
+        self.name = name
+        self.instructions = instructions
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'name': self.name,
+            'instructions': [instruction.to_dict() for instruction in self.instructions]
+        }
+
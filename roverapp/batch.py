@@ -0,0 +1,151 @@
+"""
+Compilación por lotes de programas UMG++
+Reparte muchos programas entre un grupo de procesos, cada uno con su propio
+transpilador reutilizable, para que la compilación (que usa CPU y retiene el
+GIL) aproveche todos los núcleos del servidor.
+
+Configuración (settings.py, opcionales):
+    UMGPP_BATCH_WORKERS: Procesos del grupo (por defecto, núcleos disponibles)
+    UMGPP_BATCH_CHUNK_SIZE: Programas por tarea enviada a un proceso (por defecto 8)
+    UMGPP_BATCH_MAX_PROGRAMS: Programas máximos por solicitud (por defecto 500)
+"""
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .transpiler import UMGPPTranspiler, public_result
+
+# Transpilador de cada proceso del grupo
+_worker_transpiler = None
+
+
+def _init_worker():
+    global _worker_transpiler
+    _worker_transpiler = UMGPPTranspiler()
+
+
+def _compile_chunk(codes, as_json):
+    results = [public_result(_worker_transpiler.compile(code)) for code in codes]
+    if as_json:
+        # Serializar en el proceso hijo evita volver a hacerlo en el servidor
+        return [json.dumps(result) for result in results]
+    return results
+
+
+class BatchCompiler:
+    """Grupo de procesos que compilan programas UMG++"""
+
+    def __init__(self, workers=None, chunk_size=8):
+        """
+        Args:
+            workers (int): Procesos del grupo, por defecto los núcleos disponibles
+            chunk_size (int): Programas por tarea enviada a un proceso
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def compile_iter(self, codes, as_json=False):
+        """
+        Compila los programas y devuelve cada resultado en cuanto termina
+
+        Los códigos repetidos dentro del lote se compilan una sola vez.
+
+        Args:
+            codes (list): Códigos fuente en UMG++
+            as_json (bool): Devolver cada resultado ya serializado en JSON
+
+        Yields:
+            tuple: (índice del programa en codes, resultado de la compilación
+                como dict, o como str si as_json)
+        """
+        positions = {}
+        for index, code in enumerate(codes):
+            positions.setdefault(code, []).append(index)
+
+        unique = list(positions)
+        executor = self._get_executor()
+        futures = {}
+        for start in range(0, len(unique), self.chunk_size):
+            chunk = unique[start:start + self.chunk_size]
+            futures[executor.submit(_compile_chunk, chunk, as_json)] = chunk
+
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                # Un proceso murió: el grupo se vuelve a crear en la próxima solicitud
+                self._reset_executor(executor)
+                result = {
+                    'success': False,
+                    'stage': 'internal',
+                    'message': 'El proceso de compilación terminó inesperadamente'
+                }
+                results = [json.dumps(result) if as_json else result] * len(chunk)
+
+            for code, result in zip(chunk, results):
+                for index in positions[code]:
+                    yield index, result
+
+    def compile_all(self, codes, as_json=False):
+        """
+        Compila los programas y devuelve los resultados en el mismo orden
+
+        Args:
+            codes (list): Códigos fuente en UMG++
+            as_json (bool): Devolver cada resultado ya serializado en JSON
+
+        Returns:
+            list: Resultados de la compilación
+        """
+        results = [None] * len(codes)
+        for index, result in self.compile_iter(codes, as_json):
+            results[index] = result
+        return results
+
+    def shutdown(self):
+        """Terminar los procesos del grupo"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+_batch_compiler = None
+_batch_lock = threading.Lock()
+
+
+def get_batch_compiler():
+    """
+    Grupo de compilación del proceso, configurado desde settings
+
+    Returns:
+        BatchCompiler: Instancia compartida por las vistas
+    """
+    global _batch_compiler
+    if _batch_compiler is None:
+        with _batch_lock:
+            if _batch_compiler is None:
+                from django.conf import settings
+
+                _batch_compiler = BatchCompiler(
+                    workers=getattr(settings, 'UMGPP_BATCH_WORKERS', None),
+                    chunk_size=getattr(settings, 'UMGPP_BATCH_CHUNK_SIZE', 8)
+                )
+    return _batch_compiler
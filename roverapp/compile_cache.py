@@ -0,0 +1,231 @@
+"""
+Caché de compilación de UMG++
+Guarda el resultado de compilar un código fuente con una clave que depende
+del contenido del código y de la versión del compilador. Tiene un nivel en
+memoria del proceso (LRU acotado) y un nivel opcional sobre el framework de
+caché de Django, compartido entre los procesos del servidor.
+
+Configuración (settings.py, todas opcionales):
+    UMGPP_COMPILE_CACHE_SIZE: Entradas del nivel en memoria (por defecto 512)
+    UMGPP_COMPILE_CACHE_MAX_BYTES: Tamaño estimado máximo del nivel en memoria
+        (por defecto 64 MB); un resultado más grande no se guarda en caché
+    UMGPP_COMPILE_CACHE_ALIAS: Alias de CACHES para el nivel compartido
+        (por defecto None, sin nivel compartido)
+    UMGPP_COMPILE_CACHE_TIMEOUT: Segundos que dura una entrada compartida
+        (por defecto un día)
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .transpiler import COMPILER_VERSION, transpile_to_python
+
+# Bytes de memoria estimados de un resultado por byte de código fuente: el AST,
+# el código Python, la representación intermedia y los mapas de fuente
+RESULT_BYTES_PER_SOURCE_BYTE = 32
+
+# Tamaño estimado máximo del nivel en memoria
+MAX_BYTES = 64 * 1024 * 1024
+
+# Segundos que dura una entrada del nivel compartido
+SHARED_TIMEOUT = 24 * 60 * 60
+
+
+def source_hash(code):
+    """
+    Hash del código fuente y de la versión del compilador
+    
+    Args:
+        code (str): Código fuente en UMG++
+        
+    Returns:
+        str: Hash SHA-256 en hexadecimal
+    """
+    digest = hashlib.sha256(COMPILER_VERSION.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(code.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CompilationCache:
+    """Caché de resultados de compilación con nivel local y compartido"""
+    
+    def __init__(self, max_entries=512, shared_cache=None, timeout=SHARED_TIMEOUT, max_bytes=MAX_BYTES):
+        """
+        Args:
+            max_entries (int): Entradas máximas en memoria del proceso
+            shared_cache: Caché de Django compartida, o None
+            timeout (int): Segundos que dura una entrada compartida
+            max_bytes (int): Tamaño estimado máximo de las entradas en memoria;
+                un resultado más grande no se guarda en ningún nivel
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.shared_cache = shared_cache
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+    
+    def compile(self, code, metrics=None, all_errors=False, optimize=False):
+        """
+        Compila el código o devuelve el resultado guardado
+        
+        El resultado devuelto se comparte entre llamadas y no debe modificarse.
+        Cada combinación de opciones se guarda en una entrada distinta, salvo
+        all_errors: una compilación exitosa da el mismo resultado con y sin
+        all_errors, así que se guarda en la entrada sin all_errors y las dos
+        formas de compilar la comparten; solo los fallos de all_errors, que
+        reúnen los errores de todas las etapas, tienen entrada propia.
+        
+        Args:
+            code (str): Código fuente en UMG++
+            metrics (CompileMetrics): Mediciones de la compilación, opcional;
+                si el resultado sale de la caché solo se mide la consulta
+            all_errors (bool): Reunir los errores de todas las etapas
+            optimize (bool): Optimizar los comandos antes de generar código
+            
+        Returns:
+            dict: Resultado de la compilación, igual al de transpile_to_python
+        """
+        if metrics is not None:
+            metrics.begin(code)
+        key = source_hash(code)
+        if optimize:
+            key += ':opt'
+        
+        size = len(code) * RESULT_BYTES_PER_SOURCE_BYTE
+        result, shared = self._lookup(key, size)
+        if all_errors and (result is None or not result['success']):
+            # El fallo de una compilación normal solo tiene la primera etapa
+            result, shared = self._lookup(key + ':all', size)
+        
+        if result is not None:
+            with self._lock:
+                if shared:
+                    self.shared_hits += 1
+                else:
+                    self.hits += 1
+            if metrics is not None:
+                metrics.cached = True
+                metrics.finish(result.get('stage'))
+            return result
+        
+        result = transpile_to_python(code, metrics, all_errors, optimize)
+        with self._lock:
+            self.misses += 1
+        size = len(code) * RESULT_BYTES_PER_SOURCE_BYTE
+        if size > self.max_bytes:
+            return result
+        
+        if all_errors and not result['success']:
+            key += ':all'
+        self._store(key, result, size)
+        
+        if self.shared_cache is not None:
+            self.shared_cache.set('umgpp:' + key, result, self.timeout)
+        
+        return result
+    
+    def _lookup(self, key, size):
+        """Resultado guardado en memoria o en el nivel compartido, y si vino de este"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0], False
+        
+        if self.shared_cache is not None:
+            result = self.shared_cache.get('umgpp:' + key)
+            if result is not None:
+                self._store(key, result, size)
+                return result, True
+        return None, False
+    
+    def _store(self, key, result, size):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+    
+    def stats(self):
+        """
+        Contadores de la caché
+        
+        Returns:
+            dict: Aciertos locales y compartidos, fallos, entradas en memoria y
+                su tamaño estimado en bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'compiler_version': COMPILER_VERSION,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'shared': self.shared_cache is not None
+            }
+    
+    def clear(self):
+        """Vaciar el nivel en memoria y reiniciar los contadores"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.shared_hits = self.misses = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Caché de compilación del proceso, configurada desde settings
+    
+    Returns:
+        CompilationCache: Instancia compartida por las vistas
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from django.conf import settings
+                from django.core.cache import caches
+                
+                alias = getattr(settings, 'UMGPP_COMPILE_CACHE_ALIAS', None)
+                _cache = CompilationCache(
+                    max_entries=getattr(settings, 'UMGPP_COMPILE_CACHE_SIZE', 512),
+                    shared_cache=caches[alias] if alias else None,
+                    timeout=getattr(settings, 'UMGPP_COMPILE_CACHE_TIMEOUT', SHARED_TIMEOUT),
+                    max_bytes=getattr(settings, 'UMGPP_COMPILE_CACHE_MAX_BYTES', MAX_BYTES)
+                )
+    return _cache
+
+
+def compile_cached(code, metrics=None, all_errors=False, optimize=False):
+    """
+    Función auxiliar para compilar usando la caché del proceso
+    
+    Args:
+        code (str): Código fuente en UMG++
+        metrics (CompileMetrics): Mediciones de la compilación, opcional
+        all_errors (bool): Reunir los errores de todas las etapas
+        optimize (bool): Optimizar los comandos antes de generar código
+        
+    Returns:
+        dict: Resultado de la compilación (no debe modificarse)
+    """
+    return get_cache().compile(code, metrics, all_errors, optimize)
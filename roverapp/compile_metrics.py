@@ -0,0 +1,223 @@
+"""
+Métricas de compilación de UMG++
+Mide el tiempo y los bloques de memoria de cada etapa de una compilación y
+acumula los resultados del proceso en histogramas de latencia por tamaño de
+programa. Solo se mide cuando se pasa un CompileMetrics a compile(); sin él
+la compilación no hace ningún trabajo adicional.
+
+Configuración (settings.py, opcional):
+    UMGPP_COMPILE_METRICS: Medir todas las compilaciones de /api/compile/ y
+        acumularlas (por defecto False; con False solo se miden las
+        solicitudes que piden 'diagnostics')
+"""
+import sys
+import threading
+import time
+
+# Etapas de compile(), en orden
+STAGES = ('lexical', 'syntax', 'semantic', 'lower', 'optimize', 'generation', 'analysis')
+
+# Límites superiores de los histogramas: tamaño en tokens y latencia en ms
+SIZE_BOUNDS = (100, 1000, 10000, 100000, 1000000)
+LATENCY_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _bucket(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+class CompileMetrics:
+    """
+    Mediciones de una compilación
+
+    Attributes:
+        stages (dict): Por etapa, {'seconds', 'allocated_blocks'}; el análisis
+            léxico ocurre intercalado con el sintáctico, por lo que sus bloques
+            se cuentan en 'syntax'
+        tokens (int): Tokens producidos por el lexer
+        instructions (int): Instrucciones del AST, o None si no se construyó
+        commands (int): Comandos generados para el rover
+        stage (str): Etapa donde falló la compilación, o None si tuvo éxito
+        cached (bool): El resultado salió de la caché y no se compiló
+        total_seconds (float): Duración de toda la compilación
+    """
+    __slots__ = ('stages', 'tokens', 'instructions', 'commands', 'source_bytes',
+                 'stage', 'cached', 'total_seconds', '_start', '_mark', '_blocks', '_lex_seconds')
+
+    def __init__(self):
+        self.stages = {}
+        self.tokens = 0
+        self.instructions = None
+        self.commands = 0
+        self.source_bytes = 0
+        self.stage = None
+        self.cached = False
+        self.total_seconds = 0.0
+        self._lex_seconds = 0.0
+
+    def begin(self, code):
+        """Inicia la medición de una compilación"""
+        self.source_bytes = len(code)
+        self._start = self._mark = time.perf_counter()
+        self._blocks = sys.getallocatedblocks()
+
+    def timed_tokens(self, tokens):
+        """
+        Envuelve el generador del lexer para medir su tiempo y contar tokens
+
+        Args:
+            tokens (iterator): Tokens de iter_tokens
+
+        Yields:
+            Token: Los mismos tokens
+        """
+        clock = time.perf_counter
+        next_token = tokens.__next__
+        while True:
+            start = clock()
+            try:
+                token = next_token()
+            except StopIteration:
+                self._lex_seconds += clock() - start
+                return
+            self._lex_seconds += clock() - start
+            self.tokens += 1
+            yield token
+
+    def mark(self, stage):
+        """Registra la etapa que termina en este momento"""
+        now = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        seconds = now - self._mark
+        if stage == 'syntax':
+            # El lexer corre dentro del parser: separar su tiempo
+            self.stages['lexical'] = {'seconds': self._lex_seconds, 'allocated_blocks': None}
+            seconds -= self._lex_seconds
+        self.stages[stage] = {'seconds': seconds, 'allocated_blocks': blocks - self._blocks}
+        self._mark = now
+        self._blocks = blocks
+
+    def finish(self, stage=None):
+        """Termina la medición; stage es la etapa que falló, si alguna"""
+        self.stage = stage
+        self.total_seconds = time.perf_counter() - self._start
+
+    def to_dict(self):
+        """Forma serializable en JSON de las mediciones"""
+        return {
+            'cached': self.cached,
+            'stage': self.stage,
+            'total_seconds': self.total_seconds,
+            'source_bytes': self.source_bytes,
+            'tokens': self.tokens,
+            'instructions': self.instructions,
+            'commands': self.commands,
+            'stages': self.stages
+        }
+
+
+class MetricsAggregate:
+    """Acumulado de las compilaciones medidas en el proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reiniciar todos los contadores"""
+        with self._lock:
+            self.compiles = 0
+            self.cached = 0
+            self.cached_seconds = 0.0
+            self.outcomes = {}
+            self.stage_totals = {stage: [0, 0.0, 0.0] for stage in STAGES}
+            self.histograms = [[0] * (len(LATENCY_BOUNDS_MS) + 1) for _ in range(len(SIZE_BOUNDS) + 1)]
+            self.requests = {mode: {'success': 0, 'failure': 0} for mode in ('first_stage', 'all_errors')}
+
+    def count_request(self, all_errors, success):
+        """
+        Cuenta una solicitud de compilación, se midan o no sus etapas
+
+        Las solicitudes fallidas por cada exitosa aproximan cuántas veces se
+        compila un programa hasta corregir todos sus errores en cada modo.
+
+        Args:
+            all_errors (bool): La solicitud pidió los errores de todas las etapas
+            success (bool): La compilación tuvo éxito
+        """
+        with self._lock:
+            mode = self.requests['all_errors' if all_errors else 'first_stage']
+            mode['success' if success else 'failure'] += 1
+
+    def record(self, metrics):
+        """
+        Agrega las mediciones de una compilación
+
+        Args:
+            metrics (CompileMetrics): Mediciones terminadas
+        """
+        with self._lock:
+            if metrics.cached:
+                # Una consulta a la caché no dice nada de las etapas
+                self.cached += 1
+                self.cached_seconds += metrics.total_seconds
+                return
+
+            self.compiles += 1
+            outcome = metrics.stage or 'success'
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            for stage, values in metrics.stages.items():
+                totals = self.stage_totals[stage]
+                totals[0] += 1
+                totals[1] += values['seconds']
+                totals[2] = max(totals[2], values['seconds'])
+            size = _bucket(SIZE_BOUNDS, metrics.tokens)
+            latency = _bucket(LATENCY_BOUNDS_MS, metrics.total_seconds * 1000)
+            self.histograms[size][latency] += 1
+
+    def snapshot(self):
+        """
+        Estado actual del acumulado
+
+        Returns:
+            dict: Contadores, tiempos por etapa e histogramas de latencia por
+                tamaño (una fila por rango de tokens, una columna por rango de ms)
+        """
+        with self._lock:
+            return {
+                'compiles': self.compiles,
+                'cached': self.cached,
+                'cached_seconds': self.cached_seconds,
+                'outcomes': dict(self.outcomes),
+                'stages': {
+                    stage: {
+                        'count': count,
+                        'total_seconds': total,
+                        'mean_seconds': total / count if count else 0.0,
+                        'max_seconds': maximum
+                    }
+                    for stage, (count, total, maximum) in self.stage_totals.items()
+                },
+                'size_bounds_tokens': list(SIZE_BOUNDS),
+                'latency_bounds_ms': list(LATENCY_BOUNDS_MS),
+                'histograms': [list(row) for row in self.histograms],
+                'requests': {
+                    mode: dict(counts, failures_per_success=(
+                        counts['failure'] / counts['success'] if counts['success'] else None))
+                    for mode, counts in self.requests.items()
+                }
+            }
+
+
+# Acumulado de este proceso
+aggregate = MetricsAggregate()
+
+
+def metrics_enabled():
+    """Indica si se deben medir todas las compilaciones (setting UMGPP_COMPILE_METRICS)"""
+    from django.conf import settings
+
+    return getattr(settings, 'UMGPP_COMPILE_METRICS', False)
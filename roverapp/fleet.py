@@ -0,0 +1,150 @@
+"""
+Simulación de flotas de rovers
+Ejecuta muchos rover_control.Rover independientes, cada uno con su propio
+programa, para pruebas de carga del laboratorio. Cada rover usa un reloj
+virtual (rover_control.VirtualClock), así que no espera en tiempo real y
+simular un rover solo ocupa CPU: los rovers se reparten en lotes entre los
+procesos de un grupo (uno por núcleo por defecto) y cada proceso los ejecuta
+uno tras otro.
+
+Los programas se compilan una sola vez en el proceso principal, con un
+UMGPPTranspiler propio y sin la caché de compilación del servidor, así que la
+simulación no necesita que Django esté configurado; los procesos reciben los
+planes ya traducidos. De cada
+rover se devuelve la pose final, el tiempo simulado y el recorrido registrado
+con rover_control.TrajectoryRecorder; del conjunto, el rendimiento medido.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import rover_control
+from .ir import ProgramIR
+from .plan import ExecutablePlan, compile_plan
+from .transpiler import UMGPPTranspiler
+from .jobs import process_context
+
+# Lotes por proceso: más de uno reparte mejor los rovers de distinta duración
+BATCHES_PER_WORKER = 4
+
+
+def run_rover(name, plan, capacity=1024, min_distance=1.0, min_angle=10.0):
+    """
+    Ejecuta un plan en un rover con reloj virtual
+
+    Args:
+        name (str): Nombre del rover
+        plan (ExecutablePlan): Plan del programa
+        capacity (int): Poses que guarda el registro del recorrido
+        min_distance (float): Distancia mínima entre poses guardadas (cm)
+        min_angle (float): Giro mínimo entre poses guardadas (grados)
+
+    Returns:
+        dict: 'name', 'commands', 'final_pose', 'simulated_seconds',
+            'run_seconds' (tiempo real) y 'trajectory' (polilínea)
+    """
+    recorder = rover_control.TrajectoryRecorder(capacity, min_distance, min_angle)
+    start = time.perf_counter()
+    rover = plan.run(rover_control.Rover(clock=rover_control.VirtualClock(), recorder=recorder))
+    return {
+        'name': name,
+        'commands': plan.calls,
+        'final_pose': {'x': rover.position_x, 'y': rover.position_y, 'orientation': rover.orientation},
+        'simulated_seconds': rover.clock.elapsed,
+        'run_seconds': time.perf_counter() - start,
+        'trajectory': recorder.polyline()
+    }
+
+
+def _run_batch(batch, options):
+    """Ejecuta un lote de rovers (en un proceso del grupo)"""
+    return [run_rover(name, plan, **options) for name, plan in batch]
+
+
+class FleetSimulator:
+    """Ejecuta flotas de rovers simulados en un grupo de procesos"""
+
+    def __init__(self, workers=None, capacity=1024, min_distance=1.0, min_angle=10.0):
+        """
+        Args:
+            workers (int): Procesos del grupo; None usa uno por núcleo, y con
+                0 o 1 los rovers se ejecutan en el proceso actual
+            capacity (int): Poses que guarda el registro de cada rover
+            min_distance (float): Distancia mínima entre poses guardadas (cm)
+            min_angle (float): Giro mínimo entre poses guardadas (grados)
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.options = {'capacity': capacity, 'min_distance': min_distance, 'min_angle': min_angle}
+        self.transpiler = UMGPPTranspiler()
+
+    def plans(self, streams):
+        """
+        Planes de los programas de cada rover
+
+        Args:
+            streams (dict): Programa de cada rover por nombre: código UMG++,
+                ProgramIR o ExecutablePlan
+
+        Returns:
+            list: Pares (nombre, plan)
+
+        Raises:
+            ValueError: Si el programa de algún rover no compila
+        """
+        plans = []
+        # Los rovers con el mismo código fuente comparten el plan
+        compiled = {}
+        for name, program in streams.items():
+            if isinstance(program, ExecutablePlan):
+                plan = program
+            elif isinstance(program, ProgramIR):
+                plan = compile_plan(program)
+            else:
+                plan = compiled.get(program)
+                if plan is None:
+                    result = self.transpiler.compile(program)
+                    if not result['success']:
+                        raise ValueError(f"El programa del rover {name!r} tiene errores")
+                    plan = compiled[program] = compile_plan(result['ir'])
+            plans.append((name, plan))
+        return plans
+
+    def run(self, streams):
+        """
+        Simula la flota completa
+
+        Args:
+            streams (dict): Programa de cada rover por nombre (ver plans)
+
+        Returns:
+            dict: 'rovers' con el resultado de cada rover (run_rover), en el
+                orden de streams, y 'stats' con los totales y el rendimiento
+
+        Raises:
+            ValueError: Si el programa de algún rover no compila
+        """
+        plans = self.plans(streams)
+        start = time.perf_counter()
+        if self.workers > 1 and len(plans) > 1:
+            size = -(-len(plans) // (self.workers * BATCHES_PER_WORKER))
+            batches = [plans[index:index + size] for index in range(0, len(plans), size)]
+            with ProcessPoolExecutor(min(self.workers, len(batches)), mp_context=process_context()) as pool:
+                futures = [pool.submit(_run_batch, batch, self.options) for batch in batches]
+                rovers = [result for future in futures for result in future.result()]
+        else:
+            rovers = _run_batch(plans, self.options)
+        wall = time.perf_counter() - start
+
+        commands = sum(rover['commands'] for rover in rovers)
+        return {
+            'rovers': rovers,
+            'stats': {
+                'rovers': len(rovers),
+                'workers': self.workers,
+                'commands': commands,
+                'simulated_seconds': sum(rover['simulated_seconds'] for rover in rovers),
+                'wall_seconds': wall,
+                'commands_per_second': commands / wall if wall else 0.0,
+                'rovers_per_second': len(rovers) / wall if wall else 0.0
+            }
+        }
@@ -0,0 +1,413 @@
+"""
+Compilación incremental de UMG++ para el editor
+Mantiene el estado del lexer y del parser de un documento entre ediciones y
+vuelve a procesar solo las líneas y las instrucciones que toca cada edición.
+"""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from .ast_nodes import Token, Program
+from .transpiler import UMGPPTranspiler, Parser, PYTHON_FOOTER, MAX_EXECUTED_COMMANDS, executed_commands
+
+
+def _position(statement):
+    return (statement.line, statement.column)
+
+
+def _shift_lines(node, delta):
+    """Desplaza la línea de un nodo del AST y de los nodos que contiene"""
+    if node.type == 'giro_combination':
+        for call in node.giros:
+            call.line += delta
+        if node.advance:
+            node.advance.line += delta
+        return
+    node.line += delta
+    if node.type == 'repeat':
+        for child in node.instructions:
+            _shift_lines(child, delta)
+
+
+class Statement:
+    """Una instrucción del cuerpo del programa con sus resultados de compilación"""
+    __slots__ = ('line', 'column', 'node', 'errors', 'semantic_errors', 'python_lines', 'commands', 'size')
+
+    def __init__(self, line, column, node, errors):
+        self.line = line
+        self.column = column
+        self.node = node
+        self.errors = errors
+        self.semantic_errors = []
+        self.python_lines = []
+        self.commands = []
+        self.size = 0
+
+
+class IncrementalDocument:
+    """
+    Documento UMG++ compilado de forma incremental
+
+    Cada línea se analiza léxicamente por separado (ningún token cruza un
+    salto de línea) y el cuerpo se guarda como una lista de instrucciones
+    delimitadas tal como las delimita el parser. Una edición vuelve a analizar
+    las líneas modificadas y reanuda el parser en la instrucción anterior a la
+    edición hasta que vuelve a coincidir con el inicio de una instrucción
+    existente; el resto del documento se reutiliza desplazado.
+    """
+
+    def __init__(self, code, version=0, transpiler=None):
+        self.transpiler = transpiler or UMGPPTranspiler()
+        self.version = version
+        self.lock = threading.Lock()
+        self.lines = code.split('\n')
+        self.lexed = [self._lex_line(line) for line in self.lines]
+        self.lex_error_count = sum(len(errors) for _, errors in self.lexed)
+        self._parse_all()
+
+    @property
+    def code(self):
+        """Código fuente actual del documento"""
+        return '\n'.join(self.lines)
+
+    @property
+    def success(self):
+        """Indica si el documento compila sin errores"""
+        return not (self.lex_error_count or self.syntax_error_count or self.semantic_error_count
+                    or self.size > MAX_EXECUTED_COMMANDS)
+
+    def _lex_line(self, text):
+        """Análisis léxico de una línea: (tokens, errores) con columnas relativas a la línea"""
+        errors = []
+        tokens = [(token.type, token.value, token.column)
+                  for token in self.transpiler.iter_tokens(text, errors)]
+        return tokens, [(error['message'], error['column']) for error in errors]
+
+    def _tokens_from(self, line, column):
+        """Genera los tokens desde la posición indicada (línea y columna desde 1)"""
+        lexed = self.lexed
+        for index in range(line - 1, len(lexed)):
+            line_number = index + 1
+            for token_type, value, token_column in lexed[index][0]:
+                if line_number == line and token_column < column:
+                    continue
+                yield Token(token_type, value, line_number, token_column)
+
+    def _token_before(self, line, column):
+        """Último token anterior a la posición indicada"""
+        for index in range(line - 1, -1, -1):
+            for token_type, value, token_column in reversed(self.lexed[index][0]):
+                if index + 1 < line or token_column < column:
+                    return Token(token_type, value, index + 1, token_column)
+        return None
+
+    def _parse_all(self):
+        """Análisis sintáctico, semántico y generación de todo el documento"""
+        tokens = self._tokens_from(1, 1)
+        parser = Parser(tokens)
+        self.name = parser.parse_header()
+        self.begin = None
+        self.statements = []
+        self.footer_errors = []
+
+        if self.name is None:
+            parser.check_trailing_tokens()
+            self.header_errors = parser.errors
+        else:
+            # La cabecera correcta son exactamente los tres primeros tokens
+            self.header_errors = []
+            header = self._tokens_from(1, 1)
+            for _ in range(3):
+                self.begin = next(header)
+            self.statements, _ = self._parse_body(parser)
+            self._parse_footer(parser)
+
+        self.syntax_error_count = (len(self.header_errors) + len(self.footer_errors)
+                                   + sum(len(statement.errors) for statement in self.statements))
+        self.semantic_error_count = sum(len(statement.semantic_errors) for statement in self.statements)
+        self.size = sum(statement.size for statement in self.statements)
+
+    def _parse_body(self, parser, resync=None):
+        """
+        Analiza instrucciones hasta END o hasta volver a sincronizarse
+
+        Args:
+            parser (Parser): Parser posicionado al inicio de una instrucción
+            resync (callable): Recibe el token actual y devuelve el índice de
+                la instrucción existente que empieza en él, o None
+
+        Returns:
+            list: Instrucciones analizadas
+            int: Índice de la instrucción existente donde se sincronizó, o None
+        """
+        statements = []
+        while not parser.at_body_end():
+            start = parser.current
+            if resync is not None:
+                index = resync(start)
+                if index is not None:
+                    return statements, index
+
+            parser.errors = []
+            node = parser.parse_statement()
+            statement = Statement(start.line, start.column, node, parser.errors)
+
+            if node is not None:
+                self.transpiler.check_instruction(node, statement.semantic_errors)
+                statement.python_lines = self.transpiler.python_instruction(node)
+                statement.commands = self.transpiler.esp8266_instruction(node)
+                statement.size = executed_commands(node)
+
+            statements.append(statement)
+        return statements, None
+
+    def _parse_footer(self, parser):
+        parser.errors = []
+        parser.parse_footer()
+        parser.check_trailing_tokens()
+        self.footer_errors = parser.errors
+
+    def apply_edit(self, start_line, start_column, end_line, end_column, text):
+        """
+        Reemplaza un rango del documento y recompila lo afectado
+
+        Args:
+            start_line (int): Línea inicial del rango (desde 1)
+            start_column (int): Columna inicial del rango (desde 1)
+            end_line (int): Línea final del rango (desde 1)
+            end_column (int): Columna final del rango, exclusiva (desde 1)
+            text (str): Texto que reemplaza al rango
+
+        Returns:
+            dict: Tramos de código generado que cambiaron, o None si hubo que
+                recompilar el documento completo
+        """
+        if not (1 <= start_line <= end_line <= len(self.lines)):
+            raise ValueError('Rango de líneas fuera del documento')
+        if not (1 <= start_column <= len(self.lines[start_line - 1]) + 1
+                and 1 <= end_column <= len(self.lines[end_line - 1]) + 1
+                and (start_line, start_column) <= (end_line, end_column)):
+            raise ValueError('Rango de columnas fuera del documento')
+
+        # Reemplazar las líneas afectadas y analizarlas léxicamente de nuevo
+        new_text = (self.lines[start_line - 1][:start_column - 1] + text
+                    + self.lines[end_line - 1][end_column - 1:])
+        new_lines = new_text.split('\n')
+        new_lexed = [self._lex_line(line) for line in new_lines]
+
+        self.lex_error_count -= sum(len(errors) for _, errors in self.lexed[start_line - 1:end_line])
+        self.lex_error_count += sum(len(errors) for _, errors in new_lexed)
+        self.lines[start_line - 1:end_line] = new_lines
+        self.lexed[start_line - 1:end_line] = new_lexed
+
+        delta = len(new_lines) - (end_line - start_line + 1)
+        last_edited_line = start_line + len(new_lines) - 1
+
+        # Una edición en la cabecera cambia todo el programa
+        if self.begin is None or start_line <= self.begin.line:
+            self._parse_all()
+            return None
+
+        # Reanudar en la última instrucción que empieza antes de la edición
+        statements = self.statements
+        first = bisect_left(statements, (start_line, 0), key=_position)
+        if first > 0:
+            first -= 1
+            restart = statements[first]
+            tokens = self._tokens_from(restart.line, restart.column)
+            last = self._token_before(restart.line, restart.column)
+        else:
+            tokens = self._tokens_from(self.begin.line, self.begin.column + 1)
+            last = self.begin
+
+        def resync(token):
+            # Las instrucciones posteriores a la edición conservan su columna
+            if token.line <= last_edited_line:
+                return None
+            old_position = (token.line - delta, token.column)
+            index = bisect_left(statements, old_position, key=_position, lo=first)
+            if index < len(statements) and _position(statements[index]) == old_position:
+                return index
+            return None
+
+        parser = Parser(tokens, last=last)
+        new_statements, end = self._parse_body(parser, resync)
+
+        if end is None:
+            # Se llegó a END: el final del programa también se analiza de nuevo
+            removed = statements[first:]
+            old_footer = len(self.footer_errors)
+            self._parse_footer(parser)
+            self.syntax_error_count += len(self.footer_errors) - old_footer
+            end = len(statements)
+        else:
+            removed = statements[first:end]
+            if delta:
+                for statement in statements[end:]:
+                    statement.line += delta
+                    if statement.node is not None:
+                        _shift_lines(statement.node, delta)
+                    for error in statement.errors:
+                        error['line'] += delta
+                for error in self.footer_errors:
+                    error['line'] += delta
+
+        self.syntax_error_count += (sum(len(statement.errors) for statement in new_statements)
+                                    - sum(len(statement.errors) for statement in removed))
+        self.semantic_error_count += (sum(len(statement.semantic_errors) for statement in new_statements)
+                                      - sum(len(statement.semantic_errors) for statement in removed))
+        self.size += (sum(statement.size for statement in new_statements)
+                      - sum(statement.size for statement in removed))
+
+        # Un bloque REPEAT ocupa varias líneas de Python
+        line_start = sum(len(statement.python_lines) for statement in statements[:first])
+        command_start = sum(len(statement.commands) for statement in statements[:first])
+        statements[first:end] = new_statements
+
+        return {
+            'python': {
+                'start': len(self.transpiler.python_header(self.name)) + line_start,
+                'deleted': sum(len(statement.python_lines) for statement in removed),
+                'lines': [line for statement in new_statements for line in statement.python_lines]
+            },
+            'esp8266': {
+                'start': command_start,
+                'deleted': sum(len(statement.commands) for statement in removed),
+                'commands': [command for statement in new_statements for command in statement.commands]
+            },
+            'reprocessed': len(new_statements)
+        }
+
+    def update(self, edits, version):
+        """
+        Aplica una secuencia de ediciones y arma la respuesta para el editor
+
+        Args:
+            edits (list): Ediciones con start_line, start_column, end_line,
+                end_column y text
+            version (int): Versión del documento después de las ediciones
+
+        Returns:
+            dict: Diagnósticos y cambios en el código generado
+        """
+        patchable = self.success
+        changes = []
+        for edit in edits:
+            change = self.apply_edit(
+                int(edit['start_line']), int(edit['start_column']),
+                int(edit['end_line']), int(edit['end_column']),
+                str(edit['text'])
+            )
+            if change is None or not self.success:
+                patchable = False
+            else:
+                changes.append(change)
+        self.version = version
+        return self.result(changes if patchable else None)
+
+    def diagnostics(self):
+        """
+        Errores actuales del documento, con las mismas etapas que compile()
+
+        Returns:
+            tuple: (etapa, lista de errores) o (None, []) si no hay errores
+        """
+        if self.lex_error_count:
+            errors = []
+            for line_number, (_, line_errors) in enumerate(self.lexed, 1):
+                for message, column in line_errors:
+                    errors.append({'message': message, 'line': line_number, 'column': column})
+            return 'lexical', errors
+
+        if self.syntax_error_count:
+            errors = list(self.header_errors)
+            for statement in self.statements:
+                errors.extend(statement.errors)
+            errors.extend(self.footer_errors)
+            return 'syntax', errors
+
+        if self.semantic_error_count or self.size > MAX_EXECUTED_COMMANDS:
+            errors = []
+            total = 0
+            for statement in self.statements:
+                errors.extend(statement.semantic_errors)
+                if statement.node is not None:
+                    total = self.transpiler.check_size(total, statement.node, errors)
+            return 'semantic', errors
+
+        return None, []
+
+    def ast(self):
+        """AST completo del documento, o None si tiene errores sintácticos"""
+        if self.name is None or self.syntax_error_count:
+            return None
+        return Program(self.name, [statement.node for statement in self.statements])
+
+    def result(self, changes=None):
+        """
+        Resultado de la compilación del documento
+
+        Args:
+            changes (list): Tramos modificados desde la versión anterior; si es
+                None y el documento compila, se incluye el código completo
+
+        Returns:
+            dict: Resultado para el editor
+        """
+        stage, errors = self.diagnostics()
+        if stage:
+            return {
+                'success': False,
+                'version': self.version,
+                'stage': stage,
+                'errors': errors
+            }
+
+        if changes is not None:
+            return {
+                'success': True,
+                'version': self.version,
+                'changes': changes
+            }
+
+        python_code = self.transpiler.python_header(self.name)
+        for statement in self.statements:
+            python_code.extend(statement.python_lines)
+        python_code.extend(PYTHON_FOOTER)
+        return {
+            'success': True,
+            'version': self.version,
+            'python_code': '\n'.join(python_code),
+            'esp8266_code': [command for statement in self.statements for command in statement.commands]
+        }
+
+
+class DocumentStore:
+    """Documentos incrementales por sesión, con un límite de documentos en memoria"""
+
+    def __init__(self, max_documents=256):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def put(self, key, document):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._documents.pop(key, None)
+
+
+# Documentos abiertos en este proceso
+documents = DocumentStore()
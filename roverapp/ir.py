@@ -0,0 +1,198 @@
+"""
+Representación intermedia lineal de UMG++
+Cada comando del rover es un código de operación de un byte y un operando
+entero, guardados en arreglos tipados. Los generadores de código y la
+ejecución en el rover trabajan sobre esta representación en lugar del AST.
+"""
+from array import array
+
+# Códigos de operación, en el mismo orden que los nombres de función. Un bloque
+# REPEAT se marca con REPEAT (operando: repeticiones) antes de sus comandos y
+# END_REPEAT (operando 0) después
+OPCODE_NAMES = ('avanzar_vlts', 'avanzar_ctms', 'avanzar_mts', 'girar', 'circulo',
+                'cuadrado', 'rotar', 'caminar', 'moonwalk', 'repetir', 'fin_repetir')
+(AVANZAR_VLTS, AVANZAR_CTMS, AVANZAR_MTS, GIRAR, CIRCULO,
+ CUADRADO, ROTAR, CAMINAR, MOONWALK, REPEAT, END_REPEAT) = range(len(OPCODE_NAMES))
+OPCODES = {name: opcode for opcode, name in enumerate(OPCODE_NAMES)}
+
+# Rango de los operandos (enteros de 32 bits con signo)
+OPERAND_MIN = -2 ** 31
+OPERAND_MAX = 2 ** 31 - 1
+
+
+class ProgramIR:
+    """
+    Programa UMG++ en representación lineal
+
+    Attributes:
+        name (str): Nombre del programa
+        opcodes (array): Código de operación de cada comando ('B')
+        operands (array): Operando de cada comando ('i')
+        starts (array): Índice del primer comando de cada instrucción del
+            código fuente ('I'); una combinación girar(...)+... es una sola
+            instrucción con varios comandos. Los marcadores REPEAT y
+            END_REPEAT son instrucciones propias y las instrucciones del
+            bloque quedan entre ellos.
+        lines (array): Línea del código fuente de cada comando ('I'); 0 si
+            no se conoce. END_REPEAT lleva la posición de su REPEAT.
+        columns (array): Columna del código fuente de cada comando ('I')
+    """
+    __slots__ = ('name', 'opcodes', 'operands', 'starts', 'lines', 'columns')
+
+    def __init__(self, name, opcodes=None, operands=None, starts=None, lines=None, columns=None):
+        self.name = name
+        self.opcodes = opcodes if opcodes is not None else array('B')
+        self.operands = operands if operands is not None else array('i')
+        self.starts = starts if starts is not None else array('I')
+        self.lines = lines if lines is not None else array('I', [0]) * len(self.opcodes)
+        self.columns = columns if columns is not None else array('I', [0]) * len(self.opcodes)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def add_instruction(self, instruction):
+        """
+        Agrega los comandos de una instrucción del AST
+
+        Args:
+            instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
+        """
+        self.starts.append(len(self.opcodes))
+        if instruction.type == 'repeat':
+            self.append(REPEAT, instruction.count, instruction.line, instruction.column)
+            for child in instruction.instructions:
+                self.add_instruction(child)
+            self.starts.append(len(self.opcodes))
+            self.append(END_REPEAT, 0, instruction.line, instruction.column)
+            return
+
+        if instruction.type == 'instruction':
+            self.append(OPCODES[instruction.function], instruction.parameter, instruction.line, instruction.column)
+            return
+
+        for giro in instruction.giros:
+            self.append(GIRAR, giro.parameter, giro.line, giro.column)
+        if instruction.advance:
+            advance = instruction.advance
+            self.append(OPCODES[advance.function], advance.parameter, advance.line, advance.column)
+
+    def append(self, opcode, operand, line=0, column=0):
+        """
+        Agrega un comando al final del programa (sin iniciar una instrucción)
+
+        Args:
+            opcode (int): Código de operación
+            operand (int): Operando
+            line (int): Línea del código fuente
+            column (int): Columna del código fuente
+        """
+        self.opcodes.append(opcode)
+        self.operands.append(operand)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def statements(self):
+        """
+        Recorre las instrucciones del código fuente
+
+        Yields:
+            tuple: (inicio, fin) de los comandos de cada instrucción
+        """
+        starts = self.starts
+        count = len(starts)
+        for index in range(count):
+            end = starts[index + 1] if index + 1 < count else len(self.opcodes)
+            yield starts[index], end
+
+    def commands(self):
+        """
+        Recorre los comandos del programa, con los marcadores de REPEAT
+
+        Yields:
+            tuple: (código de operación, operando)
+        """
+        return zip(self.opcodes, self.operands)
+
+    def expanded_commands(self):
+        """
+        Recorre los comandos en el orden en que se ejecutan, repitiendo los bloques
+
+        Yields:
+            tuple: (código de operación, operando), sin marcadores de REPEAT
+        """
+        return _expand(self.opcodes, self.operands, 0, len(self.opcodes))
+
+    def to_dict(self):
+        """Forma serializable en JSON de la representación intermedia"""
+        return {
+            'name': self.name,
+            'opcodes': self.opcodes.tolist(),
+            'operands': self.operands.tolist(),
+            'starts': self.starts.tolist(),
+            'lines': self.lines.tolist(),
+            'columns': self.columns.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Crea la representación intermedia a partir de to_dict()"""
+        return cls(
+            data['name'],
+            array('B', data['opcodes']),
+            array('i', data['operands']),
+            array('I', data['starts']),
+            array('I', data['lines']),
+            array('I', data['columns'])
+        )
+
+
+def matching_ends(opcodes):
+    """
+    Empareja los marcadores de los bloques REPEAT
+
+    Args:
+        opcodes (sequence): Códigos de operación
+
+    Returns:
+        dict: Índice de cada REPEAT -> índice de su END_REPEAT
+    """
+    ends = {}
+    stack = []
+    for index, opcode in enumerate(opcodes):
+        if opcode == REPEAT:
+            stack.append(index)
+        elif opcode == END_REPEAT:
+            ends[stack.pop()] = index
+    return ends
+
+
+def _expand(opcodes, operands, start, end, ends=None):
+    if ends is None:
+        ends = matching_ends(opcodes)
+    index = start
+    while index < end:
+        opcode = opcodes[index]
+        if opcode == REPEAT:
+            block_end = ends[index]
+            for _ in range(operands[index]):
+                yield from _expand(opcodes, operands, index + 1, block_end, ends)
+            index = block_end + 1
+            continue
+        yield opcode, operands[index]
+        index += 1
+
+
+def lower(ast):
+    """
+    Traduce el AST a la representación intermedia lineal
+
+    Args:
+        ast (Program): Árbol de sintaxis abstracta sin errores semánticos
+
+    Returns:
+        ProgramIR: Representación intermedia del programa
+    """
+    ir = ProgramIR(ast.name)
+    for instruction in ast.instructions:
+        ir.add_instruction(instruction)
+    return ir
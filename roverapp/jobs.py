@@ -0,0 +1,379 @@
+"""
+Cola de trabajos de compilación asíncronos
+Compila programas muy grandes fuera del hilo de la solicitud: la vista
+registra el trabajo, devuelve su identificador y el cliente consulta (o espera)
+el resultado. Cada trabajo se compila en un proceso propio lanzado por uno de
+los hilos del grupo, así que el grupo acota los núcleos ocupados y un trabajo
+que se pasa de su presupuesto de CPU o que se cancela se termina matando su
+proceso, sin afectar al servidor ni a los demás trabajos.
+
+Configuración (settings.py, todas opcionales):
+    UMGPP_JOB_WORKERS: Trabajos que se compilan a la vez (por defecto 2)
+    UMGPP_JOB_MAX_PENDING: Trabajos en cola o en curso como máximo (por defecto 32)
+    UMGPP_JOB_MAX_PER_USER: Trabajos en cola o en curso por usuario (por defecto 2)
+    UMGPP_JOB_MAX_SOURCE_BYTES: Tamaño máximo del código fuente (por defecto 2 MB)
+    UMGPP_JOB_CPU_SECONDS: Presupuesto de CPU de cada trabajo (por defecto 10)
+    UMGPP_JOB_KEEP_SECONDS: Segundos que se guarda un trabajo terminado (por defecto 600)
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .transpiler import public_result, transpile_to_python
+
+# Un trabajo puede esperar E/S o un núcleo ocupado: el límite de tiempo real
+# es este múltiplo del presupuesto de CPU
+WALL_FACTOR = 2
+# Intervalo con el que un hilo del grupo revisa cancelaciones y plazos
+POLL_SECONDS = 0.05
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobRejected(Exception):
+    """
+    La cola no acepta el trabajo
+
+    Attributes:
+        status (int): Código HTTP con el que responder (413 o 429)
+    """
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def process_context():
+    """
+    Contexto de multiprocessing para los procesos hijos del servidor
+
+    Lo usan los trabajos de compilación y roverapp.fleet. forkserver evita
+    copiar los hilos del servidor al crear cada proceso y, con el transpilador
+    precargado, cada proceso empieza sin importarlo; sin forkserver se usa spawn.
+
+    Returns:
+        multiprocessing.context.BaseContext: Contexto forkserver o spawn
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['roverapp.transpiler'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _compile_in_process(connection, code, optimize, cpu_seconds):
+    """Compila en el proceso del trabajo y envía el resultado serializado"""
+    if resource is not None and cpu_seconds:
+        # El sistema termina el proceso si se pasa del presupuesto de CPU
+        limit = max(1, math.ceil(cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, limit + 1))
+    try:
+        result = public_result(transpile_to_python(code, optimize=optimize))
+        connection.send_bytes(json.dumps(result).encode())
+    finally:
+        connection.close()
+
+
+class CompileJob:
+    """
+    Trabajo de compilación
+
+    Attributes:
+        id (str): Identificador del trabajo
+        owner: Identificador del usuario que lo envió
+        status (str): 'queued', 'running', 'done', 'failed' o 'cancelled'
+        size (int): Bytes del código fuente
+        optimize (bool): Optimizar los comandos antes de generar código
+        result (dict): Resultado de la compilación cuando status es 'done'
+        message (str): Motivo cuando status es 'failed' o 'cancelled'
+    """
+
+    def __init__(self, code, optimize, owner, size):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = QUEUED
+        self.size = size
+        self.optimize = optimize
+        self.code = code
+        self.result = None
+        self.message = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Espera a que termine el trabajo
+
+        Args:
+            timeout (float): Segundos máximos de espera
+
+        Returns:
+            bool: True si el trabajo terminó
+        """
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout):
+        """Como wait, sin ocupar un hilo mientras se espera (vistas ASGI)"""
+        deadline = time.monotonic() + timeout
+        while not self.done and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+        return self.done
+
+    def to_dict(self):
+        """Estado del trabajo para JsonResponse, con el resultado si terminó"""
+        data = {
+            'job': self.id,
+            'status': self.status,
+            'size': self.size,
+            'queued_seconds': round((self.started or self.finished or time.time()) - self.submitted, 3),
+        }
+        if self.started is not None:
+            data['run_seconds'] = round((self.finished or time.time()) - self.started, 3)
+        if self.status == DONE:
+            data['result'] = self.result
+        elif self.message:
+            data['message'] = self.message
+        return data
+
+
+class CompileJobQueue:
+    """Cola acotada de trabajos de compilación con un grupo de hilos"""
+
+    def __init__(self, workers=2, max_pending=32, max_per_user=2, max_source_bytes=2_000_000,
+                 cpu_seconds=10, keep_seconds=600):
+        """
+        Args:
+            workers (int): Trabajos que se compilan a la vez
+            max_pending (int): Trabajos en cola o en curso como máximo
+            max_per_user (int): Trabajos en cola o en curso por usuario
+            max_source_bytes (int): Tamaño máximo del código fuente
+            cpu_seconds (float): Presupuesto de CPU de cada trabajo
+            keep_seconds (float): Tiempo que se guarda un trabajo terminado
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.max_source_bytes = max_source_bytes
+        self.cpu_seconds = cpu_seconds
+        self.keep_seconds = keep_seconds
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._context = None
+
+    def submit(self, code, optimize=False, owner=None):
+        """
+        Registra un trabajo de compilación
+
+        Args:
+            code (str): Código fuente en UMG++
+            optimize (bool): Optimizar los comandos antes de generar código
+            owner: Identificador del usuario que lo envía
+
+        Returns:
+            CompileJob: Trabajo en cola
+
+        Raises:
+            JobRejected: Si el código es demasiado grande (413) o hay
+                demasiados trabajos pendientes en total o del usuario (429)
+        """
+        size = len(code.encode('utf-8'))
+        if size > self.max_source_bytes:
+            raise JobRejected(f'El código supera el máximo de {self.max_source_bytes} bytes', 413)
+
+        with self._lock:
+            self._prune()
+            pending = [job for job in self._jobs.values() if job.status not in FINISHED]
+            if len(pending) >= self.max_pending:
+                raise JobRejected('Hay demasiados trabajos de compilación pendientes', 429)
+            if sum(job.owner == owner for job in pending) >= self.max_per_user:
+                raise JobRejected(f'Se permiten como máximo {self.max_per_user} trabajos pendientes por usuario', 429)
+
+            job = CompileJob(code, optimize, owner, size)
+            self._jobs[job.id] = job
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'umgpp-job-{len(self._threads)}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id, owner=None):
+        """
+        Busca un trabajo
+
+        Args:
+            job_id (str): Identificador del trabajo
+            owner: Usuario que lo consulta; solo ve sus propios trabajos
+
+        Returns:
+            CompileJob: El trabajo, o None si no existe o es de otro usuario
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def cancel(self, job):
+        """
+        Cancela un trabajo en cola o en curso (terminando su proceso)
+
+        Args:
+            job (CompileJob): Trabajo a cancelar
+
+        Returns:
+            bool: True si el trabajo no había terminado
+        """
+        with self._lock:
+            if job.status in FINISHED:
+                return False
+            job._cancel.set()
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED, message='Cancelado antes de empezar')
+        return True
+
+    def stats(self):
+        """
+        Contadores de la cola
+
+        Returns:
+            dict: Trabajos por estado y configuración
+        """
+        with self._lock:
+            counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED, 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            'jobs': counts,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'cpu_seconds': self.cpu_seconds
+        }
+
+    def shutdown(self):
+        """Cancelar los trabajos pendientes y detener los hilos del grupo"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            threads, self._threads = self._threads, []
+        for job in jobs:
+            self.cancel(job)
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _prune(self):
+        limit = time.time() - self.keep_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in FINISHED and job.finished < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status, result=None, message=None):
+        job.status = status
+        job.result = result
+        job.message = message
+        job.finished = time.time()
+        # El código fuente ya no hace falta y puede ser grande
+        job.code = None
+        job._done.set()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+            status, result, message = self._run(job)
+            with self._lock:
+                self._finish(job, status, result, message)
+
+    def _run(self, job):
+        if self._context is None:
+            self._context = process_context()
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_compile_in_process, args=(sender, job.code, job.optimize, self.cpu_seconds), daemon=True
+        )
+        process.start()
+        sender.close()
+
+        data = None
+        deadline = time.monotonic() + self.cpu_seconds * WALL_FACTOR
+        try:
+            while not job._cancel.is_set() and time.monotonic() < deadline:
+                if receiver.poll(POLL_SECONDS):
+                    try:
+                        data = receiver.recv_bytes()
+                    except EOFError:
+                        pass
+                    break
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+
+        if data is not None:
+            return DONE, json.loads(data), None
+        if job._cancel.is_set():
+            return CANCELLED, None, 'Cancelado durante la compilación'
+        if process.exitcode is not None and process.exitcode > 0:
+            return FAILED, None, 'El proceso de compilación terminó inesperadamente'
+        return FAILED, None, f'La compilación superó el presupuesto de {self.cpu_seconds} segundos'
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Cola de trabajos del proceso, configurada desde settings
+
+    Returns:
+        CompileJobQueue: Instancia compartida por las vistas
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                from django.conf import settings
+
+                _job_queue = CompileJobQueue(
+                    workers=getattr(settings, 'UMGPP_JOB_WORKERS', 2),
+                    max_pending=getattr(settings, 'UMGPP_JOB_MAX_PENDING', 32),
+                    max_per_user=getattr(settings, 'UMGPP_JOB_MAX_PER_USER', 2),
+                    max_source_bytes=getattr(settings, 'UMGPP_JOB_MAX_SOURCE_BYTES', 2_000_000),
+                    cpu_seconds=getattr(settings, 'UMGPP_JOB_CPU_SECONDS', 10),
+                    keep_seconds=getattr(settings, 'UMGPP_JOB_KEEP_SECONDS', 600)
+                )
+    return _job_queue
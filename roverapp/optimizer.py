@@ -0,0 +1,136 @@
+"""
+Optimizador de mirilla (peephole) para programas UMG++
+Trabaja sobre la representación intermedia, después del análisis semántico
+y antes de la generación de código. Solo reescribe comandos cuyo efecto
+sobre el modelo rover_control.Rover (posición, orientación y motores
+activos) es el mismo:
+
+- girar(...) solo activa o desactiva motores: de varios girar seguidos solo
+  cuenta el último, y un girar que deja los motores como ya estaban sobra.
+- Con ambos motores activos (girar(0), el estado inicial) los avances no
+  cambian la orientación, así que avances seguidos se suman en uno solo,
+  aunque mezclen vueltas, centímetros y metros; si suman 0 se eliminan.
+- rotar(n) gira n vueltas completas y la orientación vuelve a quedar igual:
+  se elimina.
+- Los bloques REPEAT son barreras: nada se combina a través de sus límites
+  y al cruzarlos el estado de los motores se considera desconocido. Un
+  bloque que queda vacío se elimina.
+
+El tiempo de ejecución sí cambia: esa es la ganancia. Cada comando emitido
+conserva la posición en el código fuente del comando del que sale (el primero
+de los avances sumados).
+"""
+from .ir import (ProgramIR, OPERAND_MIN, OPERAND_MAX, AVANZAR_VLTS, AVANZAR_CTMS,
+                 AVANZAR_MTS, GIRAR, ROTAR, REPEAT, END_REPEAT)
+
+# Centímetros por unidad de cada avance (Rover.wheel_circumference = 20 cm)
+CENTIMETERS = {AVANZAR_VLTS: 20, AVANZAR_CTMS: 1, AVANZAR_MTS: 100}
+
+# Parámetro de girar que deja ambos motores activos
+STRAIGHT = 0
+
+
+def _encode_advance(centimeters):
+    """Avance equivalente a la distancia indicada, o None si no cabe en un operando"""
+    for opcode in (AVANZAR_MTS, AVANZAR_CTMS, AVANZAR_VLTS):
+        units, remainder = divmod(centimeters, CENTIMETERS[opcode])
+        if not remainder and OPERAND_MIN <= units <= OPERAND_MAX:
+            return opcode, units
+    return None
+
+
+def optimize(ir):
+    """
+    Optimiza la representación intermedia de un programa
+
+    Args:
+        ir (ProgramIR): Programa sin errores semánticos
+
+    Returns:
+        ProgramIR: Programa optimizado, con un comando por instrucción
+        int: Número de comandos eliminados
+    """
+    optimized = ProgramIR(ir.name)
+    opcodes = optimized.opcodes
+    operands = optimized.operands
+    starts = optimized.starts
+    lines = ir.lines
+    columns = ir.columns
+
+    def emit(opcode, operand, source):
+        starts.append(len(opcodes))
+        optimized.append(opcode, operand, lines[source], columns[source])
+
+    # Motores según lo ya emitido, girar pendiente y avance recto pendiente
+    # (en centímetros, junto con el avance original si es uno solo), con el
+    # índice del comando original de cada uno
+    mode = STRAIGHT
+    pending_mode = None
+    pending_mode_source = None
+    pending = 0
+    pending_advance = None
+    pending_source = None
+
+    def flush():
+        nonlocal mode, pending_mode, pending, pending_advance
+        if pending_advance is not None:
+            emit(*pending_advance, pending_source)
+        elif pending:
+            emit(*_encode_advance(pending), pending_source)
+        pending = 0
+        pending_advance = None
+        if pending_mode is not None and pending_mode != mode:
+            emit(GIRAR, pending_mode, pending_mode_source)
+            mode = pending_mode
+        pending_mode = None
+
+    for index, (opcode, operand) in enumerate(ir.commands()):
+        if opcode == GIRAR:
+            # Solo cuenta el último girar antes del próximo comando
+            pending_mode = operand
+            pending_mode_source = index
+            continue
+
+        if opcode == ROTAR:
+            continue
+
+        if opcode == REPEAT or opcode == END_REPEAT:
+            flush()
+            if opcode == END_REPEAT and opcodes and opcodes[-1] == REPEAT:
+                # Bloque vacío
+                starts.pop()
+                opcodes.pop()
+                operands.pop()
+                optimized.lines.pop()
+                optimized.columns.pop()
+            else:
+                emit(opcode, operand, index)
+            # La primera vuelta de un bloque y lo que sigue a él pueden
+            # empezar con los motores de distintas formas
+            mode = None
+            continue
+
+        if opcode in CENTIMETERS:
+            target = mode if pending_mode is None else pending_mode
+            if target == STRAIGHT:
+                if pending_mode is not None and pending_mode != mode:
+                    flush()
+                pending_mode = None
+
+                centimeters = operand * CENTIMETERS[opcode]
+                if pending and _encode_advance(pending + centimeters) is None:
+                    flush()
+                if pending:
+                    pending += centimeters
+                    pending_advance = None
+                else:
+                    pending = centimeters
+                    pending_advance = (opcode, operand)
+                    pending_source = index
+                continue
+
+        flush()
+        emit(opcode, operand, index)
+
+    flush()
+    return optimized, len(ir) - len(optimized)
@@ -0,0 +1,148 @@
+"""
+Planes ejecutables de programas UMG++
+Alternativa a generate_python_code para ejecutar programas en el servidor
+(simulación, calificación): el programa se traduce una sola vez a una lista de
+llamadas a métodos de rover_control.Rover con los operandos ya convertidos, y
+ejecutarlo solo resuelve esos métodos en el rover y los llama, sin generar
+texto ni usar exec. El plan sirve para cualquier objeto con la misma interfaz
+que Rover.
+
+Los planes se guardan por hash del código fuente (compile_cache.source_hash),
+así que compilar y traducir un mismo programa ocurre una sola vez por proceso.
+"""
+import threading
+from collections import OrderedDict
+
+from .ir import ProgramIR, lower, GIRAR, REPEAT, END_REPEAT
+from .transpiler import PYTHON_CALLS, GIRAR_CALLS
+from .compile_cache import compile_cached, source_hash
+
+# Paso de un plan que repite un bloque: (REPEAT_STEP, (repeticiones, pasos))
+REPEAT_STEP = -1
+
+# Planes guardados en memoria del proceso
+PLAN_CACHE_SIZE = 512
+
+
+class ExecutablePlan:
+    """
+    Programa listo para ejecutar sobre un rover
+
+    Attributes:
+        name (str): Nombre del programa
+        methods (tuple): Nombres de los métodos del rover que usa el plan
+        steps (tuple): Pasos (índice en methods, argumentos); un bloque REPEAT
+            es (REPEAT_STEP, (repeticiones, pasos del bloque))
+        calls (int): Llamadas a métodos del rover al ejecutar el plan completo
+    """
+    __slots__ = ('name', 'methods', 'steps', 'calls')
+
+    def __init__(self, name, methods, steps, calls):
+        self.name = name
+        self.methods = methods
+        self.steps = steps
+        self.calls = calls
+
+    def run(self, rover):
+        """
+        Ejecuta el plan igual que el código Python generado
+
+        Args:
+            rover (Rover): Rover, o cualquier objeto con los métodos de
+                rover_control.Rover
+
+        Returns:
+            Rover: El mismo rover, después de finalize()
+        """
+        bound = [getattr(rover, method) for method in self.methods]
+        rover.initialize()
+        _run_steps(self.steps, bound)
+        rover.finalize()
+        return rover
+
+
+def compile_plan(program):
+    """
+    Traduce un programa a un plan ejecutable
+
+    Args:
+        program (Program | ProgramIR): Árbol de sintaxis abstracta sin
+            errores semánticos o su representación intermedia
+
+    Returns:
+        ExecutablePlan: Plan del programa
+    """
+    ir = program if isinstance(program, ProgramIR) else lower(program)
+    methods = []
+    indexes = {}
+    # Pila de bloques abiertos: (pasos del bloque exterior, repeticiones, llamadas antes del bloque)
+    blocks = []
+    steps = []
+    calls = 0
+    for opcode, operand in ir.commands():
+        if opcode == REPEAT:
+            blocks.append((steps, operand, calls))
+            steps = []
+            calls = 0
+            continue
+        if opcode == END_REPEAT:
+            outer, count, outer_calls = blocks.pop()
+            outer.append((REPEAT_STEP, (count, tuple(steps))))
+            steps = outer
+            calls = outer_calls + count * calls
+            continue
+
+        if opcode == GIRAR:
+            method, args = GIRAR_CALLS.get(operand, 'move_straight'), ()
+        else:
+            method, args = PYTHON_CALLS[opcode][0], (operand,)
+        index = indexes.get(method)
+        if index is None:
+            index = indexes[method] = len(methods)
+            methods.append(method)
+        steps.append((index, args))
+        calls += 1
+    return ExecutablePlan(ir.name, tuple(methods), tuple(steps), calls)
+
+
+def _run_steps(steps, bound):
+    for index, args in steps:
+        if index == REPEAT_STEP:
+            count, block = args
+            for _ in range(count):
+                _run_steps(block, bound)
+        else:
+            bound[index](*args)
+
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def cached_plan(code, optimize=False):
+    """
+    Plan ejecutable de un código fuente, guardado por su hash
+
+    Args:
+        code (str): Código fuente en UMG++
+        optimize (bool): Optimizar los comandos antes de traducirlos
+
+    Returns:
+        ExecutablePlan: Plan del programa, o None si no compila
+    """
+    key = source_hash(code) + (':opt' if optimize else '')
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+
+    result = compile_cached(code, optimize=optimize)
+    if not result['success']:
+        return None
+    plan = compile_plan(result['ir'])
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
@@ -1,28 +1,354 @@
 """
 Módulo de control para el UMG Basic Rover 2.0
 Este módulo simula el control del rover físico para pruebas y depuración.
+
+Las pausas que simulan la duración de cada movimiento pasan por el reloj del
+rover (Rover(clock=...)):
+
+- RealClock (por defecto): espera el tiempo real, como el rover físico.
+- VirtualClock: no espera; solo suma el tiempo simulado, así que un programa
+  se simula a velocidad de CPU con una duración exacta y repetible.
+- ScaledClock: espera el tiempo real dividido por un factor (10 = diez
+  veces más rápido), para ver una simulación acelerada.
+
+Los tres llevan en elapsed los segundos simulados, contados en nanosegundos
+enteros para que la suma no acumule errores de redondeo.
+
+Con Rover(recorder=TrajectoryRecorder(...)) el rover registra su pose después
+de cada pausa en un búfer circular de tamaño fijo, descartando las poses que
+no se alejan lo suficiente de la última guardada; polyline() exporta el
+recorrido para dibujarlo en el editor.
+
+El registro no se configura al importar el módulo: sin configure_logging los
+mensajes del rover se descartan casi sin costo, porque solo se formatean si
+algún manejador los va a escribir. configure_logging escribe en rover.log (y
+en la consola) desde un hilo de fondo, así que el rover solo encola cada
+registro, y opcionalmente guarda un registro de eventos en líneas JSON con
+rotación que read_events y replay_events permiten reproducir.
 """
+import json
 import time
 import math
 import logging
-
-# Configurar el registro
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("rover.log"),
-        logging.StreamHandler()
-    ]
-)
+import logging.handlers
+import os
+import queue
+from array import array
 
 logger = logging.getLogger("rover_control")
+# Eventos estructurados: un diccionario por comando ejecutado
+event_logger = logging.getLogger("rover_control.events")
+event_logger.propagate = False
+event_logger.setLevel(logging.WARNING)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Hilo de fondo que escribe los registros encolados
+_listener = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que deja el formateo al hilo de fondo"""
+    
+    def prepare(self, record):
+        # Los argumentos de los mensajes del rover son números y cadenas, que
+        # pueden formatearse más tarde en otro hilo sin riesgo
+        return record
+
+
+class _EventFormatter(logging.Formatter):
+    """Una línea JSON por evento"""
+    
+    def format(self, record):
+        return json.dumps(record.msg, separators=(',', ':'))
+
+
+def configure_logging(path="rover.log", level=logging.INFO, console=True,
+                      events_path=None, events_max_bytes=10_000_000, events_backups=3):
+    """
+    Configura el registro del rover con manejadores en un hilo de fondo
+    
+    Args:
+        path (str): Archivo del registro de texto, o None para no escribirlo
+        level (int): Nivel mínimo de los mensajes
+        console (bool): Escribir también los mensajes en la consola
+        events_path (str): Archivo del registro de eventos en líneas JSON,
+            o None para no registrar eventos
+        events_max_bytes (int): Tamaño con el que rota el registro de eventos
+        events_backups (int): Archivos rotados que se conservan
+    
+    Returns:
+        QueueListener: Hilo de fondo ya iniciado; shutdown_logging lo detiene
+    """
+    global _listener
+    shutdown_logging()
+    
+    handlers = []
+    if path is not None:
+        handlers.append(logging.FileHandler(path))
+    if console:
+        handlers.append(logging.StreamHandler())
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        # Los eventos van solo a su propio archivo
+        handler.addFilter(lambda record: record.name != event_logger.name)
+    if events_path is not None:
+        events_handler = logging.handlers.RotatingFileHandler(
+            events_path, maxBytes=events_max_bytes, backupCount=events_backups
+        )
+        events_handler.setFormatter(_EventFormatter())
+        events_handler.addFilter(lambda record: record.name == event_logger.name)
+        handlers.append(events_handler)
+        event_logger.setLevel(logging.INFO)
+    
+    records = queue.SimpleQueue()
+    for target in (logger, event_logger):
+        target.addHandler(_DeferredQueueHandler(records))
+    logger.setLevel(level)
+    logger.propagate = False
+    
+    _listener = logging.handlers.QueueListener(records, *handlers)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Escribe los registros pendientes y quita los manejadores de configure_logging"""
+    global _listener
+    for target in (logger, event_logger):
+        for handler in list(target.handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                target.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+    logger.propagate = True
+    event_logger.setLevel(logging.WARNING)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def read_events(path):
+    """
+    Eventos de un registro de configure_logging, incluidos los archivos rotados
+    
+    Args:
+        path (str): Archivo del registro de eventos
+    
+    Yields:
+        dict: Eventos del más antiguo al más reciente: 'command' (método de
+            Rover), 'args', 'x', 'y', 'orientation' y 'elapsed'
+    """
+    # Los archivos rotados son path.1 (el más reciente) a path.N
+    names = [path]
+    while os.path.exists(f"{path}.{len(names)}"):
+        names.insert(0, f"{path}.{len(names)}")
+    for name in names:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as events:
+            for line in events:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def replay_events(events, rover):
+    """
+    Repite en un rover los comandos de un registro de eventos
+    
+    Args:
+        events (iterable): Eventos de read_events
+        rover (Rover): Rover en el que repetirlos
+    
+    Returns:
+        Rover: El mismo rover
+    """
+    for event in events:
+        getattr(rover, event['command'])(*event['args'])
+    return rover
+
+class VirtualClock:
+    """Reloj simulado: las pausas no esperan, solo avanzan el tiempo simulado"""
+    
+    def __init__(self):
+        self._elapsed_ns = 0
+    
+    @property
+    def elapsed(self):
+        """Segundos simulados desde que se creó el reloj"""
+        return self._elapsed_ns / 1e9
+    
+    def now(self):
+        """Tiempo actual del reloj, en segundos"""
+        return self.elapsed
+    
+    def sleep(self, seconds):
+        """
+        Pausa simulada
+        
+        Args:
+            seconds (float): Duración de la pausa
+        """
+        self._elapsed_ns += round(seconds * 1e9)
+
+class ScaledClock(VirtualClock):
+    """Reloj que espera el tiempo real dividido por un factor"""
+    
+    def __init__(self, factor=1):
+        """
+        Args:
+            factor (float): Cuántas veces más rápido que el tiempo real
+        """
+        super().__init__()
+        if factor <= 0:
+            raise ValueError('El factor del reloj debe ser positivo')
+        self.factor = factor
+        self._start = time.monotonic()
+    
+    def now(self):
+        # Tiempo real transcurrido, escalado a tiempo simulado
+        return (time.monotonic() - self._start) * self.factor
+    
+    def sleep(self, seconds):
+        time.sleep(seconds / self.factor)
+        super().sleep(seconds)
+
+class RealClock(ScaledClock):
+    """Reloj de tiempo real, el del rover físico"""
+    
+    def __init__(self):
+        super().__init__(1)
+
+class TrajectoryRecorder:
+    """
+    Registro del recorrido del rover en un búfer circular
+
+    Guarda posición, orientación y tiempo simulado en arreglos preasignados de
+    capacity poses; cuando se llena, cada pose nueva reemplaza a la más
+    antigua, así que la memoria no crece con la duración del programa. Una
+    pose solo se guarda si se aleja al menos min_distance cm o gira al menos
+    min_angle grados respecto de la última guardada.
+    """
+    
+    def __init__(self, capacity=4096, min_distance=0.0, min_angle=0.0):
+        """
+        Args:
+            capacity (int): Poses que se guardan como máximo
+            min_distance (float): Distancia mínima entre poses guardadas (cm)
+            min_angle (float): Giro mínimo entre poses guardadas (grados)
+        """
+        if capacity < 2:
+            raise ValueError('La capacidad del registro debe ser al menos 2')
+        self.capacity = capacity
+        self.min_distance = min_distance
+        self.min_angle = min_angle
+        self._x = array('d', bytes(8 * capacity))
+        self._y = array('d', bytes(8 * capacity))
+        self._orientation = array('d', bytes(8 * capacity))
+        self._time = array('d', bytes(8 * capacity))
+        # Poses guardadas en total; la siguiente va en _stored % capacity
+        self._stored = 0
+        # Poses registradas, incluidas las descartadas por los umbrales
+        self.seen = 0
+        self._last = None
+        self._pending = None
+    
+    def __len__(self):
+        return min(self._stored, self.capacity)
+    
+    @property
+    def overwritten(self):
+        """Poses guardadas que se perdieron al llenarse el búfer"""
+        return max(0, self._stored - self.capacity)
+    
+    def record(self, x, y, orientation, elapsed):
+        """
+        Registra una pose del rover
+        
+        Args:
+            x (float): Posición x (cm)
+            y (float): Posición y (cm)
+            orientation (float): Orientación (grados)
+            elapsed (float): Segundos simulados
+        """
+        self.seen += 1
+        last = self._last
+        if last is not None:
+            turned = abs(orientation - last[2]) % 360
+            if (math.hypot(x - last[0], y - last[1]) < self.min_distance
+                    and min(turned, 360 - turned) < self.min_angle):
+                # Descartada, salvo que sea la última al exportar
+                self._pending = (x, y, orientation, elapsed)
+                return
+        index = self._stored % self.capacity
+        self._x[index] = x
+        self._y[index] = y
+        self._orientation[index] = orientation
+        self._time[index] = elapsed
+        self._stored += 1
+        self._last = (x, y, orientation)
+        self._pending = None
+    
+    def poses(self):
+        """
+        Poses guardadas, de la más antigua a la más reciente
+        
+        Returns:
+            list: Tuplas (x, y, orientación, segundos); incluye al final la
+                última pose registrada aunque los umbrales la hayan descartado
+        """
+        count = len(self)
+        start = self._stored - count
+        indexes = [(start + offset) % self.capacity for offset in range(count)]
+        poses = [(self._x[i], self._y[i], self._orientation[i], self._time[i]) for i in indexes]
+        if self._pending is not None:
+            poses.append(self._pending)
+        return poses
+    
+    def polyline(self, decimals=1):
+        """
+        Recorrido compacto para el editor
+        
+        Args:
+            decimals (int): Decimales de las coordenadas y los tiempos
+        
+        Returns:
+            dict: 'points' con las coordenadas intercaladas [x0, y0, x1, y1, ...],
+                'orientations' (grados), 'times' (segundos simulados),
+                'recorded' (poses registradas) y 'overwritten'
+        """
+        points = []
+        orientations = []
+        times = []
+        for x, y, orientation, elapsed in self.poses():
+            points.append(round(x, decimals))
+            points.append(round(y, decimals))
+            orientations.append(round(orientation) % 360)
+            times.append(round(elapsed, decimals))
+        return {
+            'points': points,
+            'orientations': orientations,
+            'times': times,
+            'recorded': self.seen,
+            'overwritten': self.overwritten
+        }
 
 class Rover:
     """Clase para controlar el UMG Basic Rover 2.0"""
     
-    def __init__(self):
-        """Inicializar el rover"""
+    def __init__(self, clock=None, recorder=None):
+        """
+        Inicializar el rover
+        
+        Args:
+            clock (RealClock | ScaledClock | VirtualClock): Reloj de las
+                pausas de los movimientos; por defecto, tiempo real
+            recorder (TrajectoryRecorder): Registro opcional del recorrido
+        """
+        self.clock = clock if clock is not None else RealClock()
+        self.recorder = recorder
         # Posición y orientación del rover
         self.position_x = 0.0
         self.position_y = 0.0
@@ -36,6 +362,9 @@ class Rover:
         self.left_motor_enabled = True
         self.right_motor_enabled = True
         
+        if recorder is not None:
+            recorder.record(self.position_x, self.position_y, self.orientation, self.clock.elapsed)
+        
         logger.info("Rover instanciado")
     
     def initialize(self):
@@ -64,7 +393,7 @@ class Rover:
         Args:
             turns (int): Número de vueltas (positivo = adelante, negativo = atrás)
         """
-        logger.info(f"Moviendo ruedas: {turns} vueltas")
+        logger.info("Moviendo ruedas: %s vueltas", turns)
         
         # Calcular la distancia en cm
         distance = turns * self.wheel_circumference
@@ -72,7 +401,8 @@ class Rover:
         # Mover el rover
         self._move_distance(distance)
         
-        logger.info(f"Ruedas movidas {turns} vueltas")
+        logger.info("Ruedas movidas %s vueltas", turns)
+        self._event('move_wheels', turns)
     
     def move_cm(self, centimeters):
         """
@@ -81,12 +411,13 @@ class Rover:
         Args:
             centimeters (int): Distancia en cm (positivo = adelante, negativo = atrás)
         """
-        logger.info(f"Moviendo: {centimeters} cm")
+        logger.info("Moviendo: %s cm", centimeters)
         
         # Mover el rover
         self._move_distance(centimeters)
         
-        logger.info(f"Movido {centimeters} cm")
+        logger.info("Movido %s cm", centimeters)
+        self._event('move_cm', centimeters)
     
     def move_meters(self, meters):
         """
@@ -95,13 +426,14 @@ class Rover:
         Args:
             meters (int): Distancia en metros (positivo = adelante, negativo = atrás)
         """
-        logger.info(f"Moviendo: {meters} metros")
+        logger.info("Moviendo: %s metros", meters)
         
         # Convertir a centímetros y mover
         centimeters = meters * 100
         self._move_distance(centimeters)
         
-        logger.info(f"Movido {meters} metros")
+        logger.info("Movido %s metros", meters)
+        self._event('move_meters', meters)
     
     def turn_right(self):
         """Girar a la derecha (activando solo el motor izquierdo)"""
@@ -112,6 +444,7 @@ class Rover:
         self.left_motor_enabled = True
         
         logger.info("Giro a la derecha completado")
+        self._event('turn_right')
     
     def turn_left(self):
         """Girar a la izquierda (activando solo el motor derecho)"""
@@ -122,6 +455,7 @@ class Rover:
         self.right_motor_enabled = True
         
         logger.info("Giro a la izquierda completado")
+        self._event('turn_left')
     
     def move_straight(self):
         """Avanzar en línea recta (activando ambos motores)"""
@@ -132,6 +466,7 @@ class Rover:
         self.right_motor_enabled = True
         
         logger.info("Configuración para línea recta completada")
+        self._event('move_straight')
     
     def draw_circle(self, radius):
         """
@@ -140,7 +475,7 @@ class Rover:
         Args:
             radius (int): Radio del círculo en centímetros
         """
-        logger.info(f"Dibujando círculo de radio {radius} cm")
+        logger.info("Dibujando círculo de radio %s cm", radius)
         
         # Calculamos la circunferencia
         circumference = 2 * math.pi * radius
@@ -159,12 +494,13 @@ class Rover:
             self.orientation = angle + 90  # Tangente al círculo
             
             # Simular un pequeño retraso
-            time.sleep(0.01)
+            self._pause(0.01)
         
         # Restaurar orientación original
         self.orientation = 0
         
         logger.info("Círculo completado")
+        self._event('draw_circle', radius)
     
     def draw_square(self, side):
         """
@@ -173,7 +509,7 @@ class Rover:
         Args:
             side (int): Longitud del lado en centímetros
         """
-        logger.info(f"Dibujando cuadrado de lado {side} cm")
+        logger.info("Dibujando cuadrado de lado %s cm", side)
         
         # Guardamos la posición original
         original_x = self.position_x
@@ -191,12 +527,13 @@ class Rover:
                 self.orientation -= 360
             
             # Simular un pequeño retraso
-            time.sleep(0.5)
+            self._pause(0.5)
         
         # Restaurar orientación original
         self.orientation = original_orientation
         
         logger.info("Cuadrado completado")
+        self._event('draw_square', side)
     
     def rotate(self, turns):
         """
@@ -205,7 +542,7 @@ class Rover:
         Args:
             turns (int): Número de vueltas (positivo = derecha, negativo = izquierda)
         """
-        logger.info(f"Rotando {turns} vueltas")
+        logger.info("Rotando %s vueltas", turns)
         
         # Calcular el ángulo total
         angle = turns * 360
@@ -216,7 +553,8 @@ class Rover:
         # Normalizar a [0, 360)
         self.orientation %= 360
         
-        logger.info(f"Rotación completada. Nueva orientación: {self.orientation} grados")
+        logger.info("Rotación completada. Nueva orientación: %s grados", self.orientation)
+        self._event('rotate', turns)
     
     def walk(self, steps):
         """
@@ -225,7 +563,7 @@ class Rover:
         Args:
             steps (int): Número de pasos (positivo = adelante, negativo = atrás)
         """
-        logger.info(f"Caminando {steps} pasos")
+        logger.info("Caminando %s pasos", steps)
         
         direction = 1 if steps > 0 else -1
         abs_steps = abs(steps)
@@ -241,9 +579,10 @@ class Rover:
                 self.position_x -= 5
             
             # Simular un pequeño retraso
-            time.sleep(0.2)
+            self._pause(0.2)
         
         logger.info("Caminata completada")
+        self._event('walk', steps)
     
     def moonwalk(self, steps):
         """
@@ -252,7 +591,7 @@ class Rover:
         Args:
             steps (int): Número de pasos (positivo = adelante, negativo = atrás)
         """
-        logger.info(f"Ejecutando moonwalk de {steps} pasos")
+        logger.info("Ejecutando moonwalk de %s pasos", steps)
         
         direction = 1 if steps > 0 else -1
         abs_steps = abs(steps)
@@ -268,9 +607,41 @@ class Rover:
                 self.position_x -= 8
             
             # Simular un pequeño retraso
-            time.sleep(0.3)
+            self._pause(0.3)
         
         logger.info("Moonwalk completado")
+        self._event('moonwalk', steps)
+    
+    def _event(self, command, *args):
+        """
+        Método interno para registrar un comando ejecutado y la pose alcanzada
+        en el registro de eventos, si está configurado
+        
+        Args:
+            command (str): Método del rover
+            *args: Argumentos del método
+        """
+        if event_logger.isEnabledFor(logging.INFO):
+            event_logger.info({
+                'command': command,
+                'args': args,
+                'x': self.position_x,
+                'y': self.position_y,
+                'orientation': self.orientation,
+                'elapsed': self.clock.elapsed
+            })
+    
+    def _pause(self, seconds):
+        """
+        Método interno para esperar la duración de un movimiento y registrar
+        la pose alcanzada
+        
+        Args:
+            seconds (float): Duración simulada
+        """
+        self.clock.sleep(seconds)
+        if self.recorder is not None:
+            self.recorder.record(self.position_x, self.position_y, self.orientation, self.clock.elapsed)
     
     def _move_distance(self, distance):
         """
@@ -305,6 +676,6 @@ class Rover:
         
         # Simular el tiempo que tomaría el movimiento
         # (proporcional a la distancia)
-        time.sleep(abs(distance) / 100)  # 1 segundo por cada 100 cm
+        self._pause(abs(distance) / 100)  # 1 segundo por cada 100 cm
         
-        logger.debug(f"Nueva posición: ({self.position_x}, {self.position_y}), orientación: {self.orientation}°")
\ No newline at end of file
+        logger.debug("Nueva posición: (%s, %s), orientación: %s°", self.position_x, self.position_y, self.orientation)
\ No newline at end of file
@@ -0,0 +1,362 @@
+"""
+ESP8266 simulado sobre rover_control.Rover
+Servidor HTTP local con las rutas del firmware del rover, para probar y medir
+el camino completo de /api/execute/ sin el hardware:
+
+    POST /ejecutar   {"comando": "programa:cmd,cmd,..."} o un comando suelto
+                     {"comando": "avanzar_ctms:10"}; con Content-Type
+                     roverapp.wire.CONTENT_TYPE, el programa en formato binario
+    GET  /detener    detiene el programa en curso
+    GET  /estado     pose, motores y avance del programa
+    GET  /formatos   formatos y fragmentos que acepta (roverapp.views_rover)
+    /programa/...    transferencia por fragmentos (roverapp.streaming)
+
+El programa se ejecuta en un hilo propio, como en el firmware: /ejecutar
+responde en cuanto lo acepta. Un comando inválido se rechaza con 400 y
+{"comando": N}, el índice que views_rover ubica en el código UMG++. Detener
+el rover surte efecto entre un comando y el siguiente.
+
+Cada servidor puede simular la red (latencia, variación y pérdida de
+solicitudes) y la velocidad del rover: con speed=None los movimientos no
+esperan (rover_control.VirtualClock) y con speed=n se ejecutan n veces más
+rápido que en tiempo real (rover_control.ScaledClock).
+
+En las pruebas de Django basta con apuntar views_rover.ROVER_URL a la URL del
+servidor; start_rovers levanta varios rovers en puertos distintos. También
+puede ejecutarse aparte: python -m roverapp.simulated_rover --rovers 3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from . import rover_control
+from . import wire
+from .ir import ProgramIR, OPCODES, REPEAT, GIRAR
+from .simulation import parse_commands
+from .streaming import ChunkReceiver, StreamError
+from .transpiler import PYTHON_CALLS, GIRAR_CALLS
+
+# Intervalo con el que el servidor revisa si debe detenerse
+POLL_SECONDS = 0.05
+
+
+def _validate(commands):
+    """Índice y motivo del primer comando de texto inválido, o None"""
+    for index, command in enumerate(commands):
+        parts = command.split(':')
+        try:
+            opcode = OPCODES[parts[0]]
+            int(parts[1])
+            if opcode == REPEAT:
+                int(parts[2])
+        except (KeyError, IndexError, ValueError):
+            return index, f"Comando no válido: {command}"
+    return None
+
+
+class SimulatedRoverHandler(BaseHTTPRequestHandler):
+    """Rutas del firmware del rover"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def network(self):
+        """Simula la red; devuelve False si la solicitud se pierde"""
+        rover = self.server
+        delay = rover.latency + (rover.random.uniform(0, rover.jitter) if rover.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if rover.loss and rover.random.random() < rover.loss:
+            self.close_connection = True
+            return False
+        return True
+
+    def do_GET(self):
+        rover = self.server
+        url = urlsplit(self.path)
+        if not self.network():
+            return
+        if url.path == '/estado':
+            return self.reply(200, rover.status())
+        if url.path == '/detener':
+            rover.stop_program()
+            return self.reply(200, {'status': 'detenido'})
+        if url.path == '/formatos' and (rover.binary or rover.chunk_bytes):
+            anuncio = {'binario': [wire.WIRE_VERSION] if rover.binary else []}
+            if rover.chunk_bytes:
+                anuncio['fragmentos'] = {'ventana': rover.window, 'bytes': rover.chunk_bytes}
+            return self.reply(200, anuncio)
+        receiver = rover.transfers.get(parse_qs(url.query).get('transferencia', [''])[0])
+        if url.path == '/programa/estado' and receiver:
+            return self.reply(200, {'ack': receiver.ack})
+        self.reply(404, {})
+
+    def do_POST(self):
+        rover = self.server
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.network():
+            return
+
+        if url.path == '/ejecutar':
+            if self.headers.get('Content-Type') == wire.CONTENT_TYPE:
+                if not rover.binary:
+                    return self.reply(415, {'error': 'Formato binario no soportado'})
+                return self.reply(*rover.execute_binary(body))
+            try:
+                command = json.loads(body)['comando']
+            except (ValueError, KeyError, TypeError):
+                return self.reply(400, {'error': 'JSON inválido'})
+            commands = command[len('programa:'):].split(',') if command.startswith('programa:') else [command]
+            return self.reply(*rover.execute_text(commands))
+
+        if url.path == '/programa/inicio' and rover.chunk_bytes:
+            data = json.loads(body)
+            with rover.lock:
+                rover.transfers[data['transferencia']] = ChunkReceiver(
+                    data['transferencia'], data['fragmentos'], data['formato'], rover.window)
+            return self.reply(200, {'ack': -1})
+
+        receiver = rover.transfers.get(query.get('transferencia'))
+        if receiver is None:
+            return self.reply(404, {})
+        if url.path == '/programa/fin':
+            if not receiver.complete:
+                return self.reply(409, {})
+            with rover.lock:
+                rover.transfers.pop(receiver.transfer, None)
+            if receiver.wire_format == 'binary':
+                return self.reply(*rover.execute_binary(receiver.payload()))
+            return self.reply(*rover.execute_text(receiver.payload()))
+        if url.path == '/programa/fragmento':
+            try:
+                with rover.lock:
+                    ack = receiver.receive(int(query['secuencia']), body)
+            except (StreamError, KeyError, ValueError):
+                return self.reply(409, {})
+            return self.reply(200, {'ack': ack})
+        self.reply(404, {})
+
+
+class SimulatedRover(ThreadingHTTPServer):
+    """
+    ESP8266 simulado que ejecuta los programas en un rover_control.Rover
+
+    Attributes:
+        url (str): URL base del servidor
+        rover (Rover): Rover del programa en curso o del último ejecutado
+        programs (int): Programas aceptados
+        commands (int): Comandos ejecutados en total
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, loss=0.0, speed=None,
+                 binary=True, chunk_bytes=512, window=4, seed=None):
+        """
+        Args:
+            host (str): Dirección en la que escuchar
+            port (int): Puerto; 0 elige uno libre
+            latency (float): Retraso fijo de cada solicitud (segundos)
+            jitter (float): Retraso adicional aleatorio, entre 0 y jitter
+            loss (float): Probabilidad de perder una solicitud sin responder
+            speed (float): Veces más rápido que el tiempo real que se mueve
+                el rover, o None para no esperar
+            binary (bool): Aceptar programas en formato binario
+            chunk_bytes (int): Tamaño de fragmento anunciado, o 0 para no
+                aceptar transferencias por fragmentos
+            window (int): Ventana de fragmentos anunciada
+            seed (int): Semilla de la red simulada
+        """
+        super().__init__((host, port), SimulatedRoverHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.speed = speed
+        self.binary = binary
+        self.chunk_bytes = chunk_bytes
+        self.window = window
+        self.random = random.Random(seed)
+        self.transfers = {}
+        self.lock = threading.Lock()
+        self.url = f"http://{self.server_address[0]}:{self.server_address[1]}"
+        self.rover = self._new_rover()
+        self.programs = 0
+        self.commands = 0
+        self._program = None
+        self._current = 0
+        self._total = 0
+        self._stop = threading.Event()
+        self._runner = None
+        self._thread = None
+
+    def _new_rover(self):
+        clock = rover_control.VirtualClock() if self.speed is None else rover_control.ScaledClock(self.speed)
+        return rover_control.Rover(clock=clock)
+
+    def start(self):
+        """Atiende solicitudes en un hilo de fondo; devuelve el mismo servidor"""
+        self._thread = threading.Thread(target=self.serve_forever, args=(POLL_SECONDS,), name=f'rover-{self.url}',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el programa en curso y el servidor"""
+        self.stop_program()
+        self.shutdown()
+        self.server_close()
+
+    def execute_text(self, commands):
+        """
+        Acepta un programa de comandos de texto
+
+        Returns:
+            tuple: (código HTTP, cuerpo de la respuesta)
+        """
+        invalid = _validate(commands)
+        if invalid is not None:
+            return 400, {'error': invalid[1], 'comando': invalid[0]}
+        try:
+            opcodes, operands = parse_commands(commands)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return self._start(ProgramIR('remoto', opcodes, operands), len(commands))
+
+    def execute_binary(self, data):
+        """
+        Acepta un programa en formato binario (roverapp.wire)
+
+        Returns:
+            tuple: (código HTTP, cuerpo de la respuesta)
+        """
+        try:
+            opcodes, operands = wire.decode(data)
+        except wire.WireFormatError as e:
+            return 400, {'error': str(e)}
+        return self._start(ProgramIR('remoto', opcodes, operands), len(opcodes))
+
+    def _start(self, program, count):
+        # Un programa nuevo reemplaza al que esté en curso
+        self.stop_program()
+        with self.lock:
+            self.programs += 1
+            self._stop = threading.Event()
+            self._current = 0
+            self._total = 0
+            self.rover = self._new_rover()
+            self._runner = threading.Thread(target=self._run, args=(program, self.rover, self._stop), daemon=True)
+            self._runner.start()
+        return 200, {'status': 'ok', 'comandos': count}
+
+    def _run(self, program, rover, stop):
+        for opcode, operand in program.expanded_commands():
+            if stop.is_set():
+                return
+            if opcode == GIRAR:
+                getattr(rover, GIRAR_CALLS.get(operand, 'move_straight'))()
+            else:
+                getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+            with self.lock:
+                self._current += 1
+                self.commands += 1
+
+    def stop_program(self):
+        """Detiene el programa en curso después del comando que está ejecutando"""
+        runner = self._runner
+        self._stop.set()
+        if runner is not None and runner is not threading.current_thread():
+            runner.join()
+
+    def wait(self, timeout=None):
+        """
+        Espera a que termine el programa en curso
+
+        Returns:
+            bool: True si no queda ningún programa en curso
+        """
+        runner = self._runner
+        if runner is not None:
+            runner.join(timeout)
+            return not runner.is_alive()
+        return True
+
+    def status(self):
+        """Estado del rover para GET /estado"""
+        rover = self.rover
+        runner = self._runner
+        running = runner is not None and runner.is_alive() and not self._stop.is_set()
+        return {
+            'estado': 'ejecutando' if running else 'detenido',
+            'x': rover.position_x,
+            'y': rover.position_y,
+            'orientacion': rover.orientation,
+            'motor_izquierdo': rover.left_motor_enabled,
+            'motor_derecho': rover.right_motor_enabled,
+            'comandos_ejecutados': self._current,
+            'tiempo': rover.clock.elapsed
+        }
+
+
+def start_rovers(count, host='127.0.0.1', port=0, **options):
+    """
+    Levanta varios rovers simulados, cada uno en su puerto
+
+    Args:
+        count (int): Número de rovers
+        host (str): Dirección en la que escuchar
+        port (int): Puerto del primer rover (los demás le siguen), o 0 para
+            puertos libres
+        **options: Opciones de SimulatedRover
+
+    Returns:
+        list: Servidores ya iniciados
+    """
+    rovers = []
+    try:
+        for index in range(count):
+            rovers.append(SimulatedRover(host, port + index if port else 0, **options).start())
+    except OSError:
+        for rover in rovers:
+            rover.stop()
+        raise
+    return rovers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ESP8266 simulado del UMG Basic Rover 2.0')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8266, help='puerto del primer rover')
+    parser.add_argument('--rovers', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos por solicitud')
+    parser.add_argument('--jitter', type=float, default=0.0, help='segundos adicionales al azar')
+    parser.add_argument('--loss', type=float, default=0.0, help='probabilidad de perder una solicitud')
+    parser.add_argument('--speed', type=float, default=None, help='veces más rápido que el tiempo real')
+    arguments = parser.parse_args(argv)
+
+    rovers = start_rovers(arguments.rovers, arguments.host, arguments.port, latency=arguments.latency,
+                          jitter=arguments.jitter, loss=arguments.loss, speed=arguments.speed)
+    for rover in rovers:
+        print(f"Rover simulado en {rover.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for rover in rovers:
+            rover.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Simulación por lotes de programas UMG++ con NumPy
+Segundo motor de simulación, equivalente a ejecutar rover_control.Rover
+comando por comando pero calculando con operaciones sobre arreglos la pose
+después de cada comando ejecutado: posición, orientación, motores activos y
+tiempo simulado acumulado. Sigue el mismo modelo que trajectory.py
+(trajectory.motion_arrays): girar(1) deja activo solo el motor izquierdo
+(turn_right), girar(-1) solo el derecho (turn_left), girar(0) ambos
+(move_straight), y cada avance con un solo motor recorre la mitad y gira 10
+grados, como Rover._move_distance.
+
+Los bloques REPEAT se expanden antes de simular, así que el número de
+comandos ejecutados está acotado (max_commands). NumPy es obligatorio para
+este motor; sin NumPy, simulate lanza ImportError.
+"""
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from .ir import OPCODES, REPEAT, END_REPEAT, matching_ends
+from .trajectory import motion_arrays
+
+# Comandos ejecutados como máximo después de expandir los bloques REPEAT
+MAX_COMMANDS = 2_000_000
+
+
+def parse_commands(commands):
+    """
+    Códigos de operación y operandos de una lista de comandos para el ESP8266
+
+    Args:
+        commands (list): Comandos 'funcion:parametro' (esp8266_code); un
+            bloque 'repetir:n:k' repite los k comandos siguientes n veces
+
+    Returns:
+        array: Códigos de operación ('B'), con marcadores REPEAT y END_REPEAT
+        array: Operandos ('i')
+
+    Raises:
+        ValueError: Si un comando no es válido
+    """
+    opcodes = array('B')
+    operands = array('i')
+    # Comandos que faltan para cerrar cada bloque abierto; un comando cuenta
+    # para todos los bloques que lo contienen
+    remaining = []
+    for command in commands:
+        parts = command.split(':')
+        try:
+            opcode = OPCODES[parts[0]]
+            operand = int(parts[1])
+            length = int(parts[2]) if opcode == REPEAT else None
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Comando no válido: {command!r}") from e
+
+        for depth in range(len(remaining)):
+            remaining[depth] -= 1
+        opcodes.append(opcode)
+        operands.append(operand)
+        if opcode == REPEAT:
+            remaining.append(length)
+        # Cerrar los bloques que terminan con este comando
+        while remaining and remaining[-1] == 0:
+            remaining.pop()
+            opcodes.append(END_REPEAT)
+            operands.append(0)
+    if remaining:
+        raise ValueError('Bloque repetir con menos comandos que los indicados')
+    return opcodes, operands
+
+
+def expand(opcodes, operands, max_commands=MAX_COMMANDS):
+    """
+    Comandos en el orden en que se ejecutan, con los bloques REPEAT expandidos
+
+    Args:
+        opcodes (sequence): Códigos de operación
+        operands (sequence): Operandos
+        max_commands (int): Comandos ejecutados como máximo
+
+    Returns:
+        ndarray: Códigos de operación (uint8) sin marcadores
+        ndarray: Operandos (int64)
+
+    Raises:
+        ValueError: Si el programa ejecuta más de max_commands comandos
+    """
+    ops = np.asarray(opcodes, dtype=np.uint8)
+    values = np.asarray(operands, dtype=np.int64)
+    if not (ops == REPEAT).any():
+        return ops, values
+
+    ends = matching_ends(opcodes)
+    repeats = sorted(ends)
+
+    def block(start, end, position):
+        # Tramos de [start, end) y posición en repeats después del bloque
+        pieces_ops = []
+        pieces_values = []
+        length = 0
+        index = start
+        while position < len(repeats) and repeats[position] < end:
+            begin = repeats[position]
+            pieces_ops.append(ops[index:begin])
+            pieces_values.append(values[index:begin])
+            body_ops, body_values, position = block(begin + 1, ends[begin], position + 1)
+            count = int(values[begin])
+            length += (begin - index) + len(body_ops) * count
+            if length > max_commands:
+                raise ValueError(f"El programa ejecuta más de {max_commands} comandos")
+            pieces_ops.append(np.tile(body_ops, count))
+            pieces_values.append(np.tile(body_values, count))
+            index = ends[begin] + 1
+        pieces_ops.append(ops[index:end])
+        pieces_values.append(values[index:end])
+        return np.concatenate(pieces_ops), np.concatenate(pieces_values), position
+
+    flat_ops, flat_values, _ = block(0, len(ops), 0)
+    if len(flat_ops) > max_commands:
+        raise ValueError(f"El programa ejecuta más de {max_commands} comandos")
+    return flat_ops, flat_values
+
+
+def simulate(program, max_commands=MAX_COMMANDS):
+    """
+    Simula un programa completo y devuelve la pose después de cada comando
+
+    Args:
+        program (ProgramIR | list): Representación intermedia o lista de
+            comandos para el ESP8266
+        max_commands (int): Comandos ejecutados como máximo
+
+    Returns:
+        dict: Arreglos con un elemento por comando ejecutado: 'x' e 'y' (cm),
+            'orientation' (grados), 'left_motor' y 'right_motor' (bool) y
+            'elapsed' (segundos simulados desde el inicio)
+
+    Raises:
+        ImportError: Si NumPy no está instalado
+        ValueError: Si los comandos no son válidos o son demasiados
+    """
+    if np is None:
+        raise ImportError('La simulación por lotes necesita NumPy')
+    if isinstance(program, list):
+        opcodes, operands = parse_commands(program)
+    else:
+        opcodes, operands = program.opcodes, program.operands
+    ops, values = expand(opcodes, operands, max_commands)
+
+    if not len(ops):
+        empty = np.zeros(0)
+        return {'x': empty, 'y': empty, 'orientation': empty.astype(np.int64),
+                'left_motor': empty.astype(bool), 'right_motor': empty.astype(bool), 'elapsed': empty}
+
+    headings, modes, final_heading, final_mode, dx, dy, _, seconds, _ = motion_arrays(ops, values, 0, 0)
+
+    # Orientación y motores después de cada comando: los de antes del siguiente
+    headings_after = np.empty_like(headings)
+    headings_after[:-1] = headings[1:]
+    headings_after[-1] = final_heading
+    modes_after = np.empty_like(modes)
+    modes_after[:-1] = modes[1:]
+    modes_after[-1] = final_mode
+    return {
+        'x': np.cumsum(dx),
+        'y': np.cumsum(dy),
+        'orientation': headings_after * 10,
+        # girar(1) = turn_right: solo el motor izquierdo; girar(-1) = turn_left
+        'left_motor': modes_after >= 0,
+        'right_motor': modes_after <= 0,
+        'elapsed': np.cumsum(seconds)
+    }
@@ -0,0 +1,151 @@
+"""
+Mapas de código generado a posiciones del código fuente UMG++
+Cada generador de código tiene su mapa, con una entrada por elemento generado:
+
+- 'python': una por línea del código Python (la línea n es la entrada n - 1)
+- 'esp8266': una por comando de texto para el ESP8266 (esp8266_code)
+- 'commands': una por comando de la representación intermedia, que es
+  también el índice de los comandos del formato binario (roverapp.wire)
+
+Las líneas sin código fuente (la cabecera y el final del código Python)
+tienen línea 0.
+
+En los resultados de compilación y en los artefactos guardados los mapas van
+codificados por diferencias, que en un programa típico son números de uno o
+dos dígitos: cada línea es la diferencia con la línea anterior y cada columna
+es la diferencia con la columna anterior si la línea no cambió, o la columna
+misma si cambió. SourceMap.decode reconstruye los arreglos una vez y desde
+ahí buscar la posición de un comando es O(1).
+"""
+from array import array
+from itertools import accumulate, chain
+
+from .ir import END_REPEAT
+
+
+class SourceMap:
+    """
+    Posiciones en el código fuente de los elementos generados
+
+    Attributes:
+        lines (array): Línea de cada elemento ('I'), 0 si no tiene
+        columns (array): Columna de cada elemento ('I')
+    """
+    __slots__ = ('lines', 'columns')
+
+    def __init__(self, lines, columns):
+        self.lines = lines
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.lines)
+
+    def lookup(self, index):
+        """
+        Posición en el código fuente del elemento generado indicado
+
+        Args:
+            index (int): Índice del elemento (línea de Python - 1 o comando)
+
+        Returns:
+            dict: {'line', 'column'}, o None si el índice está fuera del mapa
+                o el elemento no sale del código fuente
+        """
+        if not 0 <= index < len(self.lines) or not self.lines[index]:
+            return None
+        return {'line': self.lines[index], 'column': self.columns[index]}
+
+    def encode(self):
+        """
+        Forma compacta y serializable en JSON del mapa
+
+        Returns:
+            dict: {'lines': diferencias, 'columns': diferencias o columnas}
+        """
+        lines = self.lines
+        columns = self.columns
+        line_deltas = [line - previous for line, previous in zip(lines, chain((0,), lines))]
+        column_deltas = [column if line_delta else column - previous
+                         for line_delta, column, previous in zip(line_deltas, columns, chain((0,), columns))]
+        return {'lines': line_deltas, 'columns': column_deltas}
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Reconstruye el mapa a partir de encode()
+
+        Args:
+            data (dict): Mapa codificado
+
+        Returns:
+            SourceMap: Mapa con las posiciones absolutas
+        """
+        line_deltas = data['lines']
+        lines = array('I', accumulate(line_deltas))
+        columns = array('I')
+        column = 0
+        for line_delta, column_delta in zip(line_deltas, data['columns']):
+            column = column + column_delta if not line_delta else column_delta
+            columns.append(column)
+        return cls(lines, columns)
+
+
+def command_map(ir):
+    """Mapa de los comandos de la representación intermedia (formato binario)"""
+    return SourceMap(ir.lines, ir.columns)
+
+
+def esp8266_map(ir):
+    """Mapa de los comandos de texto para el ESP8266, que no incluyen END_REPEAT"""
+    if END_REPEAT not in ir.opcodes:
+        return command_map(ir)
+    keep = [opcode != END_REPEAT for opcode in ir.opcodes]
+    return SourceMap(
+        array('I', (line for line, kept in zip(ir.lines, keep) if kept)),
+        array('I', (column for column, kept in zip(ir.columns, keep) if kept))
+    )
+
+
+def python_map(ir, commands, header_lines, footer_lines):
+    """
+    Mapa de las líneas del código Python generado
+
+    Args:
+        ir (ProgramIR): Representación intermedia del programa
+        commands (list): Índice del comando de la representación intermedia
+            de cada línea del cuerpo (UMGPPTranspiler.python_body)
+        header_lines (int): Líneas de la cabecera
+        footer_lines (int): Líneas del final
+
+    Returns:
+        SourceMap: Una entrada por línea de Python
+    """
+    ir_lines = ir.lines
+    ir_columns = ir.columns
+    lines = array('I', [0]) * header_lines
+    columns = array('I', [0]) * header_lines
+    lines.extend(array('I', [ir_lines[index] for index in commands]))
+    columns.extend(array('I', [ir_columns[index] for index in commands]))
+    lines.extend(array('I', [0]) * footer_lines)
+    columns.extend(array('I', [0]) * footer_lines)
+    return SourceMap(lines, columns)
+
+
+def source_maps(ir, python_commands, header_lines, footer_lines):
+    """
+    Mapas de todos los generadores, codificados para el resultado de compilación
+
+    Args:
+        ir (ProgramIR): Representación intermedia del programa
+        python_commands (list): Índice del comando de cada línea del cuerpo Python
+        header_lines (int): Líneas de la cabecera del código Python
+        footer_lines (int): Líneas del final del código Python
+
+    Returns:
+        dict: Mapas 'python', 'esp8266' y 'commands' codificados
+    """
+    return {
+        'python': python_map(ir, python_commands, header_lines, footer_lines).encode(),
+        'esp8266': esp8266_map(ir).encode(),
+        'commands': command_map(ir).encode()
+    }
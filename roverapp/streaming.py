@@ -0,0 +1,355 @@
+"""
+Transferencia de programas largos al rover por fragmentos
+El programa se divide en fragmentos numerados que se envían con una ventana
+acotada de fragmentos sin confirmar. El rover confirma de forma acumulada
+(el último fragmento recibido sin huecos), así que su búfer nunca necesita más
+de una ventana de fragmentos, y tras un fallo la transferencia continúa desde
+la última confirmación en lugar de reenviar el programa completo.
+
+Protocolo HTTP del firmware (todas las respuestas son JSON):
+    POST /programa/inicio    {"transferencia", "fragmentos", "formato"} -> {"ack": -1}
+    POST /programa/fragmento?transferencia=ID&secuencia=N  (cuerpo: fragmento) -> {"ack": k}
+    GET  /programa/estado?transferencia=ID  -> {"ack": k}, 404 si no conoce la transferencia
+    POST /programa/fin?transferencia=ID     -> inicia la ejecución
+
+El firmware anuncia la ventana y el tamaño de fragmento en GET /formatos, por
+ejemplo {"fragmentos": {"ventana": 4, "bytes": 512}}. Los fragmentos de texto
+son comandos 'funcion:parametro' separados por comas y nunca parten un
+comando; los binarios son trozos consecutivos del formato de roverapp.wire.
+"""
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 4
+DEFAULT_CHUNK_BYTES = 512
+
+
+class StreamError(Exception):
+    """La transferencia por fragmentos no pudo completarse"""
+
+
+def text_chunks(commands, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Agrupa comandos de texto en fragmentos de a lo sumo chunk_bytes bytes
+
+    Args:
+        commands (list): Comandos en formato 'funcion:parametro'
+        chunk_bytes (int): Tamaño máximo de cada fragmento; un comando más
+            largo ocupa un fragmento propio
+
+    Returns:
+        list: Fragmentos (bytes)
+    """
+    chunks = []
+    current = []
+    size = 0
+    for command in commands:
+        encoded = command.encode()
+        if current and size + 1 + len(encoded) > chunk_bytes:
+            chunks.append(b','.join(current))
+            current = []
+            size = 0
+        size += len(encoded) + (1 if current else 0)
+        current.append(encoded)
+    if current:
+        chunks.append(b','.join(current))
+    return chunks
+
+
+def binary_chunks(data, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Divide un programa binario en fragmentos de chunk_bytes bytes
+
+    Args:
+        data (bytes): Programa codificado con roverapp.wire
+        chunk_bytes (int): Tamaño de cada fragmento
+
+    Returns:
+        list: Fragmentos (bytes)
+    """
+    return [data[start:start + chunk_bytes] for start in range(0, len(data), chunk_bytes)]
+
+
+class StreamingUpload:
+    """
+    Envío de un programa por fragmentos con ventana y confirmaciones
+
+    Attributes:
+        transfer (str): Identificador de la transferencia
+        retries (int): Fragmentos o solicitudes que fallaron y se repitieron
+        resumes (int): Veces que se retomó desde la confirmación del rover
+        restarts (int): Veces que el rover olvidó la transferencia y se reinició
+    """
+
+    def __init__(self, url, chunks, wire_format, window=DEFAULT_WINDOW, timeout=2,
+                 max_retries=5, backoff=0.1, progress=None):
+        """
+        Args:
+            url (str): URL base del rover
+            chunks (list): Fragmentos (bytes), de text_chunks o binary_chunks
+            wire_format (str): 'text' o 'binary'
+            window (int): Fragmentos sin confirmar que pueden estar en vuelo
+            timeout (float): Tiempo máximo de cada solicitud, en segundos
+            max_retries (int): Fallos seguidos sin avanzar antes de abandonar
+            backoff (float): Espera tras un fallo, multiplicada por los fallos seguidos
+            progress (callable): Recibe un dict con 'acked_chunks', 'chunks',
+                'acked_bytes' y 'bytes' cada vez que avanza la confirmación
+        """
+        self.url = url
+        self.chunks = chunks
+        self.wire_format = wire_format
+        self.window = max(1, window)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress = progress
+        self.transfer = uuid.uuid4().hex[:8]
+        self.retries = 0
+        self.resumes = 0
+        self.restarts = 0
+        # Bytes confirmados cuando el fragmento i es el último confirmado
+        self._acked_bytes = []
+        total = 0
+        for chunk in chunks:
+            total += len(chunk)
+            self._acked_bytes.append(total)
+
+    def run(self):
+        """
+        Envía el programa y ordena al rover ejecutarlo
+
+        Returns:
+            dict: Resumen de la transferencia y respuesta del rover
+
+        Raises:
+            StreamError: Si se agotaron los reintentos
+        """
+        start = time.perf_counter()
+        self._retrying('inicio', self._begin)
+
+        total = len(self.chunks)
+        acked = -1
+        next_sequence = 0
+        in_flight = {}
+        resend = []
+        failures = 0
+        # Las respuestas de antes de un reinicio del rover ya no valen
+        epoch = 0
+        with ThreadPoolExecutor(self.window) as pool:
+            while acked < total - 1:
+                # Llenar la ventana, primero con los fragmentos que fallaron;
+                # nunca más allá de acked + window
+                while len(in_flight) < self.window:
+                    if resend:
+                        sequence = resend.pop(0)
+                    elif next_sequence < total and next_sequence <= acked + self.window:
+                        sequence = next_sequence
+                        next_sequence += 1
+                    else:
+                        break
+                    # Un fragmento fallido que aún no toca enviar (tras un
+                    # reinicio) se enviará en orden más adelante
+                    if acked < sequence < next_sequence and (sequence, epoch) not in in_flight.values():
+                        in_flight[pool.submit(self._send, sequence)] = sequence, epoch
+
+                failed = []
+                if in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        sequence, sent_epoch = in_flight.pop(future)
+                        if sent_epoch != epoch:
+                            continue
+                        try:
+                            ack = future.result()
+                        except StreamError as e:
+                            logger.warning(f"Fragmento {sequence} de {self.transfer} falló: {e}")
+                            failed.append(sequence)
+                            continue
+                        if ack > acked:
+                            acked = min(ack, total - 1)
+                            failures = 0
+                            self._report(acked)
+                    if not failed:
+                        continue
+
+                if acked == total - 1:
+                    break
+                failures += 1
+                self.retries += len(failed) or 1
+                if failures > self.max_retries:
+                    raise StreamError(f"Sin confirmación del rover después de {self.max_retries} reintentos "
+                                      f"({acked + 1} de {total} fragmentos confirmados)")
+                time.sleep(self.backoff * failures)
+
+                # Retomar desde la última confirmación del rover
+                restarts = self.restarts
+                rover_ack = self._resume(acked)
+                if self.restarts != restarts:
+                    epoch += 1
+                    acked = -1
+                    next_sequence = 0
+                    resend = []
+                    continue
+                went_back = rover_ack < acked
+                if rover_ack != acked:
+                    if not went_back:
+                        failures = 0
+                    acked = min(rover_ack, total - 1)
+                    self._report(acked)
+                if failed and not went_back:
+                    resend.extend(sorted(failed))
+                else:
+                    # Sin fallos pero sin avanzar, o el rover confirma menos de
+                    # lo esperado: perdió fragmentos ya enviados y se
+                    # reenvían desde su confirmación
+                    next_sequence = acked + 1
+
+        response = self._retrying('fin', self._finish)
+        return {
+            'transferencia': self.transfer,
+            'fragmentos': total,
+            'bytes': self._acked_bytes[-1] if total else 0,
+            'ventana': self.window,
+            'reintentos': self.retries,
+            'reanudaciones': self.resumes,
+            'reinicios': self.restarts,
+            'segundos': time.perf_counter() - start,
+            'rover_response': response
+        }
+
+    def _report(self, acked):
+        logger.debug(f"Transferencia {self.transfer}: {acked + 1}/{len(self.chunks)} fragmentos confirmados")
+        if self.progress:
+            self.progress({
+                'acked_chunks': acked + 1,
+                'chunks': len(self.chunks),
+                'acked_bytes': self._acked_bytes[acked] if acked >= 0 else 0,
+                'bytes': self._acked_bytes[-1] if self.chunks else 0
+            })
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = requests.request(method, f"{self.url}{path}", timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise StreamError(f"{type(e).__name__}") from e
+        if response.status_code != 200:
+            raise StreamError(f"Respuesta {response.status_code} del rover")
+        try:
+            return response.json() if response.text else {}
+        except ValueError as e:
+            raise StreamError('Respuesta del rover no es JSON') from e
+
+    def _retrying(self, name, action):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return action()
+            except StreamError as e:
+                if attempt == self.max_retries:
+                    raise StreamError(f"Falló '{name}' de la transferencia: {e}") from e
+                self.retries += 1
+                time.sleep(self.backoff * (attempt + 1))
+
+    def _begin(self):
+        return self._request('POST', '/programa/inicio', json={
+            'transferencia': self.transfer,
+            'fragmentos': len(self.chunks),
+            'formato': self.wire_format
+        })
+
+    def _send(self, sequence):
+        body = self._request(
+            'POST', '/programa/fragmento',
+            params={'transferencia': self.transfer, 'secuencia': sequence},
+            data=self.chunks[sequence],
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+        try:
+            return int(body['ack'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise StreamError('Respuesta sin confirmación') from e
+
+    def _resume(self, acked):
+        """Última confirmación según el rover; reinicia si el rover olvidó la transferencia"""
+        self.resumes += 1
+        try:
+            response = requests.get(f"{self.url}/programa/estado", params={'transferencia': self.transfer},
+                                    timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return acked
+        if response.status_code == 404:
+            logger.warning(f"El rover no conoce la transferencia {self.transfer}; se reinicia")
+            self.restarts += 1
+            self._retrying('inicio', self._begin)
+            return -1
+        try:
+            return int(response.json()['ack']) if response.status_code == 200 else acked
+        except (KeyError, TypeError, ValueError):
+            return acked
+
+    def _finish(self):
+        return self._request('POST', '/programa/fin', params={'transferencia': self.transfer})
+
+
+class ChunkReceiver:
+    """
+    Recepción de referencia de una transferencia, como la hace el firmware
+
+    Guarda a lo sumo una ventana de fragmentos fuera de orden y confirma el
+    último fragmento recibido sin huecos. Los fragmentos repetidos se ignoran.
+
+    Attributes:
+        transfer (str): Identificador de la transferencia
+        chunks (int): Fragmentos esperados
+        wire_format (str): 'text' o 'binary'
+        ack (int): Último fragmento recibido sin huecos (-1 al comenzar)
+        parts (list): Fragmentos recibidos en orden
+    """
+
+    def __init__(self, transfer, chunks, wire_format, window=DEFAULT_WINDOW):
+        self.transfer = transfer
+        self.chunks = chunks
+        self.wire_format = wire_format
+        self.window = window
+        self.ack = -1
+        self.parts = []
+        self._pending = {}
+
+    @property
+    def complete(self):
+        return self.ack == self.chunks - 1
+
+    def receive(self, sequence, data):
+        """
+        Recibe un fragmento
+
+        Args:
+            sequence (int): Número del fragmento
+            data (bytes): Contenido
+
+        Returns:
+            int: Confirmación acumulada
+
+        Raises:
+            StreamError: Si el fragmento está fuera de la ventana
+        """
+        if sequence <= self.ack:
+            return self.ack
+        if sequence >= self.chunks or sequence > self.ack + self.window:
+            raise StreamError(f"Fragmento {sequence} fuera de la ventana")
+        self._pending[sequence] = data
+        while self.ack + 1 in self._pending:
+            self.ack += 1
+            self.parts.append(self._pending.pop(self.ack))
+        return self.ack
+
+    def payload(self):
+        """Programa reconstruido: bytes del formato binario o lista de comandos de texto"""
+        if self.wire_format == 'binary':
+            return b''.join(self.parts)
+        return b','.join(self.parts).decode().split(',') if self.parts else []
@@ -1,3 +1,1382 @@
-from django.test import TestCase
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
 
-# Create your tests here.
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase
+
+from . import ir as ir_module
+from . import rover_control
+from .transpiler import UMGPPTranspiler, public_result, PYTHON_CALLS, GIRAR_CALLS, MAX_NESTING, MAX_EXECUTED_COMMANDS
+from .incremental import IncrementalDocument
+from .compile_cache import CompilationCache, source_hash, RESULT_BYTES_PER_SOURCE_BYTE
+from .compile_metrics import CompileMetrics, MetricsAggregate, STAGES
+from .batch import BatchCompiler
+from . import views_rover
+from . import wire
+from .streaming import StreamingUpload, ChunkReceiver, StreamError, text_chunks, binary_chunks
+from . import trajectory
+from . import artifacts
+from .plan import compile_plan, cached_plan
+from .jobs import CompileJobQueue, JobRejected
+from .source_map import SourceMap
+from . import simulation
+from .fleet import FleetSimulator
+from .simulated_rover import SimulatedRover, start_rovers
+from . import views_api
+from .arena import Arena, rover_path
+
+
+class TokenizeTests(SimpleTestCase):
+    """Pruebas del analizador léxico de UMG++"""
+
+    def setUp(self):
+        self.transpiler = UMGPPTranspiler()
+
+    def test_tokens_con_linea_y_columna(self):
+        tokens, errors = self.transpiler.tokenize("PROGRAM demo\nBEGIN\n  girar(1)+avanzar_ctms(-20);\nEND.")
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            [(t['type'], t['value'], t['line'], t['column']) for t in tokens[2:9]],
+            [
+                ('KEYWORD', 'BEGIN', 2, 1),
+                ('FUNCTION', 'girar', 3, 3),
+                ('LPAREN', '(', 3, 8),
+                ('NUMBER', '1', 3, 9),
+                ('RPAREN', ')', 3, 10),
+                ('PLUS', '+', 3, 11),
+                ('FUNCTION', 'avanzar_ctms', 3, 12),
+            ]
+        )
+
+    def test_palabras_clave_solo_como_palabra_completa(self):
+        tokens, _ = self.transpiler.tokenize("ENDX girar2 123abc")
+
+        self.assertEqual(
+            [(t['type'], t['value']) for t in tokens],
+            [('IDENTIFIER', 'ENDX'), ('IDENTIFIER', 'girar2'), ('NUMBER', '123'), ('IDENTIFIER', 'abc')]
+        )
+
+    def test_errores_lexicos(self):
+        tokens, errors = self.transpiler.tokenize("BEGIN\n  año @")
+
+        self.assertEqual([t['value'] for t in tokens], ['BEGIN', 'o'])
+        self.assertEqual(
+            [(e['message'], e['line'], e['column']) for e in errors],
+            [
+                ("Carácter no reconocido: 'a'", 2, 3),
+                ("Carácter no reconocido: 'ñ'", 2, 4),
+                ("Carácter no reconocido: '@'", 2, 7),
+            ]
+        )
+
+
+class ParseTests(SimpleTestCase):
+    """Pruebas del análisis sintáctico y del AST compacto"""
+
+    def setUp(self):
+        self.transpiler = UMGPPTranspiler()
+
+    def test_parse_en_flujo_igual_que_lista(self):
+        code = "PROGRAM demo\nBEGIN\n  girar(1)+girar(-1)+avanzar_mts(2);\n  circulo(50);\nEND."
+        tokens, _ = self.transpiler.tokenize(code)
+
+        desde_lista, errores_lista = self.transpiler.parse(tokens)
+        en_flujo, errores_flujo = self.transpiler.parse(self.transpiler.iter_tokens(code, []))
+
+        self.assertEqual(errores_lista, [])
+        self.assertEqual(errores_flujo, [])
+        self.assertEqual(desde_lista.to_dict(), en_flujo.to_dict())
+
+    def test_compile_devuelve_ast_en_forma_json(self):
+        result = self.transpiler.compile("PROGRAM demo BEGIN girar(1)+avanzar_ctms(10); rotar(2); END.")
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['ast'], {
+            'type': 'program',
+            'name': 'demo',
+            'instructions': [
+                {
+                    'type': 'giro_combination',
+                    'giros': [{'function': 'girar', 'parameter': 1}],
+                    'advance': {'function': 'avanzar_ctms', 'parameter': 10}
+                },
+                {'type': 'instruction', 'function': 'rotar', 'parameter': 2},
+            ]
+        })
+
+    def test_errores_sintacticos(self):
+        result = self.transpiler.compile("PROGRAM demo\nBEGIN\n  avanzar_ctms(10)\n  rotar(2);\nEND.")
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['stage'], 'syntax')
+        self.assertEqual((result['errors'][0]['line'], result['errors'][0]['column']), (4, 3))
+
+    def test_programa_vacio(self):
+        result = self.transpiler.compile("   ")
+
+        self.assertEqual(result['stage'], 'syntax')
+
+
+class AllErrorsTests(SimpleTestCase):
+    """Pruebas del modo que reúne los errores de todas las etapas"""
+
+    code = "PROGRAM demo\nBEGIN\n  girar(7);\n  avanzar_ctms(10) @;\n  rotar 2;\n  circulo(500);\nEND."
+
+    def test_errores_de_todas_las_etapas_ordenados(self):
+        result = UMGPPTranspiler().compile(self.code, all_errors=True)
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['stage'], 'lexical')
+        self.assertEqual(result['stages'], ['lexical', 'syntax', 'semantic'])
+        self.assertEqual(
+            [(error['stage'], error['line'], error['column']) for error in result['errors']],
+            [('semantic', 3, 3), ('lexical', 4, 20), ('syntax', 5, 9), ('semantic', 6, 3)]
+        )
+
+    def test_cabecera_incompleta_no_oculta_el_cuerpo(self):
+        result = UMGPPTranspiler().compile("PROGRAM BEGIN caminar(0); END.", all_errors=True)
+
+        self.assertEqual([error['stage'] for error in result['errors']], ['syntax', 'semantic'])
+
+    def test_programa_valido_igual_que_modo_normal(self):
+        transpiler = UMGPPTranspiler()
+        code = "PROGRAM demo BEGIN girar(1)+avanzar_ctms(10); rotar(2); END."
+
+        self.assertEqual(public_result(transpiler.compile(code, all_errors=True)),
+                         public_result(transpiler.compile(code)))
+
+
+class IncrementalCompileTests(SimpleTestCase):
+    """Pruebas de la compilación incremental"""
+
+    code = "PROGRAM demo\nBEGIN\n  avanzar_ctms(10);\n  girar(1)+avanzar_mts(2);\n  circulo(50);\nEND."
+
+    def edit(self, document, version, start_line, start_column, end_line, end_column, text):
+        return document.update([{
+            'start_line': start_line, 'start_column': start_column,
+            'end_line': end_line, 'end_column': end_column, 'text': text
+        }], version)
+
+    def test_edicion_devuelve_solo_los_tramos_modificados(self):
+        document = IncrementalDocument(self.code)
+
+        result = self.edit(document, 1, 3, 16, 3, 18, '25')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['version'], 1)
+        self.assertEqual(result['changes'], [{
+            'python': {'start': 12, 'deleted': 1, 'lines': ['    rover.move_cm(25)  # Avanzar 25 centímetros']},
+            'esp8266': {'start': 0, 'deleted': 1, 'commands': ['avanzar_ctms:25']},
+            'reprocessed': 1
+        }])
+
+    def test_diagnosticos_iguales_a_compilacion_completa(self):
+        document = IncrementalDocument(self.code)
+
+        # Romper una instrucción, insertar líneas y luego corregirla
+        self.edit(document, 1, 3, 19, 3, 20, '')
+        self.edit(document, 2, 4, 1, 4, 1, '  rotar(0);\n  caminar(3);\n')
+        result = self.edit(document, 3, 3, 19, 3, 19, ';')
+
+        expected = UMGPPTranspiler().compile(document.code)
+        self.assertEqual(result['stage'], 'semantic')
+        self.assertEqual(result['errors'], expected['errors'])
+
+    def test_edicion_en_la_cabecera_recompila_todo(self):
+        document = IncrementalDocument(self.code)
+
+        result = self.edit(document, 1, 1, 9, 1, 13, 'otro')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['python_code'], UMGPPTranspiler().compile(document.code)['python_code'])
+
+
+class CompilationCacheTests(SimpleTestCase):
+    """Pruebas de la caché de compilación"""
+
+    code = "PROGRAM demo BEGIN avanzar_ctms(10); END."
+
+    def test_acierto_no_vuelve_a_compilar(self):
+        cache = CompilationCache()
+        first = cache.compile(self.code)
+
+        with mock.patch('roverapp.compile_cache.transpile_to_python') as transpile:
+            second = cache.compile(self.code)
+
+        transpile.assert_not_called()
+        self.assertIs(first, second)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+    def test_all_errors_comparte_los_resultados_exitosos(self):
+        cache = CompilationCache()
+        first = cache.compile(self.code, all_errors=True)
+        self.assertIs(cache.compile(self.code), first)
+
+        invalid = "PROGRAM demo BEGIN girar(5); avanzar_ctms(1) END."
+        self.assertEqual(cache.compile(invalid)['stage'], 'syntax')
+        for _ in range(2):
+            self.assertEqual(cache.compile(invalid, all_errors=True)['stages'], ['syntax', 'semantic'])
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 3, 3))
+
+    def test_lru_acotado(self):
+        cache = CompilationCache(max_entries=2)
+        for name in ('a', 'b', 'a', 'c', 'b'):
+            cache.compile(f"PROGRAM {name} BEGIN END.")
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 4, 2))
+
+    def test_tamano_acotado(self):
+        size = len(self.code) * RESULT_BYTES_PER_SOURCE_BYTE
+        shared = LocMemCache('umgpp-tests-bytes', {})
+        cache = CompilationCache(shared_cache=shared, max_bytes=2 * size)
+        for name in ('demo', 'dema', 'demb'):
+            cache.compile(self.code.replace('demo', name))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes']), (2, 2 * size))
+
+        large = "PROGRAM grande BEGIN" + " avanzar_ctms(10);" * 20 + " END."
+        self.assertTrue(cache.compile(large)['success'])
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertIsNone(shared.get('umgpp:' + source_hash(large)))
+        self.assertEqual(cache.timeout, 24 * 60 * 60)
+
+    def test_nivel_compartido_entre_procesos(self):
+        shared = LocMemCache('umgpp-tests', {})
+        CompilationCache(shared_cache=shared).compile(self.code)
+        other_process = CompilationCache(shared_cache=shared)
+
+        with mock.patch('roverapp.compile_cache.transpile_to_python') as transpile:
+            result = other_process.compile(self.code)
+
+        transpile.assert_not_called()
+        self.assertTrue(result['success'])
+        self.assertEqual(other_process.stats()['shared_hits'], 1)
+
+    def test_clave_depende_de_la_version_del_compilador(self):
+        key = source_hash(self.code)
+
+        with mock.patch('roverapp.compile_cache.COMPILER_VERSION', 'otra'):
+            self.assertNotEqual(source_hash(self.code), key)
+
+
+class CompileMetricsTests(SimpleTestCase):
+    """Pruebas de las métricas por etapa de la compilación"""
+
+    code = "PROGRAM demo BEGIN girar(1)+avanzar_ctms(10); cuadrado(20); END."
+
+    def test_etapas_y_conteos(self):
+        metrics = CompileMetrics()
+        result = UMGPPTranspiler().compile(self.code, metrics)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(tuple(metrics.stages), tuple(stage for stage in STAGES if stage != 'optimize'))
+        self.assertEqual((metrics.tokens, metrics.instructions, metrics.commands), (20, 2, 3))
+        self.assertIsNone(metrics.stage)
+        self.assertGreaterEqual(metrics.total_seconds, metrics.stages['syntax']['seconds'])
+
+    def test_falla_registra_la_etapa(self):
+        metrics = CompileMetrics()
+        UMGPPTranspiler().compile("PROGRAM demo BEGIN girar(5); END.", metrics)
+
+        self.assertEqual(metrics.stage, 'semantic')
+        self.assertEqual(list(metrics.stages), ['lexical', 'syntax', 'semantic'])
+
+    def test_acumulado_separa_aciertos_de_cache(self):
+        cache = CompilationCache()
+        aggregate = MetricsAggregate()
+        for _ in range(2):
+            metrics = CompileMetrics()
+            cache.compile(self.code, metrics)
+            aggregate.record(metrics)
+
+        snapshot = aggregate.snapshot()
+        self.assertEqual((snapshot['compiles'], snapshot['cached']), (1, 1))
+        self.assertEqual(snapshot['outcomes'], {'success': 1})
+        self.assertEqual(sum(map(sum, snapshot['histograms'])), 1)
+        self.assertEqual(snapshot['histograms'][0][0], 1)
+
+
+class OptimizerTests(SimpleTestCase):
+    """Pruebas del optimizador de mirilla"""
+
+    code = ("PROGRAM demo BEGIN avanzar_ctms(30); avanzar_mts(1); girar(0); avanzar_vlts(2); "
+            "rotar(3); girar(1); girar(1)+avanzar_ctms(20); girar(-1); girar(0); avanzar_ctms(-5); "
+            "cuadrado(20); avanzar_ctms(5); avanzar_ctms(-5); caminar(2); END.")
+
+    def final_pose(self, ir):
+        rover = rover_control.Rover()
+        for opcode, operand in ir.expanded_commands():
+            if opcode == ir_module.GIRAR:
+                getattr(rover, GIRAR_CALLS[operand])()
+            else:
+                getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+        return (round(rover.position_x, 9), round(rover.position_y, 9), rover.orientation,
+                rover.left_motor_enabled, rover.right_motor_enabled)
+
+    def test_elimina_comandos_redundantes(self):
+        result = UMGPPTranspiler().compile(self.code, optimize=True)
+
+        self.assertEqual(result['esp8266_code'], [
+            'avanzar_ctms:170', 'girar:1', 'avanzar_ctms:20', 'girar:0', 'avanzar_ctms:-5',
+            'cuadrado:20', 'caminar:2',
+        ])
+        self.assertEqual(result['optimization'], {'commands': 15, 'optimized_commands': 7, 'removed': 8})
+
+    @mock.patch.object(rover_control, 'logger')
+    @mock.patch.object(rover_control.time, 'sleep')
+    def test_misma_pose_final(self, sleep, logger):
+        transpiler = UMGPPTranspiler()
+        original = transpiler.compile(self.code)['ir']
+        optimized = transpiler.compile(self.code, optimize=True)['ir']
+
+        self.assertEqual(self.final_pose(optimized), self.final_pose(original))
+
+
+class RepeatTests(SimpleTestCase):
+    """Pruebas de los bloques REPEAT"""
+
+    code = ("PROGRAM demo\nBEGIN\n  REPEAT 50 BEGIN\n    REPEAT 4 BEGIN avanzar_ctms(20); girar(1); END;\n"
+            "    caminar(1);\n  END;\nEND.")
+
+    def test_ast_anidado(self):
+        result = UMGPPTranspiler().compile(self.code)
+
+        self.assertEqual(result['ast']['instructions'][0]['count'], 50)
+        self.assertEqual(result['ast']['instructions'][0]['instructions'][0]['type'], 'repeat')
+
+    def test_bucle_en_python_y_longitud_en_esp8266(self):
+        result = UMGPPTranspiler().compile(self.code)
+
+        self.assertIn("    for _ in range(50):  # REPEAT 50\n        for _ in range(4):  # REPEAT 4\n"
+                      "            rover.move_cm(20)", result['python_code'])
+        self.assertEqual(result['esp8266_code'], [
+            'repetir:50:4', 'repetir:4:2', 'avanzar_ctms:20', 'girar:1', 'caminar:1',
+        ])
+        self.assertEqual(len(list(result['ir'].expanded_commands())), 50 * 9)
+
+    def test_errores_de_bloque(self):
+        transpiler = UMGPPTranspiler()
+
+        result = transpiler.compile("PROGRAM demo BEGIN REPEAT 0 BEGIN girar(3); END; END.")
+        self.assertEqual(result['stage'], 'semantic')
+        self.assertEqual(len(result['errors']), 2)
+
+        result = transpiler.compile("PROGRAM demo BEGIN REPEAT 2 BEGIN avanzar_ctms(1); END END.")
+        self.assertEqual(result['stage'], 'syntax')
+
+    def test_anidamiento_excesivo_es_error_de_sintaxis(self):
+        depth = 400
+        code = ("PROGRAM demo BEGIN\n" + "REPEAT 1 BEGIN\n" * depth + "avanzar_ctms(1);\n"
+                + "END;\n" * depth + "girar(5);\nEND.")
+        transpiler = UMGPPTranspiler()
+
+        result = transpiler.compile(code)
+        self.assertEqual(result['stage'], 'syntax')
+        self.assertEqual([(error['line'], error['column']) for error in result['errors']],
+                         [(MAX_NESTING + 2, 1)])
+
+        result = transpiler.compile(code, all_errors=True)
+        self.assertEqual([(error['stage'], error['line']) for error in result['errors']],
+                         [('syntax', MAX_NESTING + 2), ('semantic', 2 * depth + 3)])
+
+        compiler = BatchCompiler(workers=1)
+        try:
+            self.assertEqual(compiler.compile_all([code])[0]['stage'], 'syntax')
+        finally:
+            compiler.shutdown()
+
+    def test_limite_de_comandos_ejecutados(self):
+        transpiler = UMGPPTranspiler()
+
+        result = transpiler.compile("PROGRAM demo BEGIN REPEAT 1000000000 BEGIN avanzar_ctms(1); END; END.")
+        self.assertEqual(result['stage'], 'semantic')
+        result = transpiler.compile("PROGRAM demo BEGIN REPEAT 10000 BEGIN REPEAT 10000 BEGIN girar(1); "
+                                    "END; END; END.")
+        self.assertEqual(result['stage'], 'semantic')
+
+        half = MAX_EXECUTED_COMMANDS // 2
+        code = f"PROGRAM demo BEGIN\nREPEAT {half} BEGIN girar(1)+avanzar_ctms(1); END;\n{{}}\nEND."
+        self.assertTrue(transpiler.compile(code.format(''))['success'])
+        result = transpiler.compile(code.format('girar(1);'), all_errors=True)
+        self.assertEqual([(error['stage'], error['line']) for error in result['errors']], [('semantic', 3)])
+
+        document = IncrementalDocument(code.format('girar(1);'))
+        self.assertEqual(document.result()['stage'], 'semantic')
+        document.update([{'start_line': 3, 'start_column': 1, 'end_line': 3, 'end_column': 10, 'text': ''}], 1)
+        self.assertTrue(document.result()['success'])
+
+    def test_edicion_incremental_dentro_del_bloque(self):
+        document = IncrementalDocument(self.code)
+        update = document.update([{'start_line': 4, 'start_column': 33, 'end_line': 4,
+                                   'end_column': 35, 'text': '35'}], 1)
+
+        expected = public_result(UMGPPTranspiler().compile(document.code))
+        python = expected['python_code'].split('\n')
+        change = update['changes'][0]['python']
+        self.assertEqual(python[change['start']:change['start'] + len(change['lines'])], change['lines'])
+        self.assertEqual(document.result()['esp8266_code'], expected['esp8266_code'])
+
+
+class IntermediateRepresentationTests(SimpleTestCase):
+    """Pruebas de la representación intermedia lineal"""
+
+    code = "PROGRAM demo BEGIN girar(1)+girar(-1)+avanzar_mts(2); circulo(50); moonwalk(3); END."
+
+    def test_lower_en_arreglos_tipados(self):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+
+        self.assertEqual(ir.opcodes.typecode, 'B')
+        self.assertEqual(list(ir.commands()), [
+            (ir_module.GIRAR, 1), (ir_module.GIRAR, -1), (ir_module.AVANZAR_MTS, 2),
+            (ir_module.CIRCULO, 50), (ir_module.MOONWALK, 3),
+        ])
+        self.assertEqual(list(ir.statements()), [(0, 3), (3, 4), (4, 5)])
+
+    def test_backends_desde_la_representacion_intermedia(self):
+        transpiler = UMGPPTranspiler()
+        ir = transpiler.compile(self.code)['ir']
+
+        self.assertEqual(transpiler.generate_esp8266_code(ir),
+                         ['girar:1', 'girar:-1', 'avanzar_mts:2', 'circulo:50', 'moonwalk:3'])
+        self.assertIn("    rover.turn_right(); rover.turn_left(); rover.move_meters(2) # girar(1) + girar(-1) + avanzar_mts(2)",
+                      transpiler.generate_python_code(ir)['python_code'].split('\n'))
+
+    def test_public_result_sin_ir(self):
+        result = UMGPPTranspiler().compile(self.code)
+
+        self.assertNotIn('ir', public_result(result))
+        self.assertIn('ir', result)
+
+
+class WireFormatTests(SimpleTestCase):
+    """Pruebas del formato binario para el ESP8266"""
+
+    code = RepeatTests.code
+
+    def test_ida_y_vuelta(self):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        ir.opcodes.extend([ir_module.GIRAR, ir_module.AVANZAR_CTMS, ir_module.AVANZAR_MTS])
+        ir.operands.extend([-1, ir_module.OPERAND_MIN, ir_module.OPERAND_MAX])
+
+        data = wire.encode(ir.opcodes, ir.operands)
+
+        self.assertEqual(wire.decode(data), (ir.opcodes, ir.operands))
+
+    def test_mas_compacto_que_el_texto(self):
+        result = UMGPPTranspiler().compile(self.code)
+        ir = result['ir']
+
+        data = wire.encode(ir.opcodes, ir.operands)
+        # Cabecera de 4 bytes y dos bytes por comando, uno por cada END_REPEAT
+        self.assertEqual(len(data), 4 + 2 * 5 + 2)
+        self.assertLess(len(data), len("programa:" + ",".join(result['esp8266_code'])))
+
+    def test_datos_invalidos(self):
+        data = wire.encode([ir_module.REPEAT, ir_module.CIRCULO, ir_module.END_REPEAT], [2, 300, 0])
+
+        for invalid in (b'{"comando"', data[:-1], data + b'\x00', b'UM\x02' + data[3:],
+                        data[:4] + bytes([len(ir_module.OPCODE_NAMES)]) + data[5:],
+                        wire.encode([ir_module.REPEAT], [2]), b'UM\x01\x01\x00\xff\xff\xff\xff\xff\x01'):
+            with self.assertRaises(wire.WireFormatError):
+                wire.decode(invalid)
+
+    @mock.patch.object(views_rover, '_formatos_rover', {})
+    @mock.patch.object(views_rover, 'logger')
+    @mock.patch.object(views_rover, 'requests')
+    def test_negociacion_con_el_firmware(self, requests, logger):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        requests.get.return_value.status_code = 404
+        requests.post.return_value.status_code = 200
+        requests.post.return_value.text = ''
+
+        with self.settings(ROVER_WIRE_FORMAT='auto'):
+            # Firmware anterior: sin /formatos recibe el texto de siempre
+            self.assertEqual(views_rover.ejecutar_programa_rover_interno(ir)['formato'], 'text')
+            self.assertEqual(requests.post.call_args.kwargs['json'],
+                             {'comando': 'programa:repetir:50:4,repetir:4:2,avanzar_ctms:20,girar:1,caminar:1'})
+
+            views_rover._formatos_rover.clear()
+            requests.get.return_value.status_code = 200
+            requests.get.return_value.json.return_value = {'binario': [wire.WIRE_VERSION]}
+            self.assertEqual(views_rover.ejecutar_programa_rover_interno(ir)['formato'], 'binary')
+            sent = requests.post.call_args.kwargs
+            self.assertEqual(sent['headers']['Content-Type'], wire.CONTENT_TYPE)
+            self.assertEqual(wire.decode(sent['data']), (ir.opcodes, ir.operands))
+            self.assertEqual(requests.get.call_count, 2)
+
+
+class TrajectoryTests(SimpleTestCase):
+    """Pruebas del análisis estático de la trayectoria"""
+
+    code = ("PROGRAM demo BEGIN avanzar_ctms(30); girar(1)+avanzar_vlts(3); cuadrado(40); caminar(7); "
+            "REPEAT 40 BEGIN girar(-1); moonwalk(-3); girar(0); avanzar_mts(1); END; rotar(2); "
+            "circulo(25); girar(1); caminar(50); avanzar_ctms(-15); END.")
+
+    engines = [False] + ([True] if trajectory.np is not None else [])
+
+    @mock.patch.object(rover_control, 'logger')
+    def run_rover(self, ir, logger):
+        """Ejecuta el programa en Rover registrando cada punto y cada pausa"""
+        rover = rover_control.Rover()
+        points = [(0.0, 0.0)]
+        pauses = []
+
+        def sleep(seconds):
+            pauses.append(seconds)
+            points.append((rover.position_x, rover.position_y))
+
+        with mock.patch.object(rover_control.time, 'sleep', sleep):
+            for opcode, operand in ir.expanded_commands():
+                if opcode == ir_module.GIRAR:
+                    getattr(rover, GIRAR_CALLS[operand])()
+                else:
+                    getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+        points.append((rover.position_x, rover.position_y))
+        return rover, points, sum(pauses)
+
+    def test_igual_que_ejecutar_el_rover(self):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        rover, points, seconds = self.run_rover(ir)
+        length = sum(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+        for use_numpy in self.engines:
+            with self.subTest(use_numpy=use_numpy), mock.patch.object(trajectory, 'NUMPY_MIN_COMMANDS', 1):
+                result = trajectory.analyze(ir, use_numpy)
+                self.assertAlmostEqual(result['final_pose']['x'], rover.position_x, places=4)
+                self.assertAlmostEqual(result['final_pose']['y'], rover.position_y, places=4)
+                self.assertEqual(result['final_pose']['orientation'], rover.orientation)
+                self.assertAlmostEqual(result['bounding_box']['min_x'], min(x for x, _ in points), places=4)
+                self.assertAlmostEqual(result['bounding_box']['max_y'], max(y for _, y in points), places=4)
+                self.assertAlmostEqual(result['path_length_cm'], length, places=4)
+                self.assertAlmostEqual(result['estimated_seconds'], seconds, places=4)
+                self.assertEqual(result['commands'], len(list(ir.expanded_commands())))
+
+    def test_repeticiones_sin_expandir(self):
+        transpiler = UMGPPTranspiler()
+        code = "PROGRAM largo BEGIN REPEAT {} BEGIN girar(1); avanzar_ctms(10); girar(0); avanzar_ctms(5); END; END."
+
+        small = trajectory.analyze(transpiler.compile(code.format(73))['ir'])
+        rover, _, seconds = self.run_rover(transpiler.compile(code.format(73))['ir'])
+        # compile() rechaza tantas repeticiones; un programa binario (wire) no
+        huge_ir = transpiler.compile(code.format(73))['ir']
+        huge_ir.operands[0] = ir_module.OPERAND_MAX
+        huge = trajectory.analyze(huge_ir)
+
+        self.assertAlmostEqual(small['final_pose']['x'], rover.position_x, places=4)
+        self.assertAlmostEqual(small['estimated_seconds'], seconds, places=4)
+        self.assertEqual(huge['commands'], 4 * ir_module.OPERAND_MAX)
+        self.assertEqual(huge['final_pose']['orientation'], ir_module.OPERAND_MAX % 36 * 10)
+
+    def test_resultado_de_compile(self):
+        result = UMGPPTranspiler().compile("PROGRAM demo BEGIN avanzar_mts(2); girar(1); END.")
+
+        self.assertEqual(result['trajectory'], {
+            'final_pose': {'x': 200.0, 'y': 0.0, 'orientation': 0},
+            'bounding_box': {'min_x': 0.0, 'min_y': 0.0, 'max_x': 200.0, 'max_y': 0.0},
+            'path_length_cm': 200.0,
+            'estimated_seconds': 2.0,
+            'commands': 2
+        })
+
+
+class RoverStandInHandler(BaseHTTPRequestHandler):
+    """Rutas del firmware para la transferencia por fragmentos"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        rover = self.server
+        url = urlsplit(self.path)
+        if url.path == '/formatos':
+            return self.reply(200, {'binario': [wire.WIRE_VERSION],
+                                    'fragmentos': {'ventana': rover.window, 'bytes': rover.chunk_bytes}})
+        receiver = rover.transfers.get(parse_qs(url.query).get('transferencia', [''])[0])
+        if url.path == '/programa/estado' and receiver:
+            return self.reply(200, {'ack': receiver.ack})
+        self.reply(404, {})
+
+    def do_POST(self):
+        rover = self.server
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(rover.delay)
+
+        if url.path == '/programa/inicio':
+            data = json.loads(body)
+            rover.transfers[data['transferencia']] = ChunkReceiver(
+                data['transferencia'], data['fragmentos'], data['formato'], rover.window)
+            return self.reply(200, {'ack': -1})
+
+        receiver = rover.transfers.get(query.get('transferencia'))
+        if receiver is None:
+            return self.reply(404, {})
+        if url.path == '/programa/fin':
+            if not receiver.complete:
+                return self.reply(409, {})
+            rover.executed.append(receiver.payload())
+            return self.reply(200, {'status': 'ok'})
+
+        with rover.lock:
+            rover.fragments += 1
+            count = rover.fragments
+        drop = rover.drop_every and count % rover.drop_every == 0
+        if drop and count // rover.drop_every % 2:
+            # Solicitud perdida antes de llegar al rover
+            self.close_connection = True
+            return
+        if rover.forget_after == count:
+            # El rover se reinició y olvidó la transferencia
+            rover.transfers.clear()
+            return self.reply(404, {})
+        try:
+            with rover.lock:
+                ack = receiver.receive(int(query['secuencia']), body)
+        except StreamError:
+            rover.rejected += 1
+            return self.reply(409, {})
+        if drop:
+            # Confirmación perdida después de guardar el fragmento
+            self.close_connection = True
+            return
+        self.reply(200, {'ack': ack})
+
+
+class RoverStandIn(ThreadingHTTPServer):
+    """ESP8266 simulado en 127.0.0.1 que pierde solicitudes y responde con retraso"""
+    daemon_threads = True
+
+    def __init__(self, drop_every=0, delay=0.0, window=4, chunk_bytes=64, forget_after=None):
+        super().__init__(('127.0.0.1', 0), RoverStandInHandler)
+        self.drop_every = drop_every
+        self.delay = delay
+        self.window = window
+        self.chunk_bytes = chunk_bytes
+        self.forget_after = forget_after
+        self.transfers = {}
+        self.executed = []
+        self.fragments = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@mock.patch('roverapp.streaming.logger')
+class StreamingUploadTests(SimpleTestCase):
+    """Pruebas de la transferencia por fragmentos contra un rover simulado"""
+
+    commands = [f"avanzar_ctms:{index}" for index in range(300)]
+
+    def test_fragmentos_de_texto_no_parten_comandos(self, logger):
+        chunks = text_chunks(self.commands, 64)
+
+        self.assertTrue(all(len(chunk) <= 64 for chunk in chunks))
+        self.assertEqual(b','.join(chunks).decode().split(','), self.commands)
+
+    def test_perdidas_y_retraso(self, logger):
+        rover = RoverStandIn(drop_every=3, delay=0.002)
+        self.addCleanup(rover.stop)
+        progress = []
+        chunks = text_chunks(self.commands, rover.chunk_bytes)
+
+        summary = StreamingUpload(rover.url, chunks, 'text', window=rover.window, backoff=0,
+                                  progress=progress.append).run()
+
+        self.assertEqual(rover.executed, [self.commands])
+        self.assertGreater(summary['reintentos'], 0)
+        self.assertEqual(rover.rejected, 0)
+        self.assertEqual(progress[-1]['acked_bytes'], summary['bytes'])
+        self.assertEqual([update['acked_chunks'] for update in progress],
+                         sorted(update['acked_chunks'] for update in progress))
+
+    def test_reinicio_del_rover(self, logger):
+        rover = RoverStandIn(forget_after=10)
+        self.addCleanup(rover.stop)
+        data = wire.encode([ir_module.AVANZAR_CTMS] * 300, range(300))
+
+        summary = StreamingUpload(rover.url, binary_chunks(data, 32), 'binary', backoff=0).run()
+
+        self.assertEqual(summary['reinicios'], 1)
+        self.assertEqual(rover.executed, [data])
+
+    def test_sin_confirmacion_abandona(self, logger):
+        rover = RoverStandIn(drop_every=1)
+        self.addCleanup(rover.stop)
+
+        with self.assertRaises(StreamError):
+            StreamingUpload(rover.url, text_chunks(self.commands, 64), 'text', max_retries=2, backoff=0).run()
+
+    @mock.patch.object(views_rover, '_formatos_rover', {})
+    @mock.patch.object(views_rover, 'logger')
+    def test_ejecutar_programa_largo(self, views_logger, logger):
+        rover = RoverStandIn(drop_every=5)
+        self.addCleanup(rover.stop)
+        ir = UMGPPTranspiler().compile(
+            "PROGRAM largo BEGIN " + "girar(1)+avanzar_ctms(300); girar(0); " * 100 + "END.")['ir']
+
+        with mock.patch.object(views_rover, 'ROVER_URL', rover.url), self.settings(ROVER_WIRE_FORMAT='auto'):
+            result = views_rover.ejecutar_programa_rover_interno(ir)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['formato'], 'binary')
+        self.assertGreater(result['transferencia']['fragmentos'], 1)
+        self.assertEqual(wire.decode(rover.executed[0]), (ir.opcodes, ir.operands))
+
+
+class ArtifactTests(SimpleTestCase):
+    code = "PROGRAM guardado BEGIN avanzar_ctms(3); girar(1); END."
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'guardado.umgpp')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(self.code)
+        self.compiled = UMGPPTranspiler().compile(self.code)
+        artifacts.write_artifact(self.path, self.code, self.compiled)
+
+    def test_ejecutar_usa_artefacto_sin_compilar(self):
+        with mock.patch('roverapp.artifacts.compile_cached', side_effect=AssertionError('compiló')), \
+                mock.patch('builtins.open', wraps=open) as opened:
+            result = artifacts.compile_program(self.path)
+
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual((result['ir'].opcodes, result['ir'].operands),
+                         (self.compiled['ir'].opcodes, self.compiled['ir'].operands))
+        self.assertEqual(result['esp8266_code'], self.compiled['esp8266_code'])
+        self.assertNotIn('ast', result)
+
+    def test_otra_version_del_compilador_recompila(self):
+        with mock.patch.object(artifacts, 'COMPILER_VERSION', 'otra'):
+            self.assertIsNone(artifacts.load_artifact(self.path))
+            result = artifacts.compile_program(self.path)
+            self.assertIsNotNone(artifacts.load_artifact(self.path))
+
+        self.assertEqual(result['esp8266_code'], self.compiled['esp8266_code'])
+
+    def test_codigo_editado_recompila(self):
+        edited = self.code.replace('girar(1)', 'girar(0)')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(edited + ' ')
+
+        self.assertIsNone(artifacts.load_artifact(self.path))
+        self.assertIsNone(artifacts.load_artifact(self.path, edited))
+        result = artifacts.compile_program(self.path)
+
+        self.assertEqual(result['esp8266_code'], UMGPPTranspiler().compile(edited)['esp8266_code'])
+        self.assertIsNotNone(artifacts.load_artifact(self.path))
+
+
+class CallRecorder:
+    """Objeto con la interfaz de Rover que registra las llamadas"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        return lambda *args: self.calls.append((method,) + args)
+
+
+class ExecutablePlanTests(SimpleTestCase):
+    """Pruebas de los planes ejecutables"""
+
+    code = ("PROGRAM plan BEGIN avanzar_ctms(30); girar(1)+girar(-1)+avanzar_mts(2); "
+            "REPEAT 3 BEGIN girar(0); REPEAT 2 BEGIN caminar(1); END; moonwalk(4); END; "
+            "REPEAT 5 BEGIN END; circulo(10); END.")
+
+    def test_mismas_llamadas_que_el_codigo_python(self):
+        result = UMGPPTranspiler().compile(self.code)
+        generated = CallRecorder()
+        module = mock.Mock(Rover=lambda: generated)
+        with mock.patch.dict('sys.modules', rover_control=module), mock.patch('builtins.print'):
+            namespace = {'__name__': 'generado'}
+            exec(result['python_code'], namespace)
+            namespace['main']()
+
+        plan = compile_plan(result['ir'])
+        recorded = plan.run(CallRecorder())
+
+        self.assertEqual(recorded.calls, generated.calls)
+        self.assertEqual(plan.calls, len(recorded.calls) - 2)
+
+    @mock.patch.object(rover_control, 'logger')
+    @mock.patch.object(rover_control.time, 'sleep')
+    def test_ejecuta_sobre_rover(self, sleep, logger):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        rover = compile_plan(ir).run(rover_control.Rover())
+        pose = trajectory.analyze(ir)['final_pose']
+
+        self.assertAlmostEqual(rover.position_x, pose['x'], places=4)
+        self.assertAlmostEqual(rover.position_y, pose['y'], places=4)
+
+    def test_guardado_por_hash(self):
+        with mock.patch('roverapp.plan._plans', OrderedDict()), \
+                mock.patch('roverapp.plan.compile_plan', wraps=compile_plan) as compiled:
+            first = cached_plan(self.code)
+            second = cached_plan(self.code)
+
+        self.assertIs(first, second)
+        self.assertEqual(compiled.call_count, 1)
+        self.assertIsNone(cached_plan("PROGRAM roto BEGIN avanzar_ctms(; END."))
+
+
+class CompileJobQueueTests(SimpleTestCase):
+    """Pruebas de la cola de trabajos de compilación"""
+
+    code = "PROGRAM trabajo BEGIN REPEAT 2 BEGIN avanzar_ctms(3); END; girar(1); END."
+    # Tarda más de un segundo en compilar
+    large = "PROGRAM grande BEGIN " + "girar(1)+avanzar_ctms(30); caminar(2); " * 40000 + "END."
+
+    def make_queue(self, **options):
+        jobs = CompileJobQueue(**options)
+        self.addCleanup(jobs.shutdown)
+        return jobs
+
+    def test_compila_en_otro_proceso(self):
+        jobs = self.make_queue()
+        job = jobs.submit(self.code, owner=1)
+
+        self.assertTrue(job.wait(30))
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result['esp8266_code'], UMGPPTranspiler().compile(self.code)['esp8266_code'])
+        self.assertIs(jobs.get(job.id, owner=1), job)
+        self.assertIsNone(jobs.get(job.id, owner=2))
+
+    def test_limites_de_tamano_y_por_usuario(self):
+        jobs = self.make_queue(max_per_user=1, max_source_bytes=len(self.large))
+
+        with self.assertRaises(JobRejected) as rejected:
+            jobs.submit(self.large + ' ', owner=1)
+        self.assertEqual(rejected.exception.status, 413)
+
+        running = jobs.submit(self.large, owner=1)
+        with self.assertRaises(JobRejected) as rejected:
+            jobs.submit(self.code, owner=1)
+        self.assertEqual(rejected.exception.status, 429)
+        other = jobs.submit(self.code, owner=2)
+
+        self.assertTrue(jobs.cancel(running))
+        self.assertTrue(running.wait(30))
+        self.assertEqual(running.status, 'cancelled')
+        self.assertTrue(other.wait(30))
+        self.assertEqual(other.status, 'done')
+
+    def test_presupuesto_de_cpu(self):
+        jobs = self.make_queue(cpu_seconds=0.2)
+        job = jobs.submit(self.large)
+
+        self.assertTrue(job.wait(30))
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('presupuesto', job.message)
+
+
+class SourceMapTests(SimpleTestCase):
+    """Pruebas de los mapas de código fuente"""
+
+    code = ("PROGRAM demo\nBEGIN\n  avanzar_ctms(30);\n  girar(1)+avanzar_vlts(3);\n  REPEAT 2 BEGIN\n"
+            "    caminar(1); REPEAT 3 BEGIN END;\n  END;\n  avanzar_ctms(5); avanzar_mts(1);\nEND.")
+
+    def source_at(self, position):
+        return self.code.split('\n')[position['line'] - 1][position['column'] - 1:]
+
+    def test_cada_backend_apunta_a_su_instruccion(self):
+        result = UMGPPTranspiler().compile(self.code)
+        python = SourceMap.decode(result['source_map']['python'])
+        esp8266 = SourceMap.decode(result['source_map']['esp8266'])
+        commands = SourceMap.decode(result['source_map']['commands'])
+
+        lines = result['python_code'].split('\n')
+        self.assertEqual(len(python), len(lines))
+        self.assertIsNone(python.lookup(0))
+        self.assertTrue(self.source_at(python.lookup(lines.index('    for _ in range(2):  # REPEAT 2')))
+                        .startswith('REPEAT 2'))
+        for index, command in enumerate(result['esp8266_code']):
+            function = command.split(':')[0]
+            expected = 'REPEAT' if function == 'repetir' else function
+            self.assertTrue(self.source_at(esp8266.lookup(index)).startswith(expected), command)
+        self.assertEqual(len(commands), len(result['ir']))
+        self.assertEqual(commands.lookup(7), commands.lookup(3))
+
+    def test_codificado_por_diferencias(self):
+        result = UMGPPTranspiler().compile(self.code)
+        encoded = result['source_map']['esp8266']
+
+        self.assertEqual(encoded, {'lines': [3, 1, 0, 1, 1, 0, 2, 0], 'columns': [3, 3, 9, 3, 5, 12, 3, 17]})
+        self.assertEqual(SourceMap.decode(encoded).encode(), encoded)
+
+    def test_optimizado_conserva_posiciones(self):
+        code = "PROGRAM demo BEGIN\n  avanzar_ctms(5);\n  avanzar_mts(1);\n  girar(1);\n  girar(-1)+avanzar_vlts(2);\nEND."
+        result = UMGPPTranspiler().compile(code, optimize=True)
+        esp8266 = SourceMap.decode(result['source_map']['esp8266'])
+
+        self.assertEqual(result['esp8266_code'], ['avanzar_ctms:105', 'girar:-1', 'avanzar_vlts:2'])
+        self.assertEqual([esp8266.lookup(index)['line'] for index in range(3)], [2, 5, 5])
+
+    def test_documento_incremental_desplaza_posiciones(self):
+        document = IncrementalDocument(self.code)
+        document.apply_edit(3, 1, 3, 1, "  girar(0);\n\n")
+        edited = '\n'.join(document.lines)
+
+        lowered = ir_module.lower(document.ast())
+        compiled = UMGPPTranspiler().compile(edited)['ir']
+        self.assertEqual(lowered.lines, compiled.lines)
+        self.assertEqual(lowered.columns, compiled.columns)
+
+    def test_error_del_rover_en_el_codigo_fuente(self):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        response = mock.Mock()
+        response.json.return_value = {'error': 'motor', 'comando': 4}
+
+        self.assertEqual(views_rover.posicion_del_error(ir, 'text', response),
+                         {'comando': 4, 'line': 6, 'column': 5})
+        response.json.return_value = {'error': 'motor', 'comando': 8}
+        self.assertEqual(views_rover.posicion_del_error(ir, 'binary', response),
+                         {'comando': 8, 'line': 8, 'column': 3})
+
+
+class RoverClockTests(SimpleTestCase):
+    """Pruebas de los relojes de rover_control.Rover"""
+
+    code = TrajectoryTests.code
+
+    @mock.patch.object(rover_control, 'logger')
+    @mock.patch.object(rover_control.time, 'sleep', side_effect=AssertionError('esperó'))
+    def test_reloj_virtual_no_espera(self, sleep, logger):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        first = compile_plan(ir).run(rover_control.Rover(clock=rover_control.VirtualClock()))
+        second = compile_plan(ir).run(rover_control.Rover(clock=rover_control.VirtualClock()))
+
+        self.assertEqual(first.clock.elapsed, second.clock.elapsed)
+        self.assertAlmostEqual(first.clock.elapsed, trajectory.analyze(ir)['estimated_seconds'], places=9)
+
+    @mock.patch.object(rover_control, 'logger')
+    def test_tiempo_simulado_exacto(self, logger):
+        rover = rover_control.Rover(clock=rover_control.VirtualClock())
+        rover.draw_circle(10)
+        rover.walk(3)
+
+        self.assertEqual(rover.clock.elapsed, 72 * 0.01 + 3 * (0.1 + 0.2))
+        self.assertEqual(rover.clock.elapsed, 1.62)
+
+    @mock.patch.object(rover_control, 'logger')
+    @mock.patch.object(rover_control.time, 'sleep')
+    def test_reloj_escalado(self, sleep, logger):
+        rover = rover_control.Rover(clock=rover_control.ScaledClock(10))
+        rover.move_cm(250)
+        rover.draw_square(30)
+
+        self.assertEqual(sleep.call_args_list[0], mock.call(0.25))
+        self.assertAlmostEqual(sum(call.args[0] for call in sleep.call_args_list), 0.57)
+        self.assertEqual(rover.clock.elapsed, 5.7)
+        with self.assertRaises(ValueError):
+            rover_control.ScaledClock(0)
+
+
+class TrajectoryRecorderTests(SimpleTestCase):
+    """Pruebas del registro del recorrido de rover_control.Rover"""
+
+    @mock.patch.object(rover_control.logger, 'disabled', True)
+    def test_memoria_acotada(self):
+        recorder = rover_control.TrajectoryRecorder(capacity=1000)
+        rover = rover_control.Rover(clock=rover_control.VirtualClock(), recorder=recorder)
+        buffer_size = recorder._x.buffer_info()[1]
+        rover.walk(100000)
+
+        self.assertEqual(len(recorder), 1000)
+        self.assertEqual(recorder._x.buffer_info()[1], buffer_size)
+        # Inicial + un movimiento y una pausa por paso
+        self.assertEqual(recorder.seen, 1 + 2 * 100000)
+        self.assertEqual(recorder.overwritten, recorder.seen - 1000)
+        x, y, orientation, elapsed = recorder.poses()[-1]
+        self.assertEqual((x, y, elapsed), (rover.position_x, rover.position_y, rover.clock.elapsed))
+        # De la más antigua a la más reciente aunque el búfer haya dado vueltas
+        times = [pose[3] for pose in recorder.poses()]
+        self.assertEqual(times, sorted(times))
+
+    @mock.patch.object(rover_control, 'logger')
+    def test_umbrales_de_distancia_y_angulo(self, logger):
+        recorder = rover_control.TrajectoryRecorder(min_distance=25, min_angle=45)
+        rover = rover_control.Rover(clock=rover_control.VirtualClock(), recorder=recorder)
+        for _ in range(10):
+            rover.move_cm(10)
+        rover.draw_circle(5)
+
+        poses = recorder.poses()
+        self.assertLess(len(poses), recorder.seen // 4)
+        self.assertEqual([x for x, _, _, _ in poses[:5]], [0.0, 30.0, 60.0, 90.0, 105.0])
+        # La última pose se exporta aunque los umbrales la descarten
+        self.assertEqual(poses[-1][:2], (rover.position_x, rover.position_y))
+
+    @mock.patch.object(rover_control, 'logger')
+    def test_polilinea(self, logger):
+        recorder = rover_control.TrajectoryRecorder()
+        rover = rover_control.Rover(clock=rover_control.VirtualClock(), recorder=recorder)
+        rover.move_cm(33.333)
+        rover.turn_right()
+        rover.move_cm(20)
+
+        self.assertEqual(recorder.polyline(), {
+            'points': [0.0, 0.0, 33.3, 0.0, 43.3, 0.0],
+            'orientations': [0, 0, 10],
+            'times': [0.0, 0.3, 0.5],
+            'recorded': 3,
+            'overwritten': 0
+        })
+        with self.assertRaises(ValueError):
+            rover_control.TrajectoryRecorder(capacity=1)
+
+
+class RoverLoggingTests(SimpleTestCase):
+    """Pruebas del registro configurable de rover_control"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(rover_control.shutdown_logging)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_sin_configurar_no_escribe(self):
+        self.assertFalse(rover_control.logger.isEnabledFor(logging.INFO))
+        self.assertFalse(rover_control.event_logger.isEnabledFor(logging.INFO))
+
+    def test_registro_de_texto_y_eventos(self):
+        rover_control.configure_logging(self.path('rover.log'), console=False, events_path=self.path('events.jsonl'))
+        rover = rover_control.Rover(clock=rover_control.VirtualClock())
+        rover.move_cm(10)
+        rover.turn_right()
+        rover.walk(3)
+        rover_control.shutdown_logging()
+
+        with open(self.path('rover.log'), encoding='utf-8') as log:
+            text = log.read()
+        self.assertIn('rover_control - INFO - Movido 10 cm', text)
+        self.assertNotIn('"command"', text)
+
+        events = list(rover_control.read_events(self.path('events.jsonl')))
+        self.assertEqual([event['command'] for event in events], ['move_cm', 'turn_right', 'walk'])
+        self.assertEqual(events[-1]['args'], [3])
+        self.assertEqual(events[-1]['elapsed'], rover.clock.elapsed)
+
+    def test_rotacion_y_repeticion(self):
+        rover_control.configure_logging(None, console=False, events_path=self.path('events.jsonl'),
+                                        events_max_bytes=2000, events_backups=50)
+        rover = rover_control.Rover(clock=rover_control.VirtualClock())
+        for side in range(10, 60):
+            rover.turn_left() if side % 3 else rover.move_straight()
+            rover.move_cm(side)
+            rover.draw_square(side)
+        rover_control.shutdown_logging()
+
+        self.assertTrue(os.path.exists(self.path('events.jsonl.1')))
+        events = list(rover_control.read_events(self.path('events.jsonl')))
+        self.assertEqual(len(events), 150)
+        replayed = rover_control.replay_events(events, rover_control.Rover(clock=rover_control.VirtualClock()))
+        self.assertEqual((replayed.position_x, replayed.position_y, replayed.orientation),
+                         (rover.position_x, rover.position_y, rover.orientation))
+        self.assertEqual((events[-1]['x'], events[-1]['y']), (rover.position_x, rover.position_y))
+
+
+class FleetSimulatorTests(SimpleTestCase):
+    """Pruebas de la simulación de flotas"""
+
+    codes = [
+        TrajectoryTests.code,
+        "PROGRAM uno BEGIN girar(1); avanzar_ctms(50); caminar(5); END.",
+        "PROGRAM dos BEGIN REPEAT 20 BEGIN circulo(10); girar(-1); moonwalk(2); END; END.",
+    ]
+
+    def test_igual_en_el_proceso_y_en_el_grupo(self):
+        streams = {f'rover-{index}': self.codes[index % len(self.codes)] for index in range(12)}
+        with mock.patch.object(rover_control.logger, 'disabled', True):
+            local = FleetSimulator(workers=0).run(streams)
+        pooled = FleetSimulator(workers=2).run(streams)
+
+        self.assertEqual([rover['name'] for rover in pooled['rovers']], list(streams))
+        for first, second in zip(local['rovers'], pooled['rovers']):
+            self.assertEqual(first['final_pose'], second['final_pose'])
+            self.assertEqual(first['trajectory'], second['trajectory'])
+        self.assertEqual(local['stats']['commands'], pooled['stats']['commands'])
+        self.assertEqual(pooled['stats']['rovers'], 12)
+        self.assertGreater(pooled['stats']['commands_per_second'], 0)
+
+    @mock.patch.object(rover_control.logger, 'disabled', True)
+    def test_igual_que_un_rover(self):
+        ir = UMGPPTranspiler().compile(self.codes[2])['ir']
+        rover = compile_plan(ir).run(rover_control.Rover(clock=rover_control.VirtualClock()))
+        result = FleetSimulator(workers=0).run({'solo': ir})['rovers'][0]
+
+        self.assertEqual(result['final_pose'], {'x': rover.position_x, 'y': rover.position_y,
+                                                'orientation': rover.orientation})
+        self.assertEqual(result['simulated_seconds'], rover.clock.elapsed)
+        self.assertEqual(result['trajectory']['points'][-2:], [round(rover.position_x, 1), round(rover.position_y, 1)])
+        with self.assertRaisesMessage(ValueError, "'roto'"):
+            FleetSimulator(workers=0).run({'roto': "PROGRAM roto BEGIN avanzar(1); END."})
+
+    def test_codigo_fuente_sin_django_configurado(self):
+        # Un script de carga fuera del servidor no tiene settings
+        with mock.patch('roverapp.compile_cache.get_cache', side_effect=ImproperlyConfigured):
+            plans = FleetSimulator(workers=0).plans({'a': self.codes[1], 'b': self.codes[1], 'c': self.codes[2]})
+
+        self.assertIs(plans[0][1], plans[1][1])
+        self.assertEqual(plans[2][1].calls, 60)
+
+
+@mock.patch.object(views_rover, '_formatos_rover', {})
+@mock.patch.object(views_rover, 'logger')
+@mock.patch.object(rover_control.logger, 'disabled', True)
+class SimulatedRoverTests(SimpleTestCase):
+    """Pruebas del ESP8266 simulado"""
+
+    code = TrajectoryTests.code
+
+    def execute(self, rover, code):
+        """POST /api/execute/ con el rover simulado como ROVER_URL"""
+        request = RequestFactory().post('/api/execute/', json.dumps({'code': code}), content_type='application/json')
+        request.user = SimpleNamespace(is_authenticated=True)
+        with mock.patch.object(views_rover, 'ROVER_URL', rover.url), self.settings(ROVER_WIRE_FORMAT='auto'):
+            response = views_api.execute_code(request)
+        self.assertTrue(rover.wait(5))
+        return json.loads(response.content)
+
+    def expected(self, code):
+        ir = UMGPPTranspiler().compile(code)['ir']
+        return compile_plan(ir).run(rover_control.Rover(clock=rover_control.VirtualClock()))
+
+    def test_api_execute_de_punta_a_punta(self, views_logger):
+        expected = self.expected(self.code)
+        for options in ({'binary': False, 'chunk_bytes': 0}, {'binary': True, 'chunk_bytes': 0},
+                        {'binary': True, 'chunk_bytes': 32}):
+            with self.subTest(**options):
+                views_rover._formatos_rover.clear()
+                rover = SimulatedRover(**options).start()
+                self.addCleanup(rover.stop)
+
+                result = self.execute(rover, self.code)
+
+                self.assertTrue(result['success'], result)
+                self.assertEqual((rover.rover.position_x, rover.rover.position_y, rover.rover.orientation),
+                                 (expected.position_x, expected.position_y, expected.orientation))
+                self.assertEqual(rover.status()['tiempo'], expected.clock.elapsed)
+
+    def test_varios_rovers_y_red_simulada(self, views_logger):
+        rovers = start_rovers(3, latency=0.01, jitter=0.01, seed=1)
+        lost = SimulatedRover(loss=1.0).start()
+        for rover in rovers + [lost]:
+            self.addCleanup(rover.stop)
+
+        self.assertEqual(len({rover.url for rover in rovers}), 3)
+        start = time.perf_counter()
+        for rover in rovers:
+            self.assertTrue(self.execute(rover, "PROGRAM uno BEGIN avanzar_ctms(10); END.")['success'])
+        self.assertGreater(time.perf_counter() - start, 3 * 0.01)
+        self.assertEqual([rover.rover.position_x for rover in rovers], [10.0] * 3)
+        self.assertIn('No se pudo conectar', self.execute(lost, self.code)['message'])
+
+    def test_comando_invalido_y_detener(self, views_logger):
+        rover = SimulatedRover(speed=100).start()
+        self.addCleanup(rover.stop)
+
+        self.assertEqual(rover.execute_text(['avanzar_ctms:1', 'volar:2']),
+                         (400, {'error': 'Comando no válido: volar:2', 'comando': 1}))
+        self.assertEqual(rover.execute_text(['repetir:1000:1', 'avanzar_ctms:10']), (200, {'status': 'ok', 'comandos': 2}))
+        time.sleep(0.05)
+        rover.stop_program()
+        status = rover.status()
+        self.assertEqual(status['estado'], 'detenido')
+        self.assertLess(status['comandos_ejecutados'], 1000)
+        self.assertAlmostEqual(status['x'], 10.0 * status['comandos_ejecutados'])
+
+
+class ArenaTests(SimpleTestCase):
+    """Pruebas de la verificación de recorridos en la arena"""
+
+    code = "PROGRAM p BEGIN\n    avanzar_ctms(50);\n    girar(1);\n    REPEAT 3 BEGIN avanzar_ctms(40); END;\n    girar(0);\n    avanzar_mts(5);\nEND."
+    arena = {'bounds': [-20, -20, 300, 300], 'obstacles': [[[150, -50], [180, -50], [180, 400], [150, 400]]]}
+
+    def brute_force(self, arena, xs, ys):
+        """Primer choque comparando cada tramo con todos los lados"""
+        from .arena import _intersection, _exit
+        for index in range(1, len(xs)):
+            hits = [(t, owner) for ax, ay, bx, by, owner in arena._edges
+                    for t in [_intersection(xs[index - 1], ys[index - 1], xs[index], ys[index], ax, ay, bx, by)]
+                    if t is not None]
+            if not arena.inside(xs[index], ys[index]):
+                hits.append((_exit(xs[index - 1], ys[index - 1], xs[index], ys[index], arena.bounds), None))
+            if hits:
+                return index, min(hits)[1]
+        return None
+
+    def test_igual_que_comparar_con_todos_los_lados(self):
+        import random
+        rng = random.Random(7)
+        for case in range(40):
+            obstacles = [[(x + rng.uniform(0, 40), y + rng.uniform(0, 40)) for x, y in ((0, 0), (60, 0), (30, 50))]
+                         for _ in range(20) for x, y in [(rng.uniform(0, 900), rng.uniform(0, 900))]]
+            arena = Arena((0, 0, 1000, 1000), obstacles, cell_size=rng.choice([None, 10, 250]))
+            xs, ys = [500.0], [500.0]
+            for _ in range(100):
+                xs.append(xs[-1] + rng.uniform(-50, 50))
+                ys.append(ys[-1] + rng.uniform(-50, 50))
+            if arena.obstacle_at(500, 500) is not None:
+                continue
+            with self.subTest(case=case):
+                collision = arena.first_collision(xs, ys)
+                expected = self.brute_force(arena, xs, ys)
+                self.assertEqual(None if collision is None else (collision['index'], collision['obstacle']), expected)
+
+    @mock.patch.object(rover_control.logger, 'disabled', True)
+    def test_choque_ubicado_en_el_codigo(self):
+        ir = UMGPPTranspiler().compile(self.code)['ir']
+        arena = Arena.from_dict(self.arena)
+
+        collision = arena.check_program(ir)
+        self.assertEqual((collision['type'], collision['obstacle'], collision['line']), ('obstacle', 0, 6))
+        self.assertAlmostEqual(collision['x'], 150.0)
+        xs, ys, commands = rover_path(ir)
+        self.assertEqual(collision['comando'], commands[collision['index']])
+
+        bounded = Arena((-20, -20, 300, 300))
+        self.assertEqual(bounded.check_program(ir)['type'], 'boundary')
+        self.assertEqual(bounded.check_program(['repetir:2:1', 'avanzar_ctms:10', 'avanzar_ctms:500'])['comando'], 2)
+        self.assertIsNone(bounded.check_program(['avanzar_ctms:10']))
+        with self.assertRaises(ValueError):
+            bounded.check_program(['caminar:100'], max_points=50)
+
+    @mock.patch.object(rover_control.logger, 'disabled', True)
+    def test_limite_de_comandos_ejecutados(self):
+        arena = Arena((-20, -20, 300, 300))
+
+        # girar no agrega puntos al recorrido: solo lo detiene el límite de comandos
+        with self.assertRaises(ValueError):
+            arena.check_program(['repetir:2147483647:2', 'girar:1', 'girar:0'], max_commands=1000)
+        self.assertIsNone(arena.check_program(['repetir:2147483647:1', 'repetir:2147483647:0']))
+
+    @mock.patch.object(views_rover, '_formatos_rover', {})
+    @mock.patch.object(views_rover, 'logger')
+    @mock.patch.object(rover_control.logger, 'disabled', True)
+    def test_api_execute_rechaza_o_advierte(self, logger):
+        rover = SimulatedRover().start()
+        self.addCleanup(rover.stop)
+        request = RequestFactory().post('/api/execute/', json.dumps({'code': self.code}),
+                                        content_type='application/json')
+        request.user = SimpleNamespace(is_authenticated=True)
+
+        with mock.patch.object(views_rover, 'ROVER_URL', rover.url), self.settings(UMGPP_ARENA=self.arena):
+            rejected = views_api.execute_code(request)
+            with self.settings(UMGPP_ARENA_ACTION='warn'):
+                warned = json.loads(views_api.execute_code(request).content)
+
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(json.loads(rejected.content)['source_position']['line'], 6)
+        self.assertEqual(rover.programs, 1)
+        self.assertTrue(warned['success'])
+        self.assertEqual(warned['arena_warning'], 'El rover choca con el obstáculo 1 (línea 6, columna 5)')
+
+
+class BatchSimulationTests(SimpleTestCase):
+    """Pruebas del motor de simulación por lotes con NumPy"""
+
+    code = ("PROGRAM demo BEGIN avanzar_ctms(30); girar(1)+avanzar_vlts(3); cuadrado(40); "
+            "REPEAT 3 BEGIN girar(-1); moonwalk(-3); REPEAT 2 BEGIN girar(0); avanzar_mts(1); END; caminar(4); END; "
+            "rotar(2); circulo(25); girar(1); caminar(50); avanzar_ctms(-15); END.")
+
+    def setUp(self):
+        if simulation.np is None:
+            self.skipTest('NumPy no está instalado')
+
+    @mock.patch.object(rover_control, 'logger')
+    def run_rover(self, ir, logger):
+        """Pose de Rover con reloj virtual después de cada comando ejecutado"""
+        rover = rover_control.Rover(clock=rover_control.VirtualClock())
+        poses = []
+        for opcode, operand in ir.expanded_commands():
+            if opcode == ir_module.GIRAR:
+                getattr(rover, GIRAR_CALLS[operand])()
+            else:
+                getattr(rover, PYTHON_CALLS[opcode][0])(operand)
+            poses.append((rover.position_x, rover.position_y, rover.orientation,
+                          rover.left_motor_enabled, rover.right_motor_enabled, rover.clock.elapsed))
+        return poses
+
+    def test_igual_que_ejecutar_el_rover(self):
+        result = UMGPPTranspiler().compile(self.code)
+        expected = self.run_rover(result['ir'])
+
+        for program in (result['ir'], result['esp8266_code']):
+            with self.subTest(program=type(program).__name__):
+                poses = simulation.simulate(program)
+                self.assertEqual(len(poses['x']), len(expected))
+                for index, pose in enumerate(expected):
+                    self.assertAlmostEqual(poses['x'][index], pose[0], places=6)
+                    self.assertAlmostEqual(poses['y'][index], pose[1], places=6)
+                    self.assertEqual(poses['orientation'][index], pose[2])
+                    self.assertEqual((poses['left_motor'][index], poses['right_motor'][index]), pose[3:5])
+                    self.assertAlmostEqual(poses['elapsed'][index], pose[5], places=6)
+
+    def test_giro_con_un_solo_motor(self):
+        poses = simulation.simulate(['girar:1', 'avanzar_ctms:20', 'girar:-1', 'avanzar_ctms:20', 'girar:0',
+                                     'avanzar_ctms:20'])
+
+        self.assertEqual(list(poses['left_motor']), [True, True, False, False, True, True])
+        self.assertEqual(list(poses['right_motor']), [False, False, True, True, True, True])
+        # Con un solo motor recorre la mitad y deriva 10 grados
+        self.assertEqual(list(poses['orientation']), [0, 10, 10, 0, 0, 0])
+        self.assertAlmostEqual(poses['x'][1], 10.0)
+        self.assertAlmostEqual(poses['x'][5], 10.0 + 10.0 * math.cos(math.radians(10)) + 20.0)
+
+    def test_limite_de_comandos(self):
+        program = ['repetir:1000:1', 'avanzar_ctms:1']
+
+        self.assertEqual(len(simulation.simulate(program, max_commands=1000)['x']), 1000)
+        with self.assertRaises(ValueError):
+            simulation.simulate(program, max_commands=999)
+        with self.assertRaises(ValueError):
+            simulation.simulate(['repetir:2:3', 'avanzar_ctms:1'])
+
+
+class BatchCompilerTests(SimpleTestCase):
+    """Pruebas de la compilación por lotes"""
+
+    def test_resultados_en_orden_e_iguales_a_compile(self):
+        codes = [f"PROGRAM p{index % 3} BEGIN avanzar_ctms({index % 2}); END." for index in range(10)]
+        compiler = BatchCompiler(workers=2, chunk_size=3)
+        try:
+            results = compiler.compile_all(codes)
+            as_json = compiler.compile_all(codes, as_json=True)
+        finally:
+            compiler.shutdown()
+
+        expected = [public_result(UMGPPTranspiler().compile(code)) for code in codes]
+        self.assertEqual(results, expected)
+        self.assertEqual([json.loads(result) for result in as_json], expected)
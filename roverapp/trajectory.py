@@ -0,0 +1,435 @@
+"""
+Análisis estático de la trayectoria de programas UMG++
+Calcula sin ejecutar rover_control.Rover (que espera en tiempo real) la pose
+final, el rectángulo que contiene el recorrido, la longitud del recorrido y
+el tiempo estimado de ejecución, siguiendo el mismo modelo que Rover:
+
+- La orientación siempre es múltiplo de 10 grados: los avances con un solo
+  motor giran 10 grados, cuadrado(n) la restaura y circulo(n) la deja en 0.
+  Por eso el efecto de cada comando tiene forma cerrada según la orientación
+  (36 valores) y el estado de los motores (girar: -1, 0 o 1).
+- Un bloque REPEAT pasa por a lo sumo 36 * 3 estados de entrada distintos,
+  así que sus repeticiones se vuelven periódicas y n repeticiones se
+  calculan sin recorrerlas todas.
+
+Con NumPy (opcional) los tramos largos sin REPEAT se calculan vectorizados;
+sin NumPy se usa el mismo modelo comando por comando en Python puro.
+"""
+import math
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from .ir import (OPCODE_NAMES, AVANZAR_VLTS, AVANZAR_CTMS, AVANZAR_MTS, GIRAR, CIRCULO,
+                 CUADRADO, CAMINAR, MOONWALK, REPEAT, matching_ends)
+
+# Orientaciones posibles (índice = grados / 10) y su vector unitario
+HEADINGS = 36
+UNIT = tuple((math.cos(math.radians(10 * heading)), math.sin(math.radians(10 * heading)))
+             for heading in range(HEADINGS))
+
+# Centímetros por unidad de cada avance (Rover.wheel_circumference = 20 cm)
+CENTIMETERS = {AVANZAR_VLTS: 20, AVANZAR_CTMS: 1, AVANZAR_MTS: 100}
+
+# caminar y moonwalk: avance por paso (cm), desplazamiento lateral (cm) y
+# pausa por paso (s)
+STEPS = {CAMINAR: (10, 5, 0.2), MOONWALK: (-10, 8, 0.3)}
+
+# circulo: 72 puntos cada 5 grados alrededor de la posición inicial, con una
+# pausa de 0,01 s por punto
+_CIRCLE_POINTS = [(math.cos(math.radians(angle)), math.sin(math.radians(angle))) for angle in range(0, 360, 5)]
+CIRCLE_END = _CIRCLE_POINTS[-1]
+CIRCLE_PATH = 1 + sum(math.dist(a, b) for a, b in zip(_CIRCLE_POINTS, _CIRCLE_POINTS[1:]))
+CIRCLE_SECONDS = len(_CIRCLE_POINTS) * 0.01
+
+# cuadrado: pausa de 0,5 s por lado
+SQUARE_PAUSE = 0.5
+
+# Tramos más cortos se calculan en Python aunque NumPy esté disponible
+NUMPY_MIN_COMMANDS = 64
+
+
+def _prefix_sums(turn):
+    # prefix[heading][q]: suma de los vectores de q pasos seguidos, girando
+    # 10 grados en el sentido turn después de cada uno
+    table = []
+    for heading in range(HEADINGS):
+        x = y = 0.0
+        sums = [(0.0, 0.0)]
+        for step in range(HEADINGS):
+            ux, uy = UNIT[(heading + turn * step) % HEADINGS]
+            x += ux
+            y += uy
+            sums.append((x, y))
+        table.append(sums)
+    return table
+
+
+PREFIX = {1: _prefix_sums(1), -1: _prefix_sums(-1)}
+
+
+# Resumen de una secuencia de comandos, relativo a su posición inicial:
+# (dx, dy, orientación final, motores al final, min_x, min_y, max_x, max_y,
+#  longitud, segundos, comandos ejecutados)
+def _empty(heading, mode):
+    return (0.0, 0.0, heading, mode, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+
+
+def _compose(first, second):
+    dx, dy = first[0], first[1]
+    return (
+        dx + second[0], dy + second[1], second[2], second[3],
+        min(first[4], dx + second[4]), min(first[5], dy + second[5]),
+        max(first[6], dx + second[6]), max(first[7], dy + second[7]),
+        first[8] + second[8], first[9] + second[9], first[10] + second[10]
+    )
+
+
+def _times(summary, count):
+    # count repeticiones de una secuencia que termina en su estado inicial: el
+    # recorrido se traslada (dx, dy) en cada una, así que los extremos están
+    # en la primera o en la última
+    dx, dy = summary[0], summary[1]
+    last = count - 1
+    return (
+        dx * count, dy * count, summary[2], summary[3],
+        min(summary[4], summary[4] + dx * last), min(summary[5], summary[5] + dy * last),
+        max(summary[6], summary[6] + dx * last), max(summary[7], summary[7] + dy * last),
+        summary[8] * count, summary[9] * count, summary[10] * count
+    )
+
+
+def _command(opcode, operand, heading, mode):
+    """Resumen de un solo comando con la orientación y los motores indicados"""
+    if opcode == GIRAR:
+        return (0.0, 0.0, heading, operand, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1)
+
+    factor = 1.0 if mode == 0 else 0.5
+    if opcode in CENTIMETERS:
+        distance = operand * CENTIMETERS[opcode]
+        ux, uy = UNIT[heading]
+        dx = distance * factor * ux
+        dy = distance * factor * uy
+        return (dx, dy, (heading + mode) % HEADINGS, mode, min(0.0, dx), min(0.0, dy), max(0.0, dx),
+                max(0.0, dy), abs(distance) * factor, abs(distance) / 100, 1)
+
+    if opcode == CIRCULO:
+        radius = abs(operand)
+        return (operand * CIRCLE_END[0], operand * CIRCLE_END[1], 0, mode, -radius, -radius, radius, radius,
+                radius * CIRCLE_PATH, CIRCLE_SECONDS, 1)
+
+    if opcode == CUADRADO:
+        x = y = min_x = min_y = max_x = max_y = 0.0
+        side = heading
+        for _ in range(4):
+            ux, uy = UNIT[side]
+            x += operand * factor * ux
+            y += operand * factor * uy
+            min_x, min_y, max_x, max_y = min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y)
+            side = (side + 9 + mode) % HEADINGS
+        return (x, y, heading, mode, min_x, min_y, max_x, max_y, 4 * abs(operand) * factor,
+                4 * (abs(operand) / 100 + SQUARE_PAUSE), 1)
+
+    if opcode in STEPS:
+        advance, lateral, pause = STEPS[opcode]
+        steps = abs(operand)
+        step = advance * (1 if operand > 0 else -1) * factor
+        if mode == 0:
+            ux, uy = UNIT[heading]
+            points = [(step * ux, step * uy), (steps * step * ux, steps * step * uy)] if steps else []
+            end = points[-1] if points else (0.0, 0.0)
+        else:
+            # Los pasos se repiten cada 36: basta con los primeros
+            sums = PREFIX[mode][heading]
+            points = [(step * x, step * y) for x, y in sums[1:min(steps, HEADINGS) + 1]]
+            x, y = sums[steps % HEADINGS]
+            end = (step * x, step * y)
+        # Cada paso pasa por su punto con y sin el desplazamiento lateral
+        min_x = min([0.0] + [x for x, _ in points])
+        max_x = max([0.0] + [x + lateral for x, _ in points])
+        min_y = min([0.0] + [y for _, y in points])
+        max_y = max([0.0] + [y for _, y in points])
+        return (end[0] + (lateral if steps % 2 else 0), end[1], (heading + mode * steps) % HEADINGS, mode,
+                min_x, min_y, max_x, max_y, steps * (abs(advance) * factor + lateral),
+                steps * (abs(advance) / 100 + pause), 1)
+
+    # rotar(n): n vueltas completas, la orientación no cambia
+    return (0.0, 0.0, heading, mode, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1)
+
+
+def _run_python(opcodes, operands, start, end, heading, mode):
+    """Resumen de un tramo sin REPEAT, comando por comando"""
+    summary = _empty(heading, mode)
+    for index in range(start, end):
+        summary = _compose(summary, _command(opcodes[index], operands[index], summary[2], summary[3]))
+    return summary
+
+
+def motion_arrays(ops, values, heading, mode):
+    """
+    Efecto de cada comando de un tramo sin REPEAT, vectorizado con NumPy
+
+    Args:
+        ops (ndarray): Códigos de operación (uint8)
+        values (ndarray): Operandos (int64)
+        heading (int): Orientación inicial (grados / 10)
+        mode (int): Motores al inicio (parámetro del último girar)
+
+    Returns:
+        tuple: (headings, modes, final_heading, final_mode, dx, dy, lengths,
+            seconds, extents): orientación y motores antes de cada comando,
+            los de después del último, desplazamiento, recorrido y duración de
+            cada comando, y los extremos de los comandos que pasan por puntos
+            intermedios como (índices, min_x, min_y, max_x, max_y) relativos a
+            la posición antes de cada uno
+    """
+    count = len(ops)
+    index = np.arange(count)
+
+    def previous(mask):
+        # Índice del último comando anterior que cumple mask, o -1
+        last = np.maximum.accumulate(np.where(mask, index, -1))
+        return np.concatenate(([-1], last[:-1])), last[-1]
+
+    # Motores vigentes en cada comando: el último girar anterior
+    girar_before, last_girar = previous(ops == GIRAR)
+    modes = np.where(girar_before >= 0, values[np.maximum(girar_before, 0)], mode)
+
+    # Orientación: suma de los giros desde el último círculo (que la deja en 0)
+    is_advance = ops <= AVANZAR_MTS
+    is_circle = ops == CIRCULO
+    steps_index = np.flatnonzero((ops == CAMINAR) | (ops == MOONWALK))
+    turns = np.where(is_advance, modes, 0)
+    turns[steps_index] = modes[steps_index] * (np.abs(values[steps_index]) % HEADINGS)
+    turned = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(turns, out=turned[1:])
+    circle_before, last_circle = previous(is_circle)
+    base = np.where(circle_before >= 0, -turned[np.maximum(circle_before, 0) + 1], heading)
+    headings = (turned[:-1] + base) % HEADINGS
+    if last_circle >= 0:
+        final_heading = int((turned[-1] - turned[last_circle + 1]) % HEADINGS)
+    else:
+        final_heading = int((turned[-1] + heading) % HEADINGS)
+    final_mode = int(values[last_girar]) if last_girar >= 0 else mode
+
+    unit = np.array(UNIT)
+    factor = np.where(modes == 0, 1.0, 0.5)
+
+    # Avances: sus extremos son las posiciones antes y después de cada uno
+    centimeters = np.zeros(len(OPCODE_NAMES))
+    for opcode, value in CENTIMETERS.items():
+        centimeters[opcode] = value
+    distance = values * centimeters[ops]
+    scaled = distance * factor
+    dx = scaled * unit[headings, 0]
+    dy = scaled * unit[headings, 1]
+    lengths = np.abs(scaled)
+    seconds = np.abs(distance) / 100
+
+    # Los demás comandos recorren puntos intermedios
+    extents = []
+
+    circles = np.flatnonzero(is_circle)
+    if len(circles):
+        radius = np.abs(values[circles]).astype(np.float64)
+        dx[circles] = values[circles] * CIRCLE_END[0]
+        dy[circles] = values[circles] * CIRCLE_END[1]
+        extents.append((circles, -radius, -radius, radius, radius))
+        lengths[circles] = radius * CIRCLE_PATH
+        seconds[circles] = CIRCLE_SECONDS
+
+    squares = np.flatnonzero(ops == CUADRADO)
+    if len(squares):
+        side = values[squares] * factor[squares]
+        side_heading = headings[squares]
+        x = np.zeros(len(squares))
+        y = np.zeros(len(squares))
+        min_x, min_y, max_x, max_y = x, y, x, y
+        for _ in range(4):
+            x = x + side * unit[side_heading, 0]
+            y = y + side * unit[side_heading, 1]
+            min_x, max_x = np.minimum(min_x, x), np.maximum(max_x, x)
+            min_y, max_y = np.minimum(min_y, y), np.maximum(max_y, y)
+            side_heading = (side_heading + 9 + modes[squares]) % HEADINGS
+        dx[squares] = x
+        dy[squares] = y
+        extents.append((squares, min_x, min_y, max_x, max_y))
+        lengths[squares] = 4 * np.abs(side)
+        seconds[squares] = 4 * (np.abs(values[squares]) / 100 + SQUARE_PAUSE)
+
+    if len(steps_index):
+        advance = np.zeros(len(OPCODE_NAMES))
+        lateral = np.zeros(len(OPCODE_NAMES))
+        pause = np.zeros(len(OPCODE_NAMES))
+        for opcode, (step_advance, step_lateral, step_pause) in STEPS.items():
+            advance[opcode], lateral[opcode], pause[opcode] = step_advance, step_lateral, step_pause
+        step_ops = ops[steps_index]
+        step_values = values[steps_index]
+        step_modes = modes[steps_index]
+        step_headings = headings[steps_index]
+        steps = np.abs(step_values)
+        lateral = lateral[step_ops]
+        step = advance[step_ops] * np.sign(step_values) * factor[steps_index]
+        ux = unit[step_headings, 0]
+        uy = unit[step_headings, 1]
+
+        # Sin giro: en línea recta, los extremos son el primer y el último paso
+        first_x = np.where(steps > 0, step * ux, 0.0)
+        first_y = np.where(steps > 0, step * uy, 0.0)
+        end_x = steps * step * ux
+        end_y = steps * step * uy
+        min_x, max_x = np.minimum(first_x, end_x), np.maximum(first_x, end_x)
+        min_y, max_y = np.minimum(first_y, end_y), np.maximum(first_y, end_y)
+
+        turning = np.flatnonzero(step_modes != 0)
+        if len(turning):
+            # Con giro: los pasos se repiten cada 36, basta con los primeros
+            prefix = np.array([PREFIX[-1], PREFIX[1]])
+            table = prefix[(step_modes[turning] > 0).astype(np.int64), step_headings[turning]]
+            rows = np.arange(len(turning))
+            scale = step[turning]
+            end_x[turning] = scale * table[rows, steps[turning] % HEADINGS, 0]
+            end_y[turning] = scale * table[rows, steps[turning] % HEADINGS, 1]
+            points_x = scale[:, None] * table[:, 1:, 0]
+            points_y = scale[:, None] * table[:, 1:, 1]
+            valid = np.arange(1, HEADINGS + 1) <= steps[turning, None]
+            min_x[turning] = np.where(valid, points_x, np.inf).min(axis=1)
+            max_x[turning] = np.where(valid, points_x, -np.inf).max(axis=1)
+            min_y[turning] = np.where(valid, points_y, np.inf).min(axis=1)
+            max_y[turning] = np.where(valid, points_y, -np.inf).max(axis=1)
+
+        # Cada paso pasa por su punto con y sin el desplazamiento lateral
+        moving = steps > 0
+        extents.append((steps_index[moving], min_x[moving], min_y[moving],
+                        max_x[moving] + lateral[moving], max_y[moving]))
+        dx[steps_index] = end_x + lateral * (steps % 2)
+        dy[steps_index] = end_y
+        lengths[steps_index] = steps * (np.abs(advance[step_ops]) * factor[steps_index] + lateral)
+        seconds[steps_index] = steps * (np.abs(advance[step_ops]) / 100 + pause[step_ops])
+
+    return headings, modes, final_heading, final_mode, dx, dy, lengths, seconds, extents
+
+
+def _run_numpy(opcodes, operands, start, end, heading, mode):
+    """Resumen de un tramo sin REPEAT, vectorizado con NumPy"""
+    ops = np.frombuffer(opcodes, dtype=np.uint8)[start:end]
+    values = np.frombuffer(operands, dtype=np.int32)[start:end].astype(np.int64)
+    _, _, final_heading, final_mode, dx, dy, lengths, seconds, extents = motion_arrays(ops, values, heading, mode)
+
+    # Posición después de cada comando
+    x = np.cumsum(dx)
+    y = np.cumsum(dy)
+    min_x, min_y = min(0.0, float(x.min())), min(0.0, float(y.min()))
+    max_x, max_y = max(0.0, float(x.max())), max(0.0, float(y.max()))
+    for indices, low_x, low_y, high_x, high_y in extents:
+        if len(indices):
+            before_x = x[indices] - dx[indices]
+            before_y = y[indices] - dy[indices]
+            min_x = min(min_x, float((before_x + low_x).min()))
+            min_y = min(min_y, float((before_y + low_y).min()))
+            max_x = max(max_x, float((before_x + high_x).max()))
+            max_y = max(max_y, float((before_y + high_y).max()))
+    return (float(x[-1]), float(y[-1]), final_heading, final_mode, min_x, min_y, max_x, max_y,
+            float(lengths.sum()), float(seconds.sum()), len(ops))
+
+
+class _Analyzer:
+    """Recorre la representación intermedia bloque por bloque"""
+
+    def __init__(self, ir, use_numpy):
+        self.opcodes = ir.opcodes
+        self.operands = ir.operands
+        self.ends = matching_ends(ir.opcodes) if REPEAT in ir.opcodes else {}
+        self.repeats = sorted(self.ends)
+        self.use_numpy = use_numpy
+        self.bodies = {}
+
+    def run(self, start, end, heading, mode):
+        if self.use_numpy and end - start >= NUMPY_MIN_COMMANDS:
+            return _run_numpy(self.opcodes, self.operands, start, end, heading, mode)
+        return _run_python(self.opcodes, self.operands, start, end, heading, mode)
+
+    def summarize(self, start, end, heading, mode):
+        """Resumen de los comandos entre start y end, con sus bloques REPEAT"""
+        summary = _empty(heading, mode)
+        position = bisect_left(self.repeats, start)
+        index = start
+        while position < len(self.repeats) and self.repeats[position] < end:
+            block = self.repeats[position]
+            if index < block:
+                summary = _compose(summary, self.run(index, block, summary[2], summary[3]))
+            block_end = self.ends[block]
+            summary = _compose(summary, self.repeat(self.operands[block], block + 1, block_end,
+                                                    summary[2], summary[3]))
+            index = block_end + 1
+            position = bisect_left(self.repeats, index, position)
+        if index < end:
+            summary = _compose(summary, self.run(index, end, summary[2], summary[3]))
+        return summary
+
+    def body(self, start, end, heading, mode):
+        key = (start, heading, mode)
+        if key not in self.bodies:
+            self.bodies[key] = self.summarize(start, end, heading, mode)
+        return self.bodies[key]
+
+    def repeat(self, count, start, end, heading, mode):
+        """Resumen de count repeticiones del cuerpo entre start y end"""
+        total = _empty(heading, mode)
+        seen = {}
+        iterations = []
+        state = (heading, mode)
+        while len(iterations) < count and state not in seen:
+            seen[state] = len(iterations)
+            iteration = self.body(start, end, *state)
+            iterations.append(iteration)
+            total = _compose(total, iteration)
+            state = (iteration[2], iteration[3])
+
+        remaining = count - len(iterations)
+        if remaining:
+            # Desde aquí las repeticiones forman un ciclo
+            cycle = iterations[seen[state]:]
+            cycle_summary = _empty(*state)
+            for iteration in cycle:
+                cycle_summary = _compose(cycle_summary, iteration)
+            full, rest = divmod(remaining, len(cycle))
+            if full:
+                total = _compose(total, _times(cycle_summary, full))
+            for iteration in cycle[:rest]:
+                total = _compose(total, iteration)
+        return total
+
+
+def analyze(ir, use_numpy=None):
+    """
+    Analiza la trayectoria de un programa sin ejecutarlo
+
+    Args:
+        ir (ProgramIR): Programa sin errores semánticos
+        use_numpy (bool): Usar NumPy; None para usarlo si está instalado
+
+    Returns:
+        dict: Pose final (cm y grados), rectángulo del recorrido, longitud del
+            recorrido en cm, tiempo estimado en segundos y comandos ejecutados
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    summary = _Analyzer(ir, use_numpy).summarize(0, len(ir), 0, 0)
+    (x, y, heading, _, min_x, min_y, max_x, max_y, length, seconds, commands) = summary
+    return {
+        'final_pose': {'x': _round(x), 'y': _round(y), 'orientation': heading * 10},
+        'bounding_box': {'min_x': _round(min_x), 'min_y': _round(min_y),
+                         'max_x': _round(max_x), 'max_y': _round(max_y)},
+        'path_length_cm': _round(length),
+        'estimated_seconds': _round(seconds),
+        'commands': commands
+    }
+
+
+def _round(value):
+    # Sin el ruido de punto flotante (ni -0.0) en la respuesta JSON
+    return round(value, 6) + 0.0
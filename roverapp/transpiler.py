@@ -6,6 +6,368 @@ por el UMG Basic Rover 2.0.
 import re
 import json
 
+from .ast_nodes import Token, Call, Instruction, GiroCombination, Repeat, Program
+from .ir import (ProgramIR, lower, OPCODE_NAMES, OPERAND_MIN, OPERAND_MAX, AVANZAR_VLTS, AVANZAR_CTMS,
+                 AVANZAR_MTS, GIRAR, CIRCULO, CUADRADO, ROTAR, CAMINAR, MOONWALK, REPEAT, END_REPEAT)
+from .optimizer import optimize as optimize_ir
+from .trajectory import analyze as analyze_trajectory
+from .source_map import source_maps
+from . import wire
+
+# Versión del compilador; cambiarla invalida los resultados guardados en caché
+COMPILER_VERSION = '2.6'
+
+# Palabras reservadas y funciones del lenguaje UMG++
+KEYWORDS = ('PROGRAM', 'BEGIN', 'END', 'REPEAT')
+FUNCTIONS = ('avanzar_vlts', 'avanzar_ctms', 'avanzar_mts', 'girar', 'circulo',
+             'cuadrado', 'rotar', 'caminar', 'moonwalk')
+ADVANCE_FUNCTIONS = ('avanzar_vlts', 'avanzar_ctms', 'avanzar_mts')
+
+# Niveles máximos de bloques REPEAT anidados; el análisis y la traducción
+# recorren los bloques de forma recursiva
+MAX_NESTING = 64
+
+# Comandos máximos que ejecuta un programa, con los bloques REPEAT expandidos
+MAX_EXECUTED_COMMANDS = 10_000_000
+
+# Métodos de rover_control.Rover por código de operación, con su comentario
+PYTHON_CALLS = {
+    AVANZAR_VLTS: ('move_wheels', 'Avanzar {} vueltas'),
+    AVANZAR_CTMS: ('move_cm', 'Avanzar {} centímetros'),
+    AVANZAR_MTS: ('move_meters', 'Avanzar {} metros'),
+    CIRCULO: ('draw_circle', 'Dibujar círculo de radio {} cm'),
+    CUADRADO: ('draw_square', 'Dibujar cuadrado de lado {} cm'),
+    ROTAR: ('rotate', 'Rotar {} vueltas'),
+    CAMINAR: ('walk', 'Caminar {} pasos'),
+    MOONWALK: ('moonwalk', 'Moonwalk de {} pasos'),
+}
+GIRAR_CALLS = {1: 'turn_right', -1: 'turn_left', 0: 'move_straight'}
+
+# Líneas finales del código Python generado
+PYTHON_FOOTER = (
+    "",
+    "    rover.finalize()",
+    "    print('Programa finalizado')",
+    "",
+    "if __name__ == '__main__':",
+    "    rover_control.configure_logging()",
+    "    main()"
+)
+
+# Tabla para clasificar una palabra después de escanearla como identificador
+WORD_TYPES = dict.fromkeys(KEYWORDS, 'KEYWORD')
+WORD_TYPES.update(dict.fromkeys(FUNCTIONS, 'FUNCTION'))
+
+# Escáner maestro: todos los tokens en una sola expresión regular, compilada
+# una única vez. Equivale a probar self.token_patterns en orden sobre cada
+# línea; el \b inicial de las palabras siempre se cumple al inicio de un token,
+# por eso solo se conserva el \b final.
+MASTER_PATTERN = re.compile(r"""
+    (?P<NEWLINE>\n)
+  | (?P<WORD>[a-zA-Z_][a-zA-Z0-9_]*\b)
+  | (?P<NUMBER>-?\d+)
+  | (?P<LPAREN>\()
+  | (?P<RPAREN>\))
+  | (?P<SEMICOLON>;)
+  | (?P<PLUS>\+)
+  | (?P<DOT>\.)
+  | (?P<WHITESPACE>[^\S\n]+)
+""", re.VERBOSE)
+
+class Parser:
+    """
+    Analizador sintáctico de UMG++
+    Consume los tokens de uno en uno con un token de anticipación. Entre dos
+    instrucciones el único estado es el token actual, por lo que el análisis
+    puede retomarse desde cualquier límite de instrucción.
+    """
+    
+    def __init__(self, tokens, last=None):
+        """
+        Args:
+            tokens (iterable): Iterador de Token
+            last (Token): Último token anterior a los que se van a consumir,
+                usado para ubicar los errores al final del código
+        """
+        self.errors = []
+        self._next_token = iter(tokens).__next__
+        self.current = None
+        self.last = last
+        self.depth = 0
+        self.advance()
+    
+    def advance(self):
+        """Avanzar al siguiente token"""
+        try:
+            self.current = self.last = self._next_token()
+        except StopIteration:
+            self.current = None
+    
+    def match(self, expected_type):
+        """Avanzar al siguiente token si coincide con el tipo esperado"""
+        token = self.current
+        if token is not None and token.type == expected_type:
+            self.advance()
+            return token
+        return None
+    
+    def match_keyword(self, value):
+        """Consumir una palabra clave y comprobar su valor"""
+        token = self.match('KEYWORD')
+        return token is not None and token.value == value
+    
+    def report(self, expected):
+        """Reportar un error sintáctico en el token actual sin consumirlo"""
+        token = self.current if self.current is not None else self.last
+        if token is None:
+            token = Token('EOF', '', 1, 1)
+        self.errors.append({
+            'message': f"Error de sintaxis: se esperaba {expected}, pero se encontró '{token.value}'",
+            'line': token.line,
+            'column': token.column
+        })
+    
+    def syntax_error(self, expected):
+        """Reportar un error sintáctico y descartar el token actual"""
+        self.report(expected)
+        self.advance()
+        return None
+    
+    def at_body_end(self):
+        """Indica si ya no quedan instrucciones por analizar"""
+        token = self.current
+        return token is None or (token.type == 'KEYWORD' and token.value == 'END')
+    
+    def parse_program(self):
+        """Analizar el programa completo"""
+        name = self.parse_header()
+        if name is None:
+            return None
+        
+        instructions = []
+        while not self.at_body_end():
+            instruction = self.parse_statement()
+            if instruction:
+                instructions.append(instruction)
+        
+        if not self.parse_footer():
+            return None
+        
+        return Program(name, instructions)
+    
+    def parse_header(self):
+        """Analizar PROGRAM nombre BEGIN y devolver el nombre del programa"""
+        if not self.match_keyword('PROGRAM'):
+            return self.syntax_error('PROGRAM')
+        
+        program_name = self.match('IDENTIFIER')
+        if not program_name:
+            return self.syntax_error('nombre de programa')
+        
+        if not self.match_keyword('BEGIN'):
+            return self.syntax_error('BEGIN')
+        
+        return program_name.value
+    
+    def recover_header(self):
+        """
+        Analizar PROGRAM nombre BEGIN recuperándose de los errores
+        
+        A diferencia de parse_header, ante un token inesperado descarta solo
+        hasta BEGIN o hasta el inicio de una instrucción, para que el análisis
+        continúe con el cuerpo del programa.
+        
+        Returns:
+            str: Nombre del programa, o None si falta
+        """
+        name = None
+        for expected in ('PROGRAM', 'nombre de programa', 'BEGIN'):
+            token = self.current
+            if expected == 'nombre de programa':
+                found = token is not None and token.type == 'IDENTIFIER'
+            else:
+                found = token is not None and token.type == 'KEYWORD' and token.value == expected
+            
+            if found:
+                if token.type == 'IDENTIFIER':
+                    name = token.value
+                self.advance()
+                continue
+            
+            self.report(expected)
+            while self.current is not None and self.current.type != 'FUNCTION':
+                if self.current.type == 'KEYWORD' and self.current.value in ('BEGIN', 'END', 'REPEAT'):
+                    break
+                self.advance()
+            if self.current is not None and self.current.value == 'BEGIN':
+                self.advance()
+            break
+        return name
+    
+    def parse_footer(self):
+        """Analizar END. al final del programa"""
+        if not self.match_keyword('END'):
+            return self.syntax_error('END')
+        
+        if not self.match('DOT'):
+            return self.syntax_error('un punto (.) para finalizar el programa')
+        
+        return True
+    
+    def check_trailing_tokens(self):
+        """Reportar los tokens que sobran después del final del programa"""
+        if self.current is not None:
+            self.errors.append({
+                'message': 'Hay tokens adicionales después del final del programa',
+                'line': self.current.line,
+                'column': self.current.column
+            })
+    
+    def parse_statement(self):
+        """Analizar una instrucción y recuperarse si tiene errores"""
+        instruction = self.parse_instruction()
+        if not instruction:
+            # Avanzar hasta el próximo punto y coma si hay un error
+            while self.current is not None and self.current.type != 'SEMICOLON':
+                self.advance()
+            if self.current is not None:
+                self.advance()
+        return instruction
+    
+    def parse_call(self):
+        """Analizar (número) después del nombre de una función"""
+        if not self.match('LPAREN'):
+            return self.syntax_error('un paréntesis de apertura (')
+        
+        param_token = self.match('NUMBER')
+        if not param_token:
+            return self.syntax_error('un número entero')
+        
+        if not self.match('RPAREN'):
+            return self.syntax_error('un paréntesis de cierre )')
+        
+        return int(param_token.value)
+    
+    def parse_instruction(self):
+        """Analizar una instrucción"""
+        if self.current is not None and self.current.type == 'FUNCTION':
+            if self.current.value == 'girar':
+                return self.parse_girar_combination()
+            
+            func = self.match('FUNCTION')
+            
+            param = self.parse_call()
+            if param is None:
+                return None
+            
+            if not self.match('SEMICOLON'):
+                return self.syntax_error('un punto y coma (;) para finalizar la instrucción')
+            
+            return Instruction(func.value, param, func.line, func.column)
+        
+        if self.current is not None and self.current.type == 'KEYWORD' and self.current.value == 'REPEAT':
+            return self.parse_repeat()
+        
+        return self.syntax_error('una instrucción válida')
+    
+    def parse_repeat(self):
+        """Analizar un bloque REPEAT n BEGIN ... END;"""
+        keyword = self.current
+        self.advance()
+        
+        if self.depth >= MAX_NESTING:
+            return self.skip_nested_block(keyword)
+        
+        count = self.match('NUMBER')
+        if not count:
+            return self.syntax_error('el número de repeticiones')
+        
+        if not self.match_keyword('BEGIN'):
+            return self.syntax_error('BEGIN')
+        
+        instructions = []
+        self.depth += 1
+        while not self.at_body_end():
+            instruction = self.parse_statement()
+            if instruction:
+                instructions.append(instruction)
+        self.depth -= 1
+        
+        if not self.match_keyword('END'):
+            return self.syntax_error('END')
+        
+        if not self.match('SEMICOLON'):
+            return self.syntax_error('un punto y coma (;) para finalizar el bloque REPEAT')
+        
+        return Repeat(int(count.value), instructions, keyword.line, keyword.column)
+    
+    def skip_nested_block(self, keyword):
+        """
+        Reportar un REPEAT que supera MAX_NESTING y descartar su bloque
+        
+        Descarta los tokens hasta el END que cierra el bloque, contando los
+        REPEAT internos sin analizarlos, y deja el punto y coma final para
+        que parse_statement lo consuma.
+        
+        Args:
+            keyword (Token): Palabra clave REPEAT del bloque
+        """
+        self.errors.append({
+            'message': f"Error de sintaxis: los bloques REPEAT no pueden anidarse más de {MAX_NESTING} niveles",
+            'line': keyword.line,
+            'column': keyword.column
+        })
+        open_blocks = 1
+        while self.current is not None:
+            token = self.current
+            self.advance()
+            if token.type == 'KEYWORD':
+                if token.value == 'REPEAT':
+                    open_blocks += 1
+                elif token.value == 'END':
+                    open_blocks -= 1
+                    if not open_blocks:
+                        break
+        return None
+    
+    def parse_girar_combination(self):
+        """Analizar una combinación de girar + avanzar"""
+        girar_instructions = []
+        advance_instruction = None
+        
+        # Primer girar
+        first_girar = self.match('FUNCTION')
+        
+        first_param = self.parse_call()
+        if first_param is None:
+            return None
+        
+        girar_instructions.append(Call(first_girar.value, first_param, first_girar.line, first_girar.column))
+        
+        # Buscar combinaciones de + girar o + avanzar_*
+        while self.match('PLUS'):
+            next_function = self.match('FUNCTION')
+            if not next_function:
+                return self.syntax_error('una función válida después del signo +')
+            
+            param = self.parse_call()
+            if param is None:
+                return None
+            
+            if next_function.value == 'girar':
+                girar_instructions.append(Call(next_function.value, param, next_function.line, next_function.column))
+            elif next_function.value in ADVANCE_FUNCTIONS:
+                advance_instruction = Call(next_function.value, param, next_function.line, next_function.column)
+                break
+            else:
+                return self.syntax_error('una función girar o avanzar_* después del signo +')
+        
+        if not self.match('SEMICOLON'):
+            return self.syntax_error('un punto y coma (;) para finalizar la instrucción')
+        
+        return GiroCombination(girar_instructions, advance_instruction)
+
+
 class UMGPPTranspiler:
     """Clase para transpilar código UMG++ a Python"""
     
@@ -13,7 +375,7 @@ class UMGPPTranspiler:
         """Inicializar el transpilador"""
         # Expresiones regulares para los tokens
         self.token_patterns = [
-            ('KEYWORD', r'\b(PROGRAM|BEGIN|END)\b'),
+            ('KEYWORD', r'\b(PROGRAM|BEGIN|END|REPEAT)\b'),
             ('FUNCTION', r'\b(avanzar_vlts|avanzar_ctms|avanzar_mts|girar|circulo|cuadrado|rotar|caminar|moonwalk)\b'),
             ('IDENTIFIER', r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
             ('NUMBER', r'-?\d+'),
@@ -36,506 +398,647 @@ class UMGPPTranspiler:
             list: Lista de tokens encontrados
             list: Lista de errores léxicos
         """
-        tokens = []
         errors = []
+        tokens = [token.to_dict() for token in self.iter_tokens(code, errors)]
+        return tokens, errors
+    
+    def iter_tokens(self, code, errors):
+        """
+        Análisis léxico perezoso del código UMG++
         
-        # Analizar el código línea por línea
-        lines = code.split('\n')
-        for line_number, line in enumerate(lines, 1):
-            position = 0
+        Args:
+            code (str): Código fuente en UMG++
+            errors (list): Lista donde se agregan los errores léxicos
             
-            while position < len(line):
-                match = None
-                
-                for token_type, pattern in self.token_patterns:
-                    regex = re.compile(pattern)
-                    result = regex.match(line[position:])
-                    
-                    if result:
-                        value = result.group(0)
-                        
-                        if token_type != 'WHITESPACE':
-                            tokens.append({
-                                'type': token_type,
-                                'value': value,
-                                'line': line_number,
-                                'column': position + 1
-                            })
-                        
-                        position += len(value)
-                        match = True
-                        break
-                
-                if not match:
-                    errors.append({
-                        'message': f"Carácter no reconocido: '{line[position]}'",
-                        'line': line_number,
-                        'column': position + 1
-                    })
-                    position += 1
+        Yields:
+            Token: Tokens en el orden en que aparecen en el código
+        """
+        # Recorrer todo el código con el escáner maestro, sin crear subcadenas
+        scan = MASTER_PATTERN.match
+        position = 0
+        line_number = 1
+        line_start = 0
+        length = len(code)
         
-        return tokens, errors
+        while position < length:
+            result = scan(code, position)
+            
+            if result is None:
+                errors.append({
+                    'message': f"Carácter no reconocido: '{code[position]}'",
+                    'line': line_number,
+                    'column': position - line_start + 1
+                })
+                position += 1
+                continue
+            
+            token_type = result.lastgroup
+            end = result.end()
+            
+            if token_type == 'NEWLINE':
+                line_number += 1
+                line_start = end
+            elif token_type != 'WHITESPACE':
+                value = result.group()
+                if token_type == 'WORD':
+                    # Palabras clave y funciones se resuelven con una tabla
+                    token_type = WORD_TYPES.get(value, 'IDENTIFIER')
+                yield Token(token_type, value, line_number, position - line_start + 1)
+            
+            position = end
     
     def parse(self, tokens):
         """
         Análisis sintáctico de los tokens UMG++
         
         Args:
-            tokens (list): Lista de tokens
+            tokens (iterable): Tokens como lista de diccionarios o como
+                iterador de Token (por ejemplo, el generador de iter_tokens)
             
         Returns:
-            dict: Árbol de sintaxis abstracta (AST)
+            Program: Árbol de sintaxis abstracta (AST)
             list: Lista de errores sintácticos
         """
-        position = 0
-        errors = []
+        if isinstance(tokens, list) and tokens and isinstance(tokens[0], dict):
+            tokens = map(Token.from_dict, tokens)
         
-        # Función para avanzar al siguiente token si coincide con el tipo esperado
-        def match(expected_type):
-            nonlocal position
-            if position < len(tokens) and tokens[position]['type'] == expected_type:
-                token = tokens[position]
-                position += 1
-                return token
-            return None
+        parser = Parser(tokens)
+        program = parser.parse_program()
+        parser.check_trailing_tokens()
         
-        # Función para reportar errores sintácticos
-        def syntax_error(expected):
-            nonlocal position
-            token = tokens[position] if position < len(tokens) else tokens[-1]
-            errors.append({
-                'message': f"Error de sintaxis: se esperaba {expected}, pero se encontró '{token['value']}'",
-                'line': token['line'],
-                'column': token['column']
-            })
-            position += 1
-            return None
-        
-        # Analizar el programa completo
-        def parse_program():
-            if not match('KEYWORD') or tokens[position - 1]['value'] != 'PROGRAM':
-                return syntax_error('PROGRAM')
-            
-            program_name = match('IDENTIFIER')
-            if not program_name:
-                return syntax_error('nombre de programa')
-            
-            if not match('KEYWORD') or tokens[position - 1]['value'] != 'BEGIN':
-                return syntax_error('BEGIN')
-            
-            instructions = []
-            while position < len(tokens) and not (tokens[position]['type'] == 'KEYWORD' and tokens[position]['value'] == 'END'):
-                instruction = parse_instruction()
-                if instruction:
-                    instructions.append(instruction)
-                else:
-                    # Avanzar hasta el próximo punto y coma si hay un error
-                    while position < len(tokens) and tokens[position]['type'] != 'SEMICOLON':
-                        position += 1
-                    if position < len(tokens):
-                        position += 1
-            
-            if not match('KEYWORD') or tokens[position - 1]['value'] != 'END':
-                return syntax_error('END')
-            
-            if not match('DOT'):
-                return syntax_error('un punto (.) para finalizar el programa')
-            
-            return {
-                'type': 'program',
-                'name': program_name['value'],
-                'instructions': instructions
-            }
+        return program, parser.errors
+    
+    def diagnose(self, tokens):
+        """
+        Análisis sintáctico y semántico que continúa después de los errores
         
-        # Analizar una instrucción
-        def parse_instruction():
-            if position < len(tokens) and tokens[position]['type'] == 'FUNCTION' and tokens[position]['value'] == 'girar':
-                return parse_girar_combination()
-            
-            if position < len(tokens) and tokens[position]['type'] == 'FUNCTION':
-                func = match('FUNCTION')
-                
-                if not match('LPAREN'):
-                    return syntax_error('un paréntesis de apertura (')
-                
-                param_token = match('NUMBER')
-                if not param_token:
-                    return syntax_error('un número entero')
-                
-                if not match('RPAREN'):
-                    return syntax_error('un paréntesis de cierre )')
-                
-                if not match('SEMICOLON'):
-                    return syntax_error('un punto y coma (;) para finalizar la instrucción')
-                
-                return {
-                    'type': 'instruction',
-                    'function': func['value'],
-                    'parameter': int(param_token['value'])
-                }
-            
-            return syntax_error('una instrucción válida')
+        Cada instrucción que se puede analizar se revisa semánticamente aunque
+        el resto del programa tenga errores, y los errores semánticos se ubican
+        en la posición donde empieza su instrucción.
         
-        # Analizar una combinación de girar + avanzar
-        def parse_girar_combination():
-            girar_instructions = []
-            advance_instruction = None
-            
-            # Primer girar
-            first_girar = match('FUNCTION')
-            
-            if not match('LPAREN'):
-                return syntax_error('un paréntesis de apertura (')
-            
-            first_param = match('NUMBER')
-            if not first_param:
-                return syntax_error('un número entero')
-            
-            if not match('RPAREN'):
-                return syntax_error('un paréntesis de cierre )')
-            
-            girar_instructions.append({
-                'function': first_girar['value'],
-                'parameter': int(first_param['value'])
-            })
-            
-            # Buscar combinaciones de + girar o + avanzar_*
-            while match('PLUS'):
-                next_function = match('FUNCTION')
-                if not next_function:
-                    return syntax_error('una función válida después del signo +')
-                
-                if not match('LPAREN'):
-                    return syntax_error('un paréntesis de apertura (')
-                
-                param = match('NUMBER')
-                if not param:
-                    return syntax_error('un número entero')
-                
-                if not match('RPAREN'):
-                    return syntax_error('un paréntesis de cierre )')
-                
-                if next_function['value'] == 'girar':
-                    girar_instructions.append({
-                        'function': next_function['value'],
-                        'parameter': int(param['value'])
-                    })
-                elif next_function['value'] in ['avanzar_vlts', 'avanzar_ctms', 'avanzar_mts']:
-                    advance_instruction = {
-                        'function': next_function['value'],
-                        'parameter': int(param['value'])
-                    }
-                    break
-                else:
-                    return syntax_error('una función girar o avanzar_* después del signo +')
-            
-            if not match('SEMICOLON'):
-                return syntax_error('un punto y coma (;) para finalizar la instrucción')
+        Args:
+            tokens (iterable): Iterador de Token
             
-            return {
-                'type': 'giro_combination',
-                'giros': girar_instructions,
-                'advance': advance_instruction
-            }
+        Returns:
+            Program: AST con las instrucciones analizadas, o None si falta el nombre
+            list: Lista de errores sintácticos
+            list: Lista de errores semánticos
+        """
+        parser = Parser(tokens)
+        name = parser.recover_header()
         
-        # Iniciar el análisis del programa
-        program = parse_program()
+        instructions = []
+        semantic_errors = []
+        total = 0
+        while not parser.at_body_end():
+            start = parser.current
+            instruction = parser.parse_statement()
+            if instruction:
+                errors = []
+                self.check_instruction(instruction, errors)
+                total = self.check_size(total, instruction, errors)
+                for error in errors:
+                    error['line'] = start.line
+                    error['column'] = start.column
+                semantic_errors.extend(errors)
+                instructions.append(instruction)
         
-        if position < len(tokens):
-            errors.append({
-                'message': 'Hay tokens adicionales después del final del programa',
-                'line': tokens[position]['line'],
-                'column': tokens[position]['column']
-            })
+        parser.parse_footer()
+        parser.check_trailing_tokens()
         
-        return program, errors
+        program = Program(name, instructions) if name is not None else None
+        return program, parser.errors, semantic_errors
     
     def analyze_semantics(self, ast):
         """
         Análisis semántico del AST
         
         Args:
-            ast (dict): Árbol de sintaxis abstracta
+            ast (Program): Árbol de sintaxis abstracta
             
         Returns:
             list: Lista de errores semánticos
         """
         errors = []
         
-        if not ast or 'instructions' not in ast:
+        if not ast:
             return errors
         
-        for instruction in ast['instructions']:
-            if instruction['type'] == 'instruction':
-                # Validar parámetros según la función
-                func = instruction['function']
-                param = instruction['parameter']
-                
-                if func in ['avanzar_vlts', 'avanzar_ctms', 'avanzar_mts', 'rotar', 'caminar', 'moonwalk']:
-                    if param == 0:
-                        errors.append({
-                            'message': f"Error semántico: El parámetro para {func} no puede ser 0",
-                            'instruction': instruction
-                        })
-                elif func == 'girar':
-                    if param not in [-1, 0, 1]:
-                        errors.append({
-                            'message': f"Error semántico: El parámetro para {func} debe ser -1, 0 o 1",
-                            'instruction': instruction
-                        })
-                elif func in ['circulo', 'cuadrado']:
-                    if param < 10 or param > 200:
-                        errors.append({
-                            'message': f"Error semántico: El parámetro para {func} debe estar entre 10 y 200 centímetros",
-                            'instruction': instruction
-                        })
-            
-            elif instruction['type'] == 'giro_combination':
-                # Validar parámetros en combinaciones de giro
-                for giro in instruction['giros']:
-                    if giro['parameter'] not in [-1, 0, 1]:
-                        errors.append({
-                            'message': "Error semántico: El parámetro para girar debe ser -1, 0 o 1",
-                            'instruction': instruction
-                        })
-                
-                if instruction['advance']:
-                    func = instruction['advance']['function']
-                    param = instruction['advance']['parameter']
-                    if param == 0:
-                        errors.append({
-                            'message': f"Error semántico: El parámetro para {func} no puede ser 0",
-                            'instruction': instruction
-                        })
+        total = 0
+        for instruction in ast.instructions:
+            self.check_instruction(instruction, errors)
+            total = self.check_size(total, instruction, errors)
         
         return errors
     
+    def check_size(self, total, instruction, errors):
+        """
+        Suma al total del programa los comandos que ejecuta una instrucción
+        
+        Reporta un error semántico en la instrucción con la que el total
+        supera MAX_EXECUTED_COMMANDS, una sola vez por programa.
+        
+        Args:
+            total (int): Comandos ejecutados por las instrucciones anteriores
+            instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
+            errors (list): Lista donde se agrega el error semántico
+            
+        Returns:
+            int: Comandos ejecutados hasta esta instrucción incluida
+        """
+        size = total + executed_commands(instruction)
+        if total <= MAX_EXECUTED_COMMANDS < size:
+            if instruction.type == 'repeat':
+                node = {'type': 'repeat', 'count': instruction.count}
+            else:
+                node = instruction.to_dict()
+            errors.append({
+                'message': f"Error semántico: El programa ejecuta más de {MAX_EXECUTED_COMMANDS} "
+                           "comandos contando las repeticiones de los bloques REPEAT",
+                'instruction': node
+            })
+        return size
+    
+    def check_instruction(self, instruction, errors):
+        """
+        Análisis semántico de una sola instrucción
+        
+        Args:
+            instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
+            errors (list): Lista donde se agregan los errores semánticos
+        """
+        if instruction.type == 'repeat':
+            if not 1 <= instruction.count <= OPERAND_MAX:
+                errors.append({
+                    'message': "Error semántico: El número de repeticiones de REPEAT debe estar "
+                               f"entre 1 y {OPERAND_MAX}",
+                    'instruction': {'type': 'repeat', 'count': instruction.count}
+                })
+            for child in instruction.instructions:
+                self.check_instruction(child, errors)
+        
+        elif instruction.type == 'instruction':
+            # Validar parámetros según la función
+            func = instruction.function
+            param = instruction.parameter
+            
+            if func in ['avanzar_vlts', 'avanzar_ctms', 'avanzar_mts', 'rotar', 'caminar', 'moonwalk']:
+                if param == 0:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} no puede ser 0",
+                        'instruction': instruction.to_dict()
+                    })
+                elif not OPERAND_MIN <= param <= OPERAND_MAX:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} está fuera de rango",
+                        'instruction': instruction.to_dict()
+                    })
+            elif func == 'girar':
+                if param not in [-1, 0, 1]:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} debe ser -1, 0 o 1",
+                        'instruction': instruction.to_dict()
+                    })
+            elif func in ['circulo', 'cuadrado']:
+                if param < 10 or param > 200:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} debe estar entre 10 y 200 centímetros",
+                        'instruction': instruction.to_dict()
+                    })
+        
+        elif instruction.type == 'giro_combination':
+            # Validar parámetros en combinaciones de giro
+            for giro in instruction.giros:
+                if giro.parameter not in [-1, 0, 1]:
+                    errors.append({
+                        'message': "Error semántico: El parámetro para girar debe ser -1, 0 o 1",
+                        'instruction': instruction.to_dict()
+                    })
+            
+            if instruction.advance:
+                func = instruction.advance.function
+                param = instruction.advance.parameter
+                if param == 0:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} no puede ser 0",
+                        'instruction': instruction.to_dict()
+                    })
+                elif not OPERAND_MIN <= param <= OPERAND_MAX:
+                    errors.append({
+                        'message': f"Error semántico: El parámetro para {func} está fuera de rango",
+                        'instruction': instruction.to_dict()
+                    })
+    
+    def lower(self, ast):
+        """
+        Traduce el AST a la representación intermedia lineal
+        
+        Args:
+            ast (Program): Árbol de sintaxis abstracta
+            
+        Returns:
+            ProgramIR: Representación intermedia del programa
+        """
+        return lower(ast)
+    
     def generate_python_code(self, ast):
         """
-        Genera código Python a partir del AST
+        Genera código Python a partir del AST o de la representación intermedia
         
         Args:
-            ast (dict): Árbol de sintaxis abstracta
+            ast (Program | ProgramIR): Árbol de sintaxis abstracta o su
+                representación intermedia
             
         Returns:
-            str: Código Python generado
+            dict: Código Python, comandos para el ESP8266 y mapas de código
+                fuente de ambos (roverapp.source_map)
         """
-        if not ast:
+        if ast is None:
             return ""
         
-        python_code = [
+        ir = ast if isinstance(ast, ProgramIR) else self.lower(ast)
+        python_code = self.python_header(ir.name)
+        header_lines = len(python_code)
+        python_commands = []
+        python_code.extend(self.python_body(ir, python_commands))
+        
+        # Finalizar el programa
+        python_code.extend(PYTHON_FOOTER)
+        
+        # También generar versión para ESP8266
+        esp8266_code = self.generate_esp8266_code(ir)
+        
+        result = {
+            'python_code': "\n".join(python_code),
+            'esp8266_code': esp8266_code,
+            'source_map': source_maps(ir, python_commands, header_lines, len(PYTHON_FOOTER))
+        }
+        
+        return result
+    
+    def python_header(self, name):
+        """
+        Líneas iniciales del código Python generado
+        
+        Args:
+            name (str): Nombre del programa
+            
+        Returns:
+            list: Líneas de código Python
+        """
+        return [
             "# Código Python generado a partir de UMG++ para el UMG Basic Rover 2.0",
-            "# Programa: " + ast['name'],
+            "# Programa: " + name,
             "",
             "import time",
             "import math",
             "import rover_control",
             "",
             "def main():",
-            "    print('Iniciando programa: " + ast['name'] + "')",
+            "    print('Iniciando programa: " + name + "')",
             "    rover = rover_control.Rover()",
             "    rover.initialize()",
             ""
         ]
+    
+    def python_body(self, ir, commands=None):
+        """
+        Genera las líneas de código Python de las instrucciones del programa
         
-        for instruction in ast['instructions']:
-            if instruction['type'] == 'instruction':
-                func = instruction['function']
-                param = instruction['parameter']
-                
-                if func == 'avanzar_vlts':
-                    python_code.append(f"    rover.move_wheels({param})  # Avanzar {param} vueltas")
-                elif func == 'avanzar_ctms':
-                    python_code.append(f"    rover.move_cm({param})  # Avanzar {param} centímetros")
-                elif func == 'avanzar_mts':
-                    python_code.append(f"    rover.move_meters({param})  # Avanzar {param} metros")
-                elif func == 'girar':
-                    if param == 1:
-                        python_code.append("    rover.turn_right()  # Girar a la derecha")
-                    elif param == -1:
-                        python_code.append("    rover.turn_left()  # Girar a la izquierda")
-                    else:  # param == 0
-                        python_code.append("    rover.move_straight()  # Avanzar en línea recta")
-                elif func == 'circulo':
-                    python_code.append(f"    rover.draw_circle({param})  # Dibujar círculo de radio {param} cm")
-                elif func == 'cuadrado':
-                    python_code.append(f"    rover.draw_square({param})  # Dibujar cuadrado de lado {param} cm")
-                elif func == 'rotar':
-                    python_code.append(f"    rover.rotate({param})  # Rotar {param} vueltas")
-                elif func == 'caminar':
-                    python_code.append(f"    rover.walk({param})  # Caminar {param} pasos")
-                elif func == 'moonwalk':
-                    python_code.append(f"    rover.moonwalk({param})  # Moonwalk de {param} pasos")
-            
-            elif instruction['type'] == 'giro_combination':
-                # Procesar combinaciones de giros
-                giro_code = []
-                for giro in instruction['giros']:
-                    if giro['parameter'] == 1:
-                        giro_code.append("rover.turn_right()")
-                    elif giro['parameter'] == -1:
-                        giro_code.append("rover.turn_left()")
-                    else:  # param == 0
-                        giro_code.append("rover.move_straight()")
-                
-                # Agregar el avance si existe
-                if instruction['advance']:
-                    func = instruction['advance']['function']
-                    param = instruction['advance']['parameter']
-                    
-                    if func == 'avanzar_vlts':
-                        giro_code.append(f"rover.move_wheels({param})")
-                    elif func == 'avanzar_ctms':
-                        giro_code.append(f"rover.move_cm({param})")
-                    elif func == 'avanzar_mts':
-                        giro_code.append(f"rover.move_meters({param})")
-                
-                # Agregar comentario descriptivo
-                comment = " # " + " + ".join([f"girar({g['parameter']})" for g in instruction['giros']])
-                if instruction['advance']:
-                    comment += f" + {instruction['advance']['function']}({instruction['advance']['parameter']})"
-                
-                # Combinar el código con el comentario
-                python_code.append(f"    {'; '.join(giro_code)}{comment}")
+        Los bloques REPEAT se traducen a un for con su cuerpo indentado.
         
-        # Finalizar el programa
-        python_code.extend([
-            "",
-            "    rover.finalize()",
-            "    print('Programa finalizado')",
-            "",
-            "if __name__ == '__main__':",
-            "    main()"
-        ])
+        Args:
+            ir (ProgramIR): Representación intermedia del programa
+            commands (list): Si se indica, recibe el índice del primer comando
+                de cada línea generada, para el mapa de código fuente
+            
+        Returns:
+            list: Líneas de código Python
+        """
+        lines = []
+        indent = ''
+        opcodes = ir.opcodes
+        operands = ir.operands
+        for start, end in ir.statements():
+            opcode = opcodes[start]
+            if opcode == REPEAT:
+                lines.append(f"    {indent}for _ in range({operands[start]}):  # REPEAT {operands[start]}")
+                indent += '    '
+            elif opcode == END_REPEAT:
+                if opcodes[start - 1] == REPEAT:
+                    lines.append(f"    {indent}pass")
+                indent = indent[:-4]
+            else:
+                lines.append(indent + self.python_statement(opcodes[start:end], operands[start:end]))
+            if commands is not None and len(commands) < len(lines):
+                commands.append(start)
+        return lines
+    
+    def python_instruction(self, instruction):
+        """
+        Genera las líneas de código Python de una instrucción del AST
         
-        # También generar versión para ESP8266
-        esp8266_code = self.generate_esp8266_code(ast)
+        Args:
+            instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
+            
+        Returns:
+            list: Líneas de código Python (más de una solo en un bloque REPEAT)
+        """
+        ir = ProgramIR('')
+        ir.add_instruction(instruction)
+        return self.python_body(ir)
+    
+    def python_statement(self, opcodes, operands):
+        """
+        Genera la línea de código Python de los comandos de una instrucción
         
-        result = {
-            'python_code': "\n".join(python_code),
-            'esp8266_code': esp8266_code
-        }
+        Args:
+            opcodes (sequence): Códigos de operación de la instrucción
+            operands (sequence): Operandos de la instrucción
+            
+        Returns:
+            str: Línea de código Python
+        """
+        # Las combinaciones siempre empiezan con girar
+        if opcodes[0] != GIRAR:
+            method, comment = PYTHON_CALLS[opcodes[0]]
+            param = operands[0]
+            return f"    rover.{method}({param})  # {comment.format(param)}"
         
-        return result
+        # Procesar combinaciones de giros y el avance final si existe
+        giro_code = []
+        descriptions = []
+        for opcode, param in zip(opcodes, operands):
+            if opcode == GIRAR:
+                giro_code.append(f"rover.{GIRAR_CALLS.get(param, 'move_straight')}()")
+            else:
+                giro_code.append(f"rover.{PYTHON_CALLS[opcode][0]}({param})")
+            descriptions.append(f"{OPCODE_NAMES[opcode]}({param})")
         
+        # Combinar el código con un comentario descriptivo
+        return f"    {'; '.join(giro_code)} # {' + '.join(descriptions)}"
+    
     def generate_esp8266_code(self, ast):
         """
         Genera código específico para el ESP8266
         
         Args:
-            ast (dict): Árbol de sintaxis abstracta
+            ast (Program | ProgramIR): Árbol de sintaxis abstracta o su
+                representación intermedia
             
         Returns:
-            str: Lista de comandos para el ESP8266
+            list: Lista de comandos para el ESP8266
         """
-        if not ast:
+        if ast is None:
             return []
         
-        comandos = []
-        
-        for instruction in ast['instructions']:
-            if instruction['type'] == 'instruction':
-                func = instruction['function']
-                param = instruction['parameter']
-                
-                if func == 'avanzar_vlts':
-                    comandos.append(f"avanzar_vlts:{param}")
-                elif func == 'avanzar_ctms':
-                    comandos.append(f"avanzar_ctms:{param}")
-                elif func == 'avanzar_mts':
-                    comandos.append(f"avanzar_mts:{param}")
-                elif func == 'girar':
-                    comandos.append(f"girar:{param}")
-                elif func == 'circulo':
-                    comandos.append(f"circulo:{param}")
-                elif func == 'cuadrado':
-                    comandos.append(f"cuadrado:{param}")
-                elif func == 'rotar':
-                    comandos.append(f"rotar:{param}")
-                elif func == 'caminar':
-                    comandos.append(f"caminar:{param}")
-                elif func == 'moonwalk':
-                    comandos.append(f"moonwalk:{param}")
+        ir = ast if isinstance(ast, ProgramIR) else self.lower(ast)
+        return esp8266_commands(ir.opcodes, ir.operands)
+    
+    def esp8266_instruction(self, instruction):
+        """
+        Genera los comandos para el ESP8266 de una instrucción del AST
+        
+        Args:
+            instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
             
-            elif instruction['type'] == 'giro_combination':
-                # Procesar combinaciones de giros
-                for giro in instruction['giros']:
-                    comandos.append(f"girar:{giro['parameter']}")
-                
-                # Agregar el avance si existe
-                if instruction['advance']:
-                    func = instruction['advance']['function']
-                    param = instruction['advance']['parameter']
-                    
-                    if func == 'avanzar_vlts':
-                        comandos.append(f"avanzar_vlts:{param}")
-                    elif func == 'avanzar_ctms':
-                        comandos.append(f"avanzar_ctms:{param}")
-                    elif func == 'avanzar_mts':
-                        comandos.append(f"avanzar_mts:{param}")
-        
-        return comandos
-    
-    def compile(self, code):
+        Returns:
+            list: Comandos para el ESP8266
+        """
+        ir = ProgramIR('')
+        ir.add_instruction(instruction)
+        return esp8266_commands(ir.opcodes, ir.operands)
+    
+    def compile(self, code, metrics=None, all_errors=False, optimize=False):
         """
         Compila código UMG++ a Python
         
         Args:
             code (str): Código fuente en UMG++
+            metrics (CompileMetrics): Si se indica, se registran en él el tiempo
+                y los bloques de memoria de cada etapa
+            all_errors (bool): No detenerse en la primera etapa con errores:
+                devolver los errores léxicos, sintácticos y semánticos juntos,
+                ordenados por posición y cada uno con su 'stage'
+            optimize (bool): Optimizar los comandos antes de generar código
+                (ver optimizer.py); el resultado incluye 'optimization'
             
         Returns:
-            dict: Resultado de la compilación con el código Python generado o errores
+            dict: Resultado de la compilación con el código Python generado o errores.
+                Si tiene éxito incluye 'ir' (ProgramIR), que no es serializable
+                en JSON; ver public_result().
         """
-        # Análisis léxico
-        tokens, lex_errors = self.tokenize(code)
+        # Análisis léxico y sintáctico en un solo recorrido: el parser consume
+        # los tokens a medida que el lexer los produce, sin materializar la lista
+        lex_errors = []
+        tokens = self.iter_tokens(code, lex_errors)
+        if metrics is not None:
+            metrics.begin(code)
+            tokens = metrics.timed_tokens(tokens)
         
-        if lex_errors:
-            return {
-                'success': False,
-                'stage': 'lexical',
-                'errors': lex_errors
-            }
+        if all_errors:
+            return self._compile_all_errors(tokens, lex_errors, metrics, optimize)
         
-        # Análisis sintáctico
         ast, parse_errors = self.parse(tokens)
         
+        # Terminar el análisis léxico de lo que el parser no llegó a leer
+        for _ in tokens:
+            pass
+        
+        if metrics is not None:
+            metrics.mark('syntax')
+            if ast is not None:
+                metrics.instructions = len(ast.instructions)
+        
+        if lex_errors:
+            return self._failure(metrics, 'lexical', lex_errors)
+        
         if parse_errors:
-            return {
-                'success': False,
-                'stage': 'syntax',
-                'errors': parse_errors
-            }
+            return self._failure(metrics, 'syntax', parse_errors)
         
         # Análisis semántico
         semantic_errors = self.analyze_semantics(ast)
+        if metrics is not None:
+            metrics.mark('semantic')
         
         if semantic_errors:
-            return {
-                'success': False,
-                'stage': 'semantic',
-                'errors': semantic_errors
-            }
+            return self._failure(metrics, 'semantic', semantic_errors)
+        
+        return self._generate(ast, metrics, optimize)
+    
+    def _compile_all_errors(self, tokens, lex_errors, metrics, optimize):
+        """Compilación que reúne los errores de todas las etapas"""
+        ast, parse_errors, semantic_errors = self.diagnose(tokens)
+        for _ in tokens:
+            pass
         
-        # Generación de código Python
-        result = self.generate_python_code(ast)
+        if metrics is not None:
+            # El análisis semántico ocurre intercalado con el sintáctico
+            metrics.mark('syntax')
+            if ast is not None:
+                metrics.instructions = len(ast.instructions)
         
+        stages = (('lexical', lex_errors), ('syntax', parse_errors), ('semantic', semantic_errors))
+        failed = [stage for stage, errors in stages if errors]
+        if not failed:
+            return self._generate(ast, metrics, optimize)
+        
+        errors = [dict(error, stage=stage) for stage, stage_errors in stages for error in stage_errors]
+        # Orden estable: en la misma posición, las etapas conservan su orden
+        errors.sort(key=lambda error: (error['line'], error['column']))
+        if metrics is not None:
+            metrics.finish(failed[0])
         return {
+            'success': False,
+            'stage': failed[0],
+            'stages': failed,
+            'errors': errors
+        }
+    
+    def _generate(self, ast, metrics, optimize=False):
+        """Representación intermedia, optimización opcional, generación de código y análisis de la trayectoria"""
+        ir = self.lower(ast)
+        if metrics is not None:
+            metrics.mark('lower')
+        
+        if optimize:
+            commands = len(ir)
+            ir, removed = optimize_ir(ir)
+            if metrics is not None:
+                metrics.mark('optimize')
+        
+        result = self.generate_python_code(ir)
+        if metrics is not None:
+            metrics.mark('generation')
+        
+        # Pose final, recorrido y duración sin ejecutar el programa
+        trajectory = analyze_trajectory(ir)
+        if metrics is not None:
+            metrics.mark('analysis')
+            metrics.commands = len(ir)
+            metrics.finish()
+        
+        result = {
             'success': True,
-            'ast': ast,
+            'ast': ast.to_dict(),
+            'ir': ir,
             'python_code': result['python_code'],
-            'esp8266_code': result['esp8266_code']
+            'esp8266_code': result['esp8266_code'],
+            'source_map': result['source_map'],
+            'trajectory': trajectory
+        }
+        if optimize:
+            result['optimization'] = {
+                'commands': commands,
+                'optimized_commands': len(ir),
+                'removed': removed
+            }
+        return result
+    
+    def _failure(self, metrics, stage, errors):
+        """Resultado de una compilación que falló en la etapa indicada"""
+        if metrics is not None:
+            metrics.finish(stage)
+        return {
+            'success': False,
+            'stage': stage,
+            'errors': errors
         }
 
 
-def transpile_to_python(umgpp_code):
+def executed_commands(instruction):
+    """
+    Comandos que ejecuta una instrucción del AST, con sus bloques REPEAT expandidos
+    
+    Args:
+        instruction (Instruction | GiroCombination | Repeat): Nodo de la instrucción
+        
+    Returns:
+        int: Cantidad de comandos ejecutados
+    """
+    if instruction.type == 'repeat':
+        return max(instruction.count, 0) * sum(executed_commands(child) for child in instruction.instructions)
+    if instruction.type == 'giro_combination':
+        return len(instruction.giros) + (instruction.advance is not None)
+    return 1
+
+
+def esp8266_commands(opcodes, operands):
+    """
+    Comandos de texto para el ESP8266 a partir de la representación intermedia
+    
+    Un bloque REPEAT se codifica por longitud: 'repetir:n:k' indica que los k
+    comandos siguientes (contando los bloques anidados) se repiten n veces,
+    sin marcador de fin.
+    
+    Args:
+        opcodes (sequence): Códigos de operación
+        operands (sequence): Operandos
+        
+    Returns:
+        list: Comandos en formato 'funcion:parametro'
+    """
+    if REPEAT not in opcodes:
+        return [f"{OPCODE_NAMES[opcode]}:{operand}" for opcode, operand in zip(opcodes, operands)]
+    
+    commands = []
+    blocks = []
+    for opcode, operand in zip(opcodes, operands):
+        if opcode == REPEAT:
+            blocks.append((len(commands), operand))
+            commands.append(None)
+        elif opcode == END_REPEAT:
+            position, count = blocks.pop()
+            commands[position] = f"repetir:{count}:{len(commands) - position - 1}"
+        else:
+            commands.append(f"{OPCODE_NAMES[opcode]}:{operand}")
+    return commands
+
+
+def esp8266_binary(opcodes, operands):
+    """
+    Programa binario para el ESP8266 a partir de la representación intermedia
+    
+    Alternativa compacta a esp8266_commands para el firmware que la anuncia;
+    el formato se describe en roverapp.wire.
+    
+    Args:
+        opcodes (sequence): Códigos de operación
+        operands (sequence): Operandos
+        
+    Returns:
+        bytes: Programa codificado
+    """
+    return wire.encode(opcodes, operands)
+
+
+def public_result(result):
+    """
+    Resultado de compilación apto para JsonResponse (sin la representación intermedia)
+    
+    Args:
+        result (dict): Resultado de UMGPPTranspiler.compile
+        
+    Returns:
+        dict: El mismo resultado sin la clave 'ir'
+    """
+    if 'ir' not in result:
+        return result
+    return {key: value for key, value in result.items() if key != 'ir'}
+
+
+def transpile_to_python(umgpp_code, metrics=None, all_errors=False, optimize=False):
     """
     Función auxiliar para transpilar código UMG++ a Python
     
     Args:
         umgpp_code (str): Código fuente en UMG++
+        metrics (CompileMetrics): Mediciones por etapa, opcional
+        all_errors (bool): Devolver los errores de todas las etapas juntos
+        optimize (bool): Optimizar los comandos antes de generar código
         
     Returns:
         dict: Resultado de la transpilación
     """
     transpiler = UMGPPTranspiler()
-    return transpiler.compile(umgpp_code)
\ No newline at end of file
+    return transpiler.compile(umgpp_code, metrics, all_errors, optimize)
\ No newline at end of file
@@ -3,6 +3,12 @@ from . import views_api
 
 urlpatterns = [
     path('compile/', views_api.compile_code, name='api_compile'),
+    path('compile/incremental/', views_api.compile_incremental, name='api_compile_incremental'),
+    path('compile/batch/', views_api.compile_batch, name='api_compile_batch'),
+    path('compile/jobs/', views_api.compile_job_submit, name='api_compile_job_submit'),
+    path('compile/jobs/<str:job_id>/', views_api.compile_job, name='api_compile_job'),
+    path('compile/cache/', views_api.compile_cache_stats, name='api_compile_cache'),
+    path('compile/metrics/', views_api.compile_metrics, name='api_compile_metrics'),
     path('save/', views_api.save_code, name='api_save'),
     path('execute/', views_api.execute_code, name='api_execute'),
     path('programs/', views_api.get_user_programs, name='api_programs'),
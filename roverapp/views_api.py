@@ -1,7 +1,8 @@
 """
 Vistas de API para el compilador UMG++
 """
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 import json
@@ -9,7 +10,18 @@ import os
 from datetime import datetime
 
 from .models import Usuario, Ingreso
-from .transpiler import transpile_to_python
+from .compile_cache import compile_cached, get_cache
+from .artifacts import compile_program, write_artifact
+from .compile_metrics import CompileMetrics, aggregate, metrics_enabled
+from .transpiler import public_result
+from .batch import get_batch_compiler
+from .jobs import get_job_queue, JobRejected
+from .incremental import IncrementalDocument, documents
+from .arena import (get_arena, collision_message, MAX_POINTS as ARENA_MAX_POINTS,
+                    MAX_COMMANDS as ARENA_MAX_COMMANDS)
+
+# Segundos máximos que una consulta de un trabajo espera a que termine
+JOB_MAX_WAIT = 30
 
 @csrf_exempt
 @login_required
@@ -17,6 +29,17 @@ def compile_code(request):
     """
     API para compilar código UMG++ a Python
     
+    Con 'diagnostics': true la respuesta incluye el tiempo y la memoria de
+    cada etapa de la compilación. Con 'all_errors': true la compilación no
+    se detiene en la primera etapa con errores y devuelve los errores
+    léxicos, sintácticos y semánticos juntos, ordenados por posición. Con
+    'optimize': true los comandos pasan por el optimizador antes de generar
+    el código y la respuesta indica cuántos se eliminaron. Una compilación
+    exitosa incluye en 'trajectory' la pose final, el rectángulo del
+    recorrido, su longitud y el tiempo estimado (roverapp.trajectory), y en
+    'source_map' la línea y columna de UMG++ de cada línea de Python y cada
+    comando para el ESP8266 (roverapp.source_map).
+    
     Args:
         request: Objeto de solicitud HTTP
     
@@ -33,6 +56,9 @@ def compile_code(request):
     try:
         data = json.loads(request.body)
         umgpp_code = data.get('code', '')
+        diagnostics = bool(data.get('diagnostics', False))
+        all_errors = bool(data.get('all_errors', False))
+        optimize = bool(data.get('optimize', False))
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
@@ -45,13 +71,325 @@ def compile_code(request):
             'message': 'No se proporcionó código para compilar'
         }, status=400)
     
-    # Compilar el código
-    result = transpile_to_python(umgpp_code)
+    # Medir la compilación solo si se pidió o si está activado en settings
+    metrics = CompileMetrics() if diagnostics or metrics_enabled() else None
+    
+    # Compilar el código (o reutilizar el resultado de un código idéntico)
+    result = compile_cached(umgpp_code, metrics, all_errors, optimize)
     
     # Registrar la compilación en estadísticas
-    if result['success']:
-        # Aquí se podría registrar la compilación en una tabla de estadísticas
-        pass
+    aggregate.count_request(all_errors, result['success'])
+    if metrics is not None:
+        aggregate.record(metrics)
+    
+    response = public_result(result)
+    if diagnostics:
+        # El resultado puede venir de la caché: no modificarlo
+        response = dict(response, diagnostics=metrics.to_dict())
+    
+    return JsonResponse(response)
+
+@csrf_exempt
+@login_required
+def compile_batch(request):
+    """
+    API para compilar muchos programas UMG++ en una sola solicitud
+    
+    Recibe {'programs': [{'name': ..., 'code': ...}, ...]} y los compila en
+    paralelo en un grupo de procesos. Con 'stream': true la respuesta es
+    JSON por líneas (application/x-ndjson), un resultado por programa en el
+    orden en que terminan; si no, devuelve todos los resultados en orden.
+    
+    Args:
+        request: Objeto de solicitud HTTP
+    
+    Returns:
+        JsonResponse | StreamingHttpResponse: Resultados por programa
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    if request.user.id_rol.nombre != 'Administrador':
+        return JsonResponse({
+            'success': False,
+            'message': 'Acceso restringido a administradores'
+        }, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        programs = data.get('programs', [])
+        stream = bool(data.get('stream', False))
+        names = [str(program.get('name', index)) for index, program in enumerate(programs)]
+        codes = [program['code'] for program in programs]
+        if not all(isinstance(code, str) for code in codes):
+            raise TypeError('code')
+    except (json.JSONDecodeError, AttributeError, KeyError, TypeError):
+        return JsonResponse({
+            'success': False,
+            'message': 'JSON inválido: se esperaba una lista de programas con nombre y código'
+        }, status=400)
+    
+    if not codes:
+        return JsonResponse({
+            'success': False,
+            'message': 'No se proporcionaron programas para compilar'
+        }, status=400)
+    
+    max_programs = getattr(settings, 'UMGPP_BATCH_MAX_PROGRAMS', 500)
+    if len(codes) > max_programs:
+        return JsonResponse({
+            'success': False,
+            'message': f'Se permiten como máximo {max_programs} programas por solicitud'
+        }, status=400)
+    
+    compiler = get_batch_compiler()
+    
+    # Los procesos devuelven cada resultado ya serializado; solo se agrega el nombre
+    def named(index, result_json):
+        return '{"name": ' + json.dumps(names[index]) + ', ' + result_json[1:]
+    
+    if stream:
+        def lines():
+            for index, result_json in compiler.compile_iter(codes, as_json=True):
+                yield named(index, result_json) + '\n'
+        
+        return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    
+    results = compiler.compile_all(codes, as_json=True)
+    body = ', '.join(named(index, result_json) for index, result_json in enumerate(results))
+    return HttpResponse('{"success": true, "results": [' + body + ']}', content_type='application/json')
+
+@csrf_exempt
+@login_required
+def compile_job_submit(request):
+    """
+    API para compilar un programa grande de forma asíncrona
+    
+    Recibe {'code': ..., 'optimize': false}, registra un trabajo en la cola
+    de compilación (roverapp.jobs) y responde de inmediato con su
+    identificador; el resultado se consulta en compile/jobs/<id>/.
+    
+    Args:
+        request: Objeto de solicitud HTTP
+    
+    Returns:
+        JsonResponse: Estado del trabajo (202), o 413/429 si la cola lo rechaza
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        umgpp_code = data.get('code', '')
+        optimize = bool(data.get('optimize', False))
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'JSON inválido'
+        }, status=400)
+    
+    if not umgpp_code or not isinstance(umgpp_code, str):
+        return JsonResponse({
+            'success': False,
+            'message': 'No se proporcionó código para compilar'
+        }, status=400)
+    
+    try:
+        job = get_job_queue().submit(umgpp_code, optimize, owner=request.user.id_usuario)
+    except JobRejected as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=e.status)
+    
+    return JsonResponse({'success': True, **job.to_dict()}, status=202)
+
+@csrf_exempt
+@login_required
+async def compile_job(request, job_id):
+    """
+    API para consultar o cancelar un trabajo de compilación
+    
+    GET devuelve el estado del trabajo y, si terminó, el resultado; con
+    ?wait=<segundos> espera a que termine (hasta JOB_MAX_WAIT). La vista es
+    asíncrona: servida con rover/asgi.py la espera no ocupa un hilo del
+    servidor. DELETE cancela el trabajo.
+    
+    Args:
+        request: Objeto de solicitud HTTP
+        job_id (str): Identificador del trabajo
+    
+    Returns:
+        JsonResponse: Estado del trabajo
+    """
+    if request.method not in ('GET', 'DELETE'):
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    user = await request.auser()
+    jobs = get_job_queue()
+    job = jobs.get(job_id, owner=user.id_usuario)
+    if job is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Trabajo no encontrado'
+        }, status=404)
+    
+    if request.method == 'DELETE':
+        # Terminar el proceso de un trabajo en curso toma un momento
+        if jobs.cancel(job):
+            await job.wait_async(1)
+        return JsonResponse({'success': True, **job.to_dict()})
+    
+    try:
+        wait = min(max(float(request.GET.get('wait', 0)), 0), JOB_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    if wait:
+        await job.wait_async(wait)
+    
+    return JsonResponse({'success': True, **job.to_dict()})
+
+@login_required
+def compile_cache_stats(request):
+    """
+    API para consultar los contadores de la caché de compilación
+    
+    Args:
+        request: Objeto de solicitud HTTP
+    
+    Returns:
+        JsonResponse: Aciertos y fallos de la caché de este proceso
+    """
+    if request.method != 'GET':
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    if request.user.id_rol.nombre != 'Administrador':
+        return JsonResponse({
+            'success': False,
+            'message': 'Acceso restringido a administradores'
+        }, status=403)
+    
+    return JsonResponse({
+        'success': True,
+        'cache': get_cache().stats()
+    })
+
+@csrf_exempt
+@login_required
+def compile_metrics(request):
+    """
+    API para consultar las métricas acumuladas de compilación
+    
+    GET devuelve el acumulado de este proceso; DELETE lo reinicia.
+    
+    Args:
+        request: Objeto de solicitud HTTP
+    
+    Returns:
+        JsonResponse: Tiempos por etapa e histogramas de latencia por tamaño
+    """
+    if request.method not in ('GET', 'DELETE'):
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    if request.user.id_rol.nombre != 'Administrador':
+        return JsonResponse({
+            'success': False,
+            'message': 'Acceso restringido a administradores'
+        }, status=403)
+    
+    if request.method == 'DELETE':
+        aggregate.reset()
+    
+    return JsonResponse({
+        'success': True,
+        'enabled': metrics_enabled(),
+        'metrics': aggregate.snapshot()
+    })
+
+@csrf_exempt
+@login_required
+def compile_incremental(request):
+    """
+    API para compilar de forma incremental mientras se edita
+    
+    El editor abre el documento enviando el código completo ('code') y luego
+    envía solo las ediciones ('edits') junto con la versión sobre la que se
+    aplican ('base_version'). Si el servidor no tiene esa versión responde
+    con 'resync' para que el editor vuelva a enviar el código completo.
+    
+    Args:
+        request: Objeto de solicitud HTTP
+    
+    Returns:
+        JsonResponse: Diagnósticos y código generado (completo o por tramos)
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        document_id = str(data.get('document', 'editor'))
+        version = int(data.get('version', 0))
+        code = data.get('code')
+        edits = data.get('edits', [])
+        if code is not None and not isinstance(code, str):
+            raise TypeError('code')
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'message': 'JSON inválido'
+        }, status=400)
+    
+    key = (request.session.session_key, document_id)
+    
+    # Abrir o sincronizar el documento con el código completo
+    if code is not None:
+        document = IncrementalDocument(code, version)
+        documents.put(key, document)
+        return JsonResponse(document.result())
+    
+    resync = JsonResponse({
+        'success': False,
+        'resync': True,
+        'message': 'El documento no está sincronizado, envíe el código completo'
+    }, status=409)
+    
+    document = documents.get(key)
+    if document is None:
+        return resync
+    
+    with document.lock:
+        if document.version != data.get('base_version'):
+            return resync
+        
+        try:
+            result = document.update(edits, version)
+        except (KeyError, TypeError, ValueError) as e:
+            # Una edición inválida deja el documento a medio actualizar
+            documents.discard(key)
+            return JsonResponse({
+                'success': False,
+                'resync': True,
+                'message': f'Edición inválida: {str(e)}'
+            }, status=400)
     
     return JsonResponse(result)
 
@@ -61,6 +399,9 @@ def save_code(request):
     """
     API para guardar el código UMG++ en el servidor
     
+    Junto al archivo .umgpp se guarda el resultado de compilarlo
+    (roverapp.artifacts), que usan después la carga y la ejecución.
+    
     Args:
         request: Objeto de solicitud HTTP
     
@@ -111,10 +452,18 @@ def save_code(request):
             'message': f'Error al guardar el archivo: {str(e)}'
         }, status=500)
     
+    # Guardar el programa compilado; si falla, se compilará al ejecutarlo
+    result = compile_cached(code)
+    try:
+        write_artifact(file_path, code, result)
+    except OSError:
+        pass
+    
     return JsonResponse({
         'success': True,
         'message': 'Archivo guardado correctamente',
-        'path': file_path
+        'path': file_path,
+        'compiled': result['success']
     })
 
 @login_required
@@ -181,9 +530,7 @@ def get_program_content(request, program_id):
             'message': 'Método no permitido'
         }, status=405)
     
-    # Directorio de programas del usuario
-    user_directory = os.path.join('media', 'programas', str(request.user.id_usuario))
-    file_path = os.path.join(user_directory, program_id)
+    file_path = program_path(request.user, program_id)
     
     # Verificar si el archivo existe
     if not os.path.exists(file_path) or not file_path.endswith('.umgpp'):
@@ -202,18 +549,43 @@ def get_program_content(request, program_id):
             'message': f'Error al leer el archivo: {str(e)}'
         }, status=500)
     
+    # Resultado de la compilación desde el artefacto guardado (o compilando)
+    result = compile_program(file_path, content)
+    
     return JsonResponse({
         'success': True,
         'content': content,
-        'name': os.path.basename(file_path)
+        'name': os.path.basename(file_path),
+        'compiled': public_result(result)
     })
 
+def program_path(user, program_id):
+    """
+    Ruta del archivo de un programa guardado por el usuario
+    
+    Args:
+        user (Usuario): Usuario dueño del programa
+        program_id (str): Nombre del archivo
+    
+    Returns:
+        str: Ruta dentro de media/programas/<id_usuario>/
+    """
+    user_directory = os.path.join('media', 'programas', str(user.id_usuario))
+    return os.path.join(user_directory, os.path.basename(program_id))
+
 @csrf_exempt
 @login_required
 def execute_code(request):
     """
     API para ejecutar el código UMG++ en el Rover
     
+    Acepta 'code' con el código a ejecutar o 'program' con el nombre de un
+    programa guardado; en ese caso se usa su artefacto de compilación y no
+    hace falta compilar. Si hay una arena configurada (UMGPP_ARENA), el
+    recorrido se verifica antes de enviarlo: un programa que sale de la arena
+    o choca con un obstáculo se rechaza con la posición del comando, o se
+    envía con 'arena_warning' si UMGPP_ARENA_ACTION es 'warn'.
+    
     Args:
         request: Objeto de solicitud HTTP
     
@@ -230,44 +602,87 @@ def execute_code(request):
     try:
         data = json.loads(request.body)
         umgpp_code = data.get('code', '')
+        program_id = data.get('program', '')
+        optimize = bool(data.get('optimize', False))
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
             'message': 'JSON inválido'
         }, status=400)
     
-    if not umgpp_code:
+    if not umgpp_code and not program_id:
         return JsonResponse({
             'success': False,
             'message': 'No se proporcionó código para ejecutar'
         }, status=400)
     
-    # Compilar el código
-    result = transpile_to_python(umgpp_code)
+    if umgpp_code:
+        # Compilar el código (o reutilizar el resultado de un código idéntico)
+        result = compile_cached(umgpp_code, optimize=optimize)
+    else:
+        file_path = program_path(request.user, program_id)
+        if not os.path.exists(file_path) or not file_path.endswith('.umgpp'):
+            return JsonResponse({
+                'success': False,
+                'message': 'Programa no encontrado'
+            }, status=404)
+        if optimize:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                result = compile_cached(f.read(), optimize=True)
+        else:
+            # Artefacto guardado junto al programa (se compila si no está vigente)
+            result = compile_program(file_path)
     
     if not result['success']:
-        return JsonResponse(result)
+        return JsonResponse(public_result(result))
     
     # Si la compilación es exitosa, tenemos el código Python y los comandos para ESP8266
     python_code = result['python_code']
     esp8266_comandos = result['esp8266_code']
     
+    # Verificar el recorrido en la arena configurada antes de enviarlo
+    arena_warning = None
+    arena = get_arena()
+    if arena is not None:
+        try:
+            collision = arena.check_program(
+                result['ir'], getattr(settings, 'UMGPP_ARENA_MAX_POINTS', ARENA_MAX_POINTS),
+                getattr(settings, 'UMGPP_ARENA_MAX_COMMANDS', ARENA_MAX_COMMANDS))
+        except ValueError as e:
+            collision = None
+            arena_warning = f'No se pudo verificar el recorrido en la arena: {str(e)}'
+        if collision is not None:
+            arena_warning = collision_message(collision)
+            if getattr(settings, 'UMGPP_ARENA_ACTION', 'reject') == 'reject':
+                return JsonResponse({
+                    'success': False,
+                    'message': arena_warning,
+                    'collision': collision,
+                    'python_code': python_code,
+                    'esp8266_comandos': esp8266_comandos,
+                    'source_position': {key: collision[key] for key in ('comando', 'line', 'column') if key in collision}
+                }, status=400)
+    
     # Intentar enviar los comandos al rover
     from .views_rover import ejecutar_programa_rover_interno
-    ejecucion_result = ejecutar_programa_rover_interno(esp8266_comandos)
+    ejecucion_result = ejecutar_programa_rover_interno(result['ir'])
     
     if not ejecucion_result['success']:
         return JsonResponse({
             'success': False,
             'message': 'Error al ejecutar en el rover: ' + ejecucion_result['message'],
             'python_code': python_code,
-            'esp8266_comandos': esp8266_comandos
+            'esp8266_comandos': esp8266_comandos,
+            'source_position': ejecucion_result.get('posicion')
         })
     
-    return JsonResponse({
+    response = {
         'success': True,
         'message': 'Código enviado al Rover con éxito',
         'python_code': python_code,
         'esp8266_comandos': esp8266_comandos,
         'execution_id': datetime.now().strftime('%Y%m%d%H%M%S')
-    })
\ No newline at end of file
+    }
+    if arena_warning is not None:
+        response['arena_warning'] = arena_warning
+    return JsonResponse(response)
\ No newline at end of file
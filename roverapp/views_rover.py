@@ -1,6 +1,7 @@
 """
 Vistas para la comunicación con el UMG Basic Rover 2.0
 """
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -9,6 +10,13 @@ import requests
 from datetime import datetime
 import logging
 
+from .compile_cache import compile_cached
+from .ir import ProgramIR
+from .source_map import command_map, esp8266_map
+from .transpiler import esp8266_binary, esp8266_commands, public_result
+from .streaming import StreamingUpload, StreamError, binary_chunks, text_chunks
+from .wire import CONTENT_TYPE, WIRE_VERSION
+
 # Configuración de logging
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,12 @@ logger = logging.getLogger(__name__)
 # Por defecto, usamos una dirección IP local que debe ser cambiada según el rover
 ROVER_URL = "http://192.168.1.100"  # CAMBIAR POR LA IP REAL DEL ESP8266
 
+# Formato en que se envían los programas: 'text' (programa:cmd,cmd,...),
+# 'binary' (roverapp.wire) o 'auto' para preguntar al firmware en /formatos.
+# Se configura con el setting ROVER_WIRE_FORMAT. Aquí se guardan las
+# capacidades de cada URL de rover cuando se negocia con 'auto'
+_formatos_rover = {}
+
 @csrf_exempt
 @login_required
 def enviar_comando_rover(request):
@@ -247,6 +261,7 @@ def ejecutar_programa_rover(request):
     # Obtener el programa del cuerpo de la solicitud
     try:
         data = json.loads(request.body)
+        umgpp_code = data.get('code', '')
         python_code = data.get('python_code', '')
     except json.JSONDecodeError:
         return JsonResponse({
@@ -254,16 +269,24 @@ def ejecutar_programa_rover(request):
             'message': 'JSON inválido'
         }, status=400)
     
-    if not python_code:
+    if umgpp_code:
+        # Compilar a la representación intermedia y ejecutarla directamente
+        result = compile_cached(umgpp_code)
+        if not result['success']:
+            return JsonResponse(public_result(result), status=400)
+        comandos = result['ir']
+    
+    elif python_code:
+        # Compatibilidad: extraer los comandos del código Python generado
+        comandos = procesar_codigo_python(python_code)
+    
+    else:
         return JsonResponse({
             'success': False,
-            'message': 'No se proporcionó código Python para ejecutar'
+            'message': 'No se proporcionó código UMG++ ni código Python para ejecutar'
         }, status=400)
     
-    # Procesar el código Python para extraer comandos para el rover
-    comandos = procesar_codigo_python(python_code)
-    
-    if not comandos:
+    if not len(comandos):
         return JsonResponse({
             'success': False,
             'message': 'No se pudieron extraer comandos válidos del código'
@@ -278,7 +301,7 @@ def ejecutar_programa_rover(request):
     return JsonResponse({
         'success': True,
         'message': f"Programa iniciado. Ejecutando {len(comandos)} comandos.",
-        'comandos': comandos
+        'comandos': resultado['comandos']
     })
 
 def ejecutar_programa_rover_interno(comandos):
@@ -286,11 +309,24 @@ def ejecutar_programa_rover_interno(comandos):
     Función interna para ejecutar un programa completo en el rover
     
     Args:
-        comandos (list): Lista de comandos a ejecutar
+        comandos (ProgramIR | list): Representación intermedia del programa
+            o lista de comandos de texto a ejecutar
     
     Returns:
-        dict: Resultado de la operación
+        dict: Resultado de la operación; si el rover indica el comando en
+            que falló, incluye 'posicion' con su línea y columna en UMG++
     """
+    programa_binario = None
+    fragmentos = None
+    programa = None
+    if isinstance(comandos, ProgramIR):
+        programa = comandos
+        capacidades = capacidades_rover(ROVER_URL)
+        fragmentos = capacidades['fragmentos']
+        if capacidades['formato'] == 'binary':
+            programa_binario = esp8266_binary(comandos.opcodes, comandos.operands)
+        comandos = esp8266_commands(comandos.opcodes, comandos.operands)
+    
     if not comandos or not isinstance(comandos, list):
         return {
             'success': False,
@@ -300,29 +336,59 @@ def ejecutar_programa_rover_interno(comandos):
     # Registrar el inicio del programa
     logger.info(f"Iniciando programa con {len(comandos)} comandos")
     
+    if fragmentos:
+        resultado = enviar_por_fragmentos(comandos, programa_binario, fragmentos)
+        if resultado is not None:
+            return resultado
+    
     try:
-        # Crear un comando especial que incluye toda la secuencia
-        comando_programa = "programa:" + ",".join(comandos)
+        formato = 'text'
+        response = None
+        if programa_binario is not None:
+            # Enviar el programa codificado en binario
+            formato = 'binary'
+            response = requests.post(
+                f"{ROVER_URL}/ejecutar",
+                data=programa_binario,
+                headers={'Content-Type': CONTENT_TYPE},
+                timeout=5
+            )
+            if response.status_code == 415:
+                # El firmware ya no acepta el formato binario
+                logger.warning(f"El rover rechazó el formato binario. URL: {ROVER_URL}")
+                _formatos_rover[ROVER_URL] = {'formato': 'text', 'fragmentos': None}
+                formato = 'text'
+                response = None
         
-        # Enviar petición HTTP al ESP8266
-        response = requests.post(
-            f"{ROVER_URL}/ejecutar",
-            json={"comando": comando_programa},
-            timeout=5  # Timeout de 5 segundos
-        )
+        if response is None:
+            # Crear un comando especial que incluye toda la secuencia
+            comando_programa = "programa:" + ",".join(comandos)
+            
+            # Enviar petición HTTP al ESP8266
+            response = requests.post(
+                f"{ROVER_URL}/ejecutar",
+                json={"comando": comando_programa},
+                timeout=5  # Timeout de 5 segundos
+            )
         
         if response.status_code == 200:
             return {
                 'success': True,
                 'message': f"Programa enviado exitosamente ({len(comandos)} comandos)",
+                'comandos': comandos,
+                'formato': formato,
                 'rover_response': response.json() if response.text else {}
             }
         else:
-            return {
+            resultado = {
                 'success': False,
                 'message': f"Error en la respuesta del rover: {response.status_code}",
                 'rover_response': response.text if response.text else "Sin respuesta"
             }
+            posicion = posicion_del_error(programa, formato, response)
+            if posicion is not None:
+                resultado['posicion'] = posicion
+            return resultado
     
     except requests.exceptions.ConnectionError:
         logger.error(f"Error de conexión al rover. URL: {ROVER_URL}")
@@ -345,6 +411,129 @@ def ejecutar_programa_rover_interno(comandos):
             'message': f"Error al enviar programa: {str(e)}"
         }
 
+def posicion_del_error(programa, formato, response):
+    """
+    Posición en el código UMG++ del comando en que falló el rover
+    
+    El firmware indica el comando con {"comando": N} en su respuesta de error:
+    el índice entre los comandos de texto o, en formato binario, entre los
+    comandos del programa codificado (roverapp.source_map).
+    
+    Args:
+        programa (ProgramIR): Programa enviado, o None si se enviaron comandos sueltos
+        formato (str): 'text' o 'binary'
+        response (Response): Respuesta de error del rover
+    
+    Returns:
+        dict: {'comando', 'line', 'column'}, o None si no se puede ubicar
+    """
+    if programa is None:
+        return None
+    try:
+        indice = int(response.json()['comando'])
+    except (ValueError, KeyError, TypeError):
+        return None
+    
+    mapa = command_map(programa) if formato == 'binary' else esp8266_map(programa)
+    posicion = mapa.lookup(indice)
+    if posicion is not None:
+        posicion['comando'] = indice
+    return posicion
+
+def enviar_por_fragmentos(comandos, programa_binario, fragmentos):
+    """
+    Envía un programa largo por fragmentos con ventana (roverapp.streaming)
+    
+    Args:
+        comandos (list): Comandos de texto del programa
+        programa_binario (bytes): Programa en formato binario, o None para texto
+        fragmentos (dict): Ventana y tamaño de fragmento anunciados por el rover
+    
+    Returns:
+        dict: Resultado de la operación, o None si el programa cabe en un
+            solo fragmento y conviene enviarlo en una sola solicitud
+    """
+    tamano = fragmentos.get('bytes') or 512
+    if programa_binario is not None:
+        formato = 'binary'
+        partes = binary_chunks(programa_binario, tamano)
+    else:
+        formato = 'text'
+        partes = text_chunks(comandos, tamano)
+    if len(partes) <= 1:
+        return None
+    
+    def progreso(estado):
+        logger.info(f"Transferencia al rover: {estado['acked_bytes']}/{estado['bytes']} bytes confirmados")
+    
+    logger.info(f"Enviando programa por fragmentos: {len(partes)} fragmentos de hasta {tamano} bytes")
+    transferencia = StreamingUpload(ROVER_URL, partes, formato, window=fragmentos.get('ventana') or 4,
+                                    progress=progreso)
+    try:
+        resumen = transferencia.run()
+    except StreamError as e:
+        logger.error(f"Error en la transferencia por fragmentos: {str(e)}. URL: {ROVER_URL}")
+        return {
+            'success': False,
+            'message': f"Error en la transferencia del programa: {str(e)}"
+        }
+    
+    rover_response = resumen.pop('rover_response')
+    return {
+        'success': True,
+        'message': f"Programa enviado exitosamente ({len(comandos)} comandos en {len(partes)} fragmentos)",
+        'comandos': comandos,
+        'formato': formato,
+        'transferencia': resumen,
+        'rover_response': rover_response
+    }
+
+def capacidades_rover(url):
+    """
+    Formato de programa y transferencia por fragmentos que se usarán con el rover
+    
+    Con ROVER_WIRE_FORMAT = 'auto' (por defecto) se consulta GET /formatos una
+    vez por URL. El firmware nuevo responde con las versiones del formato
+    binario que entiende y, si acepta fragmentos, su ventana y tamaño, por
+    ejemplo {"binario": [1], "fragmentos": {"ventana": 4, "bytes": 512}}. El
+    firmware anterior no tiene esa ruta y sigue recibiendo el formato de texto
+    en una sola solicitud, igual que con ROVER_WIRE_FORMAT = 'text' o 'binary'.
+    
+    Args:
+        url (str): URL base del rover
+    
+    Returns:
+        dict: {'formato': 'binary' o 'text', 'fragmentos': dict o None}
+    """
+    configurado = getattr(settings, 'ROVER_WIRE_FORMAT', 'auto')
+    if configurado != 'auto':
+        return {'formato': configurado, 'fragmentos': None}
+    if url in _formatos_rover:
+        return _formatos_rover[url]
+    
+    try:
+        response = requests.get(f"{url}/formatos", timeout=2)
+    except requests.exceptions.RequestException:
+        # Sin respuesta no se recuerda nada: se vuelve a consultar la próxima vez
+        return {'formato': 'text', 'fragmentos': None}
+    
+    capacidades = {'formato': 'text', 'fragmentos': None}
+    if response.status_code == 200:
+        try:
+            anuncio = response.json()
+            versiones = anuncio.get('binario', [])
+            fragmentos = anuncio.get('fragmentos')
+        except (ValueError, AttributeError):
+            versiones = []
+            fragmentos = None
+        if WIRE_VERSION in versiones:
+            capacidades['formato'] = 'binary'
+        if isinstance(fragmentos, dict):
+            capacidades['fragmentos'] = fragmentos
+    _formatos_rover[url] = capacidades
+    logger.info(f"Capacidades negociadas con el rover: {capacidades}. URL: {url}")
+    return capacidades
+
 def procesar_codigo_python(codigo):
     """
     Procesa el código Python para extraer comandos para el rover
@@ -357,12 +546,29 @@ def procesar_codigo_python(codigo):
     """
     comandos = []
     
+    # Bucles abiertos: (indentación del for, posición de su comando, repeticiones)
+    bucles = []
+    
+    def cerrar_bucles(indentacion):
+        # Un bucle termina en la primera línea con su misma indentación o menor
+        while bucles and bucles[-1][0] >= indentacion:
+            _, posicion, repeticiones = bucles.pop()
+            comandos[posicion] = f"repetir:{repeticiones}:{len(comandos) - posicion - 1}"
+    
     # Dividir el código en líneas
     lineas = codigo.strip().split('\n')
     
     # Buscar líneas que contengan comandos para el rover
     for linea in lineas:
-        if 'rover.move_wheels' in linea:
+        if not linea.strip():
+            continue
+        cerrar_bucles(len(linea) - len(linea.lstrip()))
+        
+        if linea.strip().startswith('for _ in range('):
+            bucles.append((len(linea) - len(linea.lstrip()), len(comandos), extraer_parametro(linea)))
+            comandos.append(None)
+        
+        elif 'rover.move_wheels' in linea:
             # Extraer el parámetro
             param = extraer_parametro(linea)
             comandos.append(f"avanzar_vlts:{param}")
@@ -404,6 +610,7 @@ def procesar_codigo_python(codigo):
             param = extraer_parametro(linea)
             comandos.append(f"moonwalk:{param}")
     
+    cerrar_bucles(0)
     return comandos
 
 def extraer_parametro(linea):
@@ -0,0 +1,140 @@
+"""
+Formato binario de programas para el ESP8266
+Codificación compacta de la representación intermedia para enviarla al rover
+sin que el ESP8266 tenga que interpretar texto:
+
+    'U' 'M' versión  cantidad  comando*
+
+- versión: un byte (WIRE_VERSION)
+- cantidad: número de comandos, varint
+- comando: código de operación de un byte (ir.OPCODE_NAMES) seguido del
+  operando como varint zigzag; END_REPEAT no lleva operando
+
+Los varint usan 7 bits por byte, primero los menos significativos, y el bit
+alto indica que sigue otro byte (LEB128). El zigzag lleva los enteros con
+signo a naturales (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...) para que los
+operandos pequeños ocupen un byte aunque sean negativos. A diferencia del
+texto ('repetir:n:k'), los bloques REPEAT conservan su marcador de fin para
+que el firmware pueda ejecutarlos con una pila sin recorrer el bloque.
+"""
+from array import array
+
+from .ir import OPCODE_NAMES, OPERAND_MIN, OPERAND_MAX, REPEAT, END_REPEAT
+
+MAGIC = b'UM'
+WIRE_VERSION = 1
+
+# Tipo de contenido con el que se envía el programa binario
+CONTENT_TYPE = 'application/vnd.umgpp.programa'
+
+# Un operando de 32 bits ocupa a lo sumo 5 bytes
+MAX_VARINT_BYTES = 5
+
+
+class WireFormatError(ValueError):
+    """Datos que no son un programa binario válido"""
+
+
+def encode(opcodes, operands):
+    """
+    Codifica los comandos en el formato binario
+
+    Args:
+        opcodes (sequence): Códigos de operación
+        operands (sequence): Operandos (enteros de 32 bits con signo)
+
+    Returns:
+        bytes: Programa codificado
+    """
+    out = bytearray(MAGIC)
+    out.append(WIRE_VERSION)
+    _append_varint(out, len(opcodes))
+    append = out.append
+    for opcode, operand in zip(opcodes, operands):
+        append(opcode)
+        if opcode == END_REPEAT:
+            continue
+        value = (operand << 1) ^ (operand >> 31)
+        while value > 0x7F:
+            append(value & 0x7F | 0x80)
+            value >>= 7
+        append(value)
+    return bytes(out)
+
+
+def decode(data):
+    """
+    Decodificador de referencia del formato binario
+
+    Args:
+        data (bytes): Programa codificado
+
+    Returns:
+        array: Códigos de operación ('B')
+        array: Operandos ('i')
+
+    Raises:
+        WireFormatError: Si los datos están truncados, tienen otra versión,
+            códigos desconocidos u operandos fuera de rango, o bloques REPEAT
+            sin cerrar
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise WireFormatError('No es un programa binario de UMG++')
+    if len(data) <= len(MAGIC):
+        raise WireFormatError('Programa truncado')
+    version = data[len(MAGIC)]
+    if version != WIRE_VERSION:
+        raise WireFormatError(f"Versión de formato no soportada: {version}")
+
+    count, position = _read_varint(data, len(MAGIC) + 1)
+    opcodes = array('B')
+    operands = array('i')
+    depth = 0
+    for _ in range(count):
+        if position >= len(data):
+            raise WireFormatError('Programa truncado')
+        opcode = data[position]
+        position += 1
+        if opcode >= len(OPCODE_NAMES):
+            raise WireFormatError(f"Código de operación desconocido: {opcode}")
+
+        if opcode == END_REPEAT:
+            if not depth:
+                raise WireFormatError('Fin de bloque sin REPEAT')
+            depth -= 1
+            operand = 0
+        else:
+            value, position = _read_varint(data, position)
+            operand = (value >> 1) ^ -(value & 1)
+            if not OPERAND_MIN <= operand <= OPERAND_MAX:
+                raise WireFormatError(f"Operando fuera de rango: {operand}")
+            if opcode == REPEAT:
+                depth += 1
+        opcodes.append(opcode)
+        operands.append(operand)
+
+    if depth:
+        raise WireFormatError('Bloque REPEAT sin cerrar')
+    if position != len(data):
+        raise WireFormatError('Datos sobrantes después del último comando')
+    return opcodes, operands
+
+
+def _append_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, position):
+    value = 0
+    for shift in range(0, 7 * MAX_VARINT_BYTES, 7):
+        if position >= len(data):
+            raise WireFormatError('Programa truncado')
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+    raise WireFormatError('Varint demasiado largo')